@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Headless sensor agent: collects process/connection telemetry and ships it to the collector.
+
+Usage:
+    python agent.py --collector 10.0.0.5:5070 --agent-id web-01
+
+Runs the same delta collectors as the desktop app, without Qt, and sends
+their events in compressed batches over one persistent connection to the
+backend's ingest port (THREAT_INGEST_PORT). While the collector is
+unreachable batches are spooled to disk and replayed on reconnect.
+
+Several agents can run on one machine for testing, each with its own
+``--agent-id`` (and therefore its own spool directory).
+"""
+
+import argparse
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+
+from detection.events import TelemetryEvent
+from ingest.protocol import parse_address
+from ingest.shipper import Shipper, default_spool_dir
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Ship host telemetry to a central threat collector.")
+    parser.add_argument('--collector', default='127.0.0.1:5070', help="collector host:port")
+    parser.add_argument('--agent-id', default=socket.gethostname(), help="name reported with every batch")
+    parser.add_argument('--token', default=os.environ.get('THREAT_INGEST_TOKEN'),
+                        help="shared token the collector requires (default: $THREAT_INGEST_TOKEN)")
+    parser.add_argument('--spool-dir', help="directory for unsent batches (default: per agent in ~/.cache)")
+    parser.add_argument('--interval', type=float, default=2.0, help="seconds between collection cycles")
+    parser.add_argument('--batch-size', type=int, default=1000, help="maximum events per shipped batch")
+    parser.add_argument('--no-connections', action='store_true', help="collect process events only")
+    return parser.parse_args(argv)
+
+
+def collect_batches(collectors, batch_size, now=None):
+    """One collection cycle as lists of normalized event dicts, at most ``batch_size`` each."""
+    now = time.time() if now is None else now
+    events = []
+    for collector in collectors:
+        events.extend(TelemetryEvent.from_dict(e, default_ts=now).to_dict() for e in collector.collect())
+    return [events[i:i + batch_size] for i in range(0, len(events), batch_size)]
+
+
+def run(shipper, collectors, interval, batch_size, stop):
+    while not stop.is_set():
+        for batch in collect_batches(collectors, batch_size):
+            shipper.submit(batch)
+        stop.wait(interval)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    from monitor.delta import ConnectionDeltaCollector, ProcessDeltaCollector
+
+    collectors = [ProcessDeltaCollector()]
+    if not args.no_connections:
+        collectors.append(ConnectionDeltaCollector())
+    shipper = Shipper(parse_address(args.collector), args.agent_id,
+                      args.spool_dir or default_spool_dir(args.agent_id), token=args.token)
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    if len(shipper.spool):
+        print(f"📦 Replaying {len(shipper.spool)} spooled batches", file=sys.stderr)
+    shipper.start()
+    print(f"🛰️  Agent {args.agent_id} shipping to {args.collector}", file=sys.stderr)
+    try:
+        run(shipper, collectors, args.interval, args.batch_size, stop)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        shipper.stop()
+        stats = shipper.stats
+        print(f"\n🛑 Agent stopped: {stats['events']} events in {stats['batches']} batches, "
+              f"{stats['sent']} acknowledged, {len(shipper.spool)} left in the spool", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
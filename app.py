@@ -1,183 +1,631 @@
-from flask import Flask, jsonify, request, Response, stream_with_context
+# First, so THREAT_STARTUP_REPORT=1 can time every import below
+from utils import startup
+startup.track_imports()
+
+from flask import Flask, g, jsonify, request, Response, stream_with_context
 from flask_cors import CORS
 from werkzeug.exceptions import HTTPException
 import json
+import os
+import sys
+import threading
 import time
 import random
 
+from engine.control import EngineClient, EngineUnavailable
+from mitigation.executor import MitigationExecutor, MitigationQueueFull
+from utils import metrics, wire
+from utils.broadcast import BroadcastHub, Producer, iter_sse, parse_last_event_id
+from utils.event_store import EventStore, parse_time
+from utils.jobs import JobManager, JobQueueFull
+from utils.stream_export import EVENT_FIELDS, iter_event_store, iter_export, make_encoder
+from utils.threat_catalog import ThreatCatalog
+
 app = Flask(__name__)
 # Enable CORS for all domains, crucial for front-end development
 CORS(app)
 
-# This is where your actual backend logic will go.
-# For this example, we'll use dummy data to simulate the results.
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# Batch TTP extraction only reads reports below this directory
+REPORTS_DIR = os.environ.get("THREAT_REPORTS_DIR", os.path.join(BASE_DIR, "reports"))
+
+# Detections are persisted here (SQLite, WAL mode) for /api/threats
+_event_store = None
+_event_store_lock = threading.Lock()
+
+def get_event_store():
+    """Shared detection store, opened on first use so importing the app writes nothing."""
+    global _event_store
+    with _event_store_lock:
+        if _event_store is None:
+            _event_store = EventStore(os.environ.get(
+                "THREAT_DB_PATH", os.path.join(BASE_DIR, "threat_events.db"))).export_metrics()
+        return _event_store
+
+# Simulated detections come from a preloaded catalog (data/threat_catalog.json);
+# each event only splices its id and timestamp into pre-encoded JSON.
+threat_catalog = ThreatCatalog.load()
 
 def run_security_scan():
-    """Simulates a security scan and returns a list of detected threats."""
-    possible_threats = [
-        {
-            "id": 1,
-            "name": "Suspicious Registry Entry",
-            "type": "Registry Persistence",
-            "severity": "High",
-            "icon": "📝",
-            "location": "HKEY_CURRENT_USER\\Software\\Microsoft\\Windows\\CurrentVersion\\Run",
-            "description": "Unauthorized startup entry detected",
-            "details": "Detected suspicious registry modification in Windows startup location. This could indicate malware persistence mechanism.",
-            "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
-            "selected": False
-        },
-        {
-            "id": 2,
-            "name": "Unknown Service Installation",
-            "type": "Service Persistence",
-            "severity": "Medium",
-            "icon": "⚙️",
-            "location": "Services.msc",
-            "description": "New service with suspicious behavior patterns",
-            "details": "A new Windows service was installed with unusual characteristics and network communication patterns.",
-            "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
-            "selected": False
-        },
-        {
-            "id": 3,
-            "name": "Scheduled Task Anomaly",
-            "type": "Task Scheduler",
-            "severity": "High",
-            "icon": "⏰",
-            "location": "Task Scheduler Library",
-            "description": "Malicious scheduled task for persistence",
-            "details": "Suspicious scheduled task detected that executes PowerShell commands at system startup.",
-            "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
-            "selected": False
-        },
-        {
-            "id": 4,
-            "name": "Suspicious PowerShell Activity",
-            "type": "Command Execution",
-            "severity": "Critical",
-            "icon": "⚠️",
-            "location": "PowerShell.exe",
-            "description": "Obfuscated PowerShell commands detected",
-            "details": "Detected obfuscated PowerShell commands attempting to download external payloads from suspicious domains.",
-            "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
-            "selected": False
-        },
-        {
-            "id": 5,
-            "name": "Unauthorized Network Connection",
-            "type": "Network Activity",
-            "severity": "High",
-            "icon": "🌐",
-            "location": "Network Interface",
-            "description": "Connection to known malicious IP address",
-            "details": "Process attempting to connect to known malicious IP address 192.168.1.100 on suspicious port.",
-            "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
-            "selected": False
-        },
-        {
-            "id": 6,
-            "name": "Process Injection Detected",
-            "type": "Code Injection",
-            "severity": "Critical",
-            "icon": "💉",
-            "location": "System Process",
-            "description": "Code injection attempt in legitimate process",
-            "details": "Code injection attempt detected in legitimate system process, indicating advanced malware techniques.",
-            "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
-            "selected": False
-        }
-    ]
-    # Randomly select a few threats to simulate a scan result
-    num_threats = random.randint(0, len(possible_threats))
-    return random.sample(possible_threats, num_threats)
+    """Simulates a security scan and returns a list of detected threats (ThreatEvents)."""
+    return threat_catalog.sample()
 
 def _generate_random_threat(threat_id: int):
-    """Generate a single random threat payload with a given ID."""
-    sample_list = run_security_scan()
-    if not sample_list:
-        sample_list = [{
-            "id": threat_id,
-            "name": "Heuristic Suspicious Activity",
-            "type": "Heuristic",
-            "severity": random.choice(["Medium", "High", "Critical"]),
-            "icon": "⚠️",
-            "location": "Runtime",
-            "description": "Behavior deviates from baseline",
-            "details": "Generated by heuristic engine.",
-            "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
-            "selected": False,
-        }]
-    base = random.choice(sample_list)
-    base["id"] = threat_id
-    base["timestamp"] = time.strftime("%Y-%m-%d %H:%M:%S")
-    return base
+    """Generate a single random threat event with a given ID."""
+    return threat_catalog.random_event(threat_id)
+
+def negotiated(payload, headers, cache=None):
+    """Response body and headers in the format and compression the client accepts."""
+    return wire.encode_body(payload, headers.get('Accept'), headers.get('Accept-Encoding'), cache)
+
+def job_body(job, headers, since=0):
+    """Job status (catalog results spliced in pre-encoded), negotiated per client."""
+    return negotiated(wire.View(lambda: job.to_json(since), lambda: job.to_dict(since)), headers)
+
+def job_response(job, since=0):
+    body, headers = job_body(job, request.headers, since)
+    return Response(body, headers=headers)
+
+_catalog_bodies = {}
+
+def catalog_body(headers):
+    """``(body, status, headers)`` for /api/catalog; 304 when the client's copy is current."""
+    etag = f'W/"{threat_catalog.version}"'
+    cache_headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+    if etag in headers.get('If-None-Match', ''):
+        return b'', 304, cache_headers
+    body, out = negotiated(threat_catalog, headers, cache=_catalog_bodies)
+    out.update(cache_headers)
+    return body, 200, out
 
 @app.route('/healthz', methods=['GET'])
 def healthz():
     return jsonify({"status": "ok"})
 
-def mitigate_threats_on_backend(threat_ids):
-    """Simulates mitigating threats on the backend."""
+# Request latency per route template (not per URL, so job IDs do not add series).
+# For /api/stream this is the time until the stream starts.
+HTTP_SECONDS = metrics.histogram("threat_http_request_duration_seconds", "HTTP request latency",
+                                 ["method", "route", "status"])
+
+@app.before_request
+def _start_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def _observe_request(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        HTTP_SECONDS.labels(request.method, route, response.status_code).observe(time.perf_counter() - started)
+    return response
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Prometheus text exposition of the process-wide metrics registry."""
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+# Remediation runs on its own bounded pool; one action per threat at a time
+MITIGATION_DELAY = 0.05
+mitigation_executor = MitigationExecutor(workers=8, timeout=5.0, retries=1, backoff=0.2)
+mitigation_jobs = JobManager("mitigate", max_workers=4, max_pending=32)
+
+def mitigate_threat(threat_id):
+    """Simulates mitigating one threat on the backend."""
     # In a real application, you would implement the logic to remove
     # registry keys, stop services, delete files, etc.
-    print(f"Mitigating threats with IDs: {threat_ids}")
-    return {"status": "success", "message": f"Successfully mitigated {len(threat_ids)} threats."}
+    time.sleep(MITIGATION_DELAY)
+    print(f"Mitigated threat {threat_id}")
+    return {"action": "remediated"}
+
+def run_mitigation_job(job, threat_ids):
+    """Fan threat IDs out to the executor; each finished ID becomes a job result."""
+    total = len(threat_ids)
+
+    def report(threat_id, created):
+        def on_done(task):
+            job.add_result(dict(task.to_dict(), id=threat_id, deduplicated=not created))
+            job.set_progress(len(job.results) / total)
+        return on_done
+
+    tasks = []
+    for threat_id in threat_ids:
+        try:
+            task, created = mitigation_executor.submit(f"threat:{threat_id}", mitigate_threat, threat_id)
+        except MitigationQueueFull as e:
+            job.add_result({"id": threat_id, "status": "rejected", "error": str(e)})
+            continue
+        task.add_done_callback(report(threat_id, created))
+        tasks.append(task)
+    for task in tasks:
+        while not task.wait(0.2):
+            if job.cancelled:
+                for pending in tasks:
+                    pending.cancel()
+    counts = {}
+    for result in job.to_dict()["results"]:
+        counts[result["status"]] = counts.get(result["status"], 0) + 1
+    job.info["summary"] = counts
+
+def submit_mitigation(data):
+    """Start a bulk mitigation job from a request body. Returns body and status."""
+    if not isinstance(data, dict):
+        return {"status": "error", "message": "Invalid JSON body."}, 400
+    threat_ids = data.get('threat_ids', [])
+    if not threat_ids or not isinstance(threat_ids, list):
+        return {"status": "error", "message": "No threat IDs provided."}, 400
+    if not all(isinstance(t, (int, str)) and not isinstance(t, bool) for t in threat_ids):
+        return {"status": "error", "message": "Threat IDs must be integers or strings."}, 400
+    threat_ids = list(dict.fromkeys(threat_ids))
+    try:
+        job, _ = mitigation_jobs.submit(run_mitigation_job, None, threat_ids)
+    except JobQueueFull as e:
+        return {"status": "error", "message": str(e)}, 503
+    return {"status": "accepted", "job_id": job.id, "count": len(threat_ids)}, 202
+
+# Scan checks, run in order by a scan job; each maps to a threat catalog ID
+SCAN_CHECKS = [
+    (1, "Registry run keys"),
+    (2, "Installed services"),
+    (3, "Scheduled tasks"),
+    (4, "PowerShell activity"),
+    (5, "Network connections"),
+    (6, "Process memory"),
+]
+SCAN_STEP_DELAY = 1.0 / len(SCAN_CHECKS)
+
+scan_jobs = JobManager("scan", max_workers=4, max_pending=32)
+
+# YARA file scanning: scope "files", or part of "full" when roots are configured
+SCAN_ROOTS = [p for p in os.environ.get("THREAT_SCAN_ROOTS", "").split(os.pathsep) if p]
+_file_scanner = None
+_file_scanner_lock = threading.Lock()
+
+def get_file_scanner():
+    """Shared YARA scanner (compiled rules + verdict cache), created on first use."""
+    global _file_scanner
+    with _file_scanner_lock:
+        if _file_scanner is None:
+            from scanner.engine import FileScanner
+            from scanner.verdicts import DEFAULT_VERDICT_PATH, VerdictCache
+            _file_scanner = FileScanner(cache=VerdictCache(
+                os.environ.get("THREAT_VERDICT_DB", DEFAULT_VERDICT_PATH)))
+        return _file_scanner
+
+def file_match_threat(path, matches):
+    """Shape a YARA hit like the other threat dicts."""
+    meta = matches[0].get("meta", {})
+    return {
+        "id": stream_hub.next_id(),
+        "name": f"YARA match: {', '.join(m['rule'] for m in matches)}",
+        "type": meta.get("type", "Malicious File"),
+        "severity": meta.get("severity", "High"),
+        "icon": "🦠",
+        "location": path,
+        "description": meta.get("description", "File matched a YARA rule"),
+        "details": "; ".join(f"{m['rule']} {m.get('tags') or ''}".strip() for m in matches),
+        "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+
+def run_file_scan(job, roots, start=0.0):
+    """YARA-scan ``roots`` as part of ``job``; progress runs from ``start`` to 1."""
+    def on_match(path, matches):
+        threat = file_match_threat(path, matches)
+        job.add_result(threat)
+        get_event_store().add(threat, source="yara")
+
+    def on_progress(stats):
+        job.info["files"] = stats
+        done = stats["scanned"] + stats["cached"]
+        job.set_progress(start + (1.0 - start) * done / max(stats["files"], 1) * 0.99)
+
+    job.info["files"] = {}
+    job.info["files"] = get_file_scanner().scan(roots, on_match, on_progress, lambda: job.cancelled)
+
+def run_scan_job(job, scope):
+    """Background scan: runs each check, publishing findings as partial results."""
+    files = scope in ("full", "files") and bool(SCAN_ROOTS)
+    if scope == "files" and not files:
+        raise RuntimeError("No scan roots configured (set THREAT_SCAN_ROOTS)")
+    if scope != "files":
+        share = 0.5 if files else 1.0
+        found = {t.id: t for t in run_security_scan()}
+        for i, (check_id, _label) in enumerate(SCAN_CHECKS):
+            if job.cancelled:
+                return
+            time.sleep(SCAN_STEP_DELAY)
+            if check_id in found:
+                job.add_result(found[check_id])
+                get_event_store().add(found[check_id], source="scan")
+            job.set_progress(share * (i + 1) / len(SCAN_CHECKS))
+    if files and not job.cancelled:
+        try:
+            run_file_scan(job, SCAN_ROOTS, start=job.progress)
+        except RuntimeError as e:
+            if scope == "files":
+                raise
+            job.info["file_scan"] = f"skipped: {e}"
+
+def submit_scan(scope):
+    """Start (or join) a scan job for ``scope``. Returns the response body and status."""
+    try:
+        job, created = scan_jobs.submit(run_scan_job, ("scan", scope), scope)
+    except JobQueueFull as e:
+        return {"status": "error", "message": str(e)}, 503
+    return {"status": "accepted", "job_id": job.id, "scope": scope, "deduplicated": not created}, 202
+
+def parse_scan_scope(data):
+    """Scan scope from a request body; jobs are shared per scope."""
+    scope = data.get('scope', 'full') if isinstance(data, dict) else 'full'
+    return scope if isinstance(scope, str) and scope else 'full'
+
+@app.route('/api/catalog', methods=['GET'])
+def catalog_endpoint():
+    """Static threat definitions, fetched once by clients of /api/stream?mode=ref."""
+    body, status, headers = catalog_body(request.headers)
+    return Response(body, status=status, headers=headers)
 
 @app.route('/api/scan', methods=['POST'])
 def scan_endpoint():
     try:
-        time.sleep(1)
-        threats = run_security_scan()
-        return jsonify(threats)
+        body, status = submit_scan(parse_scan_scope(request.get_json(silent=True)))
+        return jsonify(body), status
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+@app.route('/api/scan/<job_id>', methods=['GET'])
+def scan_status_endpoint(job_id):
+    job = scan_jobs.get(job_id)
+    if job is None:
+        return jsonify({"status": "error", "message": "Unknown scan job."}), 404
+    since = request.args.get('since', 0, type=int)
+    return job_response(job, since=max(since, 0))
+
+@app.route('/api/scan/<job_id>', methods=['DELETE'])
+def scan_cancel_endpoint(job_id):
+    job = scan_jobs.cancel(job_id)
+    if job is None:
+        return jsonify({"status": "error", "message": "Unknown scan job."}), 404
+    return job_response(job)
+
+ttp_jobs = JobManager("ttp", max_workers=1, max_pending=8)
+_ttp_classifier = None
+_ttp_classifier_lock = threading.Lock()
+
+def get_ttp_classifier():
+    """Shared TTP classifier, created on first use (loads transformers lazily)."""
+    global _ttp_classifier
+    with _ttp_classifier_lock:
+        if _ttp_classifier is None:
+            from detection.ttp_model import TTPClassifier
+            from detection.ttp_prefilter import PrefilteredClassifier
+            _ttp_classifier = PrefilteredClassifier(TTPClassifier())
+        return _ttp_classifier
+
+def resolve_report_paths(paths):
+    """Map request paths to files/dirs under REPORTS_DIR, rejecting anything outside it."""
+    root = os.path.realpath(REPORTS_DIR)
+    resolved = []
+    for path in paths:
+        full = os.path.realpath(os.path.join(root, str(path)))
+        if full != root and not full.startswith(root + os.sep):
+            raise ValueError(f"Path is outside the reports directory: {path}")
+        if not os.path.exists(full):
+            raise ValueError(f"No such report or directory: {path}")
+        resolved.append(full)
+    return resolved
+
+def run_ttp_batch_job(job, paths, batch_size, workers):
+    from detection.ttp_batch import BatchTTPRunner, iter_report_files
+
+    total = max(len(list(iter_report_files(paths))), 1)
+    output = os.path.join(REPORTS_DIR, "results", f"{job.id}.jsonl")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    job.info["output"] = output
+
+    def on_document(record):
+        job.add_result(record)
+        job.set_progress(len(job.results) / total)
+
+    runner = BatchTTPRunner(get_ttp_classifier(), batch_size=batch_size, workers=workers)
+    with open(output, "w", encoding="utf-8") as out:
+        job.info["summary"] = runner.run(paths, out, cancelled=lambda: job.cancelled, on_document=on_document)
+
+def submit_ttp_batch(data):
+    """Start a batch TTP extraction job from a request body. Returns body and status."""
+    if not isinstance(data, dict):
+        return {"status": "error", "message": "Invalid JSON body."}, 400
+    paths = data.get('paths') or ['.']
+    if not isinstance(paths, list):
+        return {"status": "error", "message": "'paths' must be a list."}, 400
+    try:
+        resolved = resolve_report_paths(paths)
+        batch_size = max(1, min(int(data.get('batch_size', 64)), 1024))
+        workers = max(1, min(int(data.get('workers', 4)), 32))
+    except (TypeError, ValueError) as e:
+        return {"status": "error", "message": str(e)}, 400
+    try:
+        job, created = ttp_jobs.submit(run_ttp_batch_job, ("ttp", tuple(sorted(resolved))),
+                                       resolved, batch_size, workers)
+    except JobQueueFull as e:
+        return {"status": "error", "message": str(e)}, 503
+    return {"status": "accepted", "job_id": job.id, "deduplicated": not created}, 202
+
+@app.route('/api/ttp/batch', methods=['POST'])
+def ttp_batch_endpoint():
+    try:
+        body, status = submit_ttp_batch(request.get_json(silent=True))
+        return jsonify(body), status
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+@app.route('/api/ttp/batch/<job_id>', methods=['GET'])
+def ttp_batch_status_endpoint(job_id):
+    job = ttp_jobs.get(job_id)
+    if job is None:
+        return jsonify({"status": "error", "message": "Unknown TTP batch job."}), 404
+    since = request.args.get('since', 0, type=int)
+    return job_response(job, since=max(since, 0))
+
+@app.route('/api/ttp/batch/<job_id>', methods=['DELETE'])
+def ttp_batch_cancel_endpoint(job_id):
+    job = ttp_jobs.cancel(job_id)
+    if job is None:
+        return jsonify({"status": "error", "message": "Unknown TTP batch job."}), 404
+    return job_response(job)
+
+def threat_filters(args):
+    """EventStore filter kwargs from /api/threats query args."""
+    severity = [s for s in args.get('severity', '').split(',') if s]
+    return {
+        "since": parse_time(args.get('since')),
+        "until": parse_time(args.get('until')),
+        "severity": severity or None,
+        "threat_type": args.get('type') or None,
+        "location": args.get('location') or None,
+    }
+
+def query_threats(args):
+    """Run an /api/threats query from request query args; returns the response body."""
+    return get_event_store().query(limit=int(args.get('limit', 100)), cursor=args.get('cursor') or None,
+                             **threat_filters(args))
+
+def export_threats(args):
+    """Stream every matching stored threat as CSV/JSONL/PDF.
+
+    Returns ``(chunks, media_type, filename)``; filters are validated before
+    the first byte is sent, so bad arguments raise ValueError up front.
+    """
+    fmt = args.get('format', 'jsonl')
+    encoder = make_encoder(fmt, title="Threat History Export", fields=EVENT_FIELDS)
+    filters = threat_filters(args)
+    return iter_export(iter_event_store(get_event_store(), **filters), encoder), encoder.media_type, f"threats.{fmt}"
+
+@app.route('/api/threats', methods=['GET'])
+def threats_endpoint():
+    """Stored detections, filtered server-side, newest first, keyset-paginated."""
+    try:
+        return jsonify(query_threats(request.args))
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 500
 
+@app.route('/api/threats/export', methods=['GET'])
+def threats_export_endpoint():
+    """All matching detections as a streamed download (?format=jsonl|csv|pdf)."""
+    try:
+        chunks, media_type, filename = export_threats(request.args)
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    return Response(chunks, mimetype=media_type,
+                    headers={'Content-Disposition': f'attachment; filename="{filename}"'})
+
 @app.route('/api/mitigate', methods=['POST'])
 def mitigate_endpoint():
     try:
-        data = request.get_json()
-        if data is None:
-            return jsonify({"status": "error", "message": "Invalid JSON body."}), 400
-        threat_ids = data.get('threat_ids', [])
-        if not threat_ids:
-            return jsonify({"status": "error", "message": "No threat IDs provided."}), 400
-        
-        result = mitigate_threats_on_backend(threat_ids)
-        return jsonify(result)
+        body, status = submit_mitigation(request.get_json(silent=True))
+        return jsonify(body), status
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 500
 
+@app.route('/api/mitigate/<job_id>', methods=['GET'])
+def mitigate_status_endpoint(job_id):
+    job = mitigation_jobs.get(job_id)
+    if job is None:
+        return jsonify({"status": "error", "message": "Unknown mitigation job."}), 404
+    since = request.args.get('since', 0, type=int)
+    return job_response(job, since=max(since, 0))
+
+@app.route('/api/mitigate/<job_id>', methods=['DELETE'])
+def mitigate_cancel_endpoint(job_id):
+    job = mitigation_jobs.cancel(job_id)
+    if job is None:
+        return jsonify({"status": "error", "message": "Unknown mitigation job."}), 404
+    return job_response(job)
+
+def _produce_threat(hub: BroadcastHub):
+    """Producer tick: publish a detection to every subscriber (60% chance per tick)."""
+    if random.random() < 0.6:
+        threat = _generate_random_threat(hub.next_id())
+        hub.publish("threat", threat.to_json(), event_id=threat.id, compact=threat.to_ref_json())
+        get_event_store().add(threat, source="stream")
+
+# THREAT_WATCH=1 replaces the simulated feed with YARA matches on files that change
+# under THREAT_SCAN_ROOTS. THREAT_WATCH_IGNORE adds globs (os.pathsep separated);
+# THREAT_WATCH_RATE caps how many changed files are scanned per second.
+WATCH_ENABLED = os.environ.get("THREAT_WATCH", "") not in ("", "0") and bool(SCAN_ROOTS)
+_watcher = None
+
+def get_watcher():
+    global _watcher
+    if _watcher is None:
+        from scanner.watch import DEFAULT_IGNORE, ChangeCoalescer, WatchScanner
+        extra = [g for g in os.environ.get("THREAT_WATCH_IGNORE", "").split(os.pathsep) if g]
+        coalescer = ChangeCoalescer(max_rate=float(os.environ.get("THREAT_WATCH_RATE", "100")),
+                                    ignore=DEFAULT_IGNORE + tuple(extra))
+        _watcher = WatchScanner(get_file_scanner(), SCAN_ROOTS, coalescer)
+        _watcher.start()
+    return _watcher
+
+def _produce_file_matches(hub: BroadcastHub):
+    """Producer tick: scan files that changed since the last tick and publish any matches."""
+    def on_match(path, matches):
+        threat = file_match_threat(path, matches)
+        hub.publish("threat", json.dumps(threat), event_id=threat["id"])
+        get_event_store().add(threat, source="watch")
+    get_watcher().poll(on_match=on_match)
+
+# One shared detection feed for all /api/stream clients
+stream_hub = BroadcastHub()
+metrics.gauge("threat_sse_subscribers", "Connected /api/stream clients").set_function(stream_hub.subscriber_count)
+if WATCH_ENABLED:
+    stream_producer = Producer(stream_hub, _produce_file_matches, interval=0.25)
+else:
+    stream_producer = Producer(stream_hub, _produce_threat, interval=1.0)
+
+# The detection engine runs in its own process (threat_engine.py); these routes
+# only forward to its control socket.
+engine_client = EngineClient(timeout=2.0)
+ENGINE_ACTIONS = ("start", "stop")
+
+def engine_request(action, args=None):
+    """Forward an /api/engine request to the engine daemon. Returns the response body and status."""
+    args = args or {}
+    try:
+        if action == "status":
+            return engine_client.status(), 200
+        if action == "logs":
+            return engine_client.logs(since=int(args.get('since', 0)), limit=int(args.get('limit', 500))), 200
+        if action == "start":
+            return {"status": "ok", "started": engine_client.start()}, 200
+        if action == "stop":
+            return {"status": "ok", "drained": engine_client.stop()}, 200
+    except EngineUnavailable as e:
+        return {"status": "error", "message": f"Detection engine is not running ({e})."}, 503
+    except ValueError as e:
+        return {"status": "error", "message": str(e)}, 400
+    return {"status": "error", "message": f"Unknown engine action: {action}"}, 404
+
+@app.route('/api/engine', methods=['GET'])
+def engine_status_endpoint():
+    body, status = engine_request("status")
+    return jsonify(body), status
+
+@app.route('/api/engine/logs', methods=['GET'])
+def engine_logs_endpoint():
+    body, status = engine_request("logs", request.args)
+    return jsonify(body), status
+
+@app.route('/api/engine/<action>', methods=['POST'])
+def engine_action_endpoint(action):
+    if action not in ENGINE_ACTIONS:
+        return jsonify({"status": "error", "message": f"Unknown engine action: {action}"}), 404
+    body, status = engine_request(action)
+    return jsonify(body), status
+
+# THREAT_INGEST_PORT accepts batched telemetry from remote sensor agents (agent.py);
+# their events are deduplicated, scored together and anomalies join the same feed.
+# It listens on THREAT_INGEST_HOST (loopback by default); agents must send
+# THREAT_INGEST_TOKEN when it is set.
+INGEST_PORT = os.environ.get("THREAT_INGEST_PORT")
+ingest_server = None
+
+def publish_agent_detection(threat):
+    threat["id"] = stream_hub.next_id()
+    stream_hub.publish("threat", json.dumps(threat), event_id=threat["id"])
+    get_event_store().add(threat, source="agent")
+
+def start_ingest(port=None, host=None):
+    """Start the agent collector (once) on ``port``; returns the IngestServer."""
+    global ingest_server
+    if ingest_server is None:
+        from detection.batching import BatchScorer
+        from detection.online_model import DEFAULT_MODEL_DIR, OnlineTrainer, SnapshotStore, load_live_model
+        from ingest.collector import Collector, IngestServer
+        store = SnapshotStore(os.environ.get("THREAT_COLLECTOR_MODEL_DIR",
+                                             os.path.join(DEFAULT_MODEL_DIR, "collector")))
+        live = load_live_model(store)
+        token = os.environ.get("THREAT_INGEST_TOKEN") or None
+        collector = Collector(BatchScorer(live), publish_agent_detection, trainer=OnlineTrainer(live, store),
+                              token=token)
+        address = (host or os.environ.get("THREAT_INGEST_HOST", "127.0.0.1"),
+                   int(port if port is not None else INGEST_PORT))
+        if token is None and address[0] not in ("127.0.0.1", "::1", "localhost"):
+            print(f"⚠️  Ingest port {address[0]}:{address[1]} accepts batches from anyone who can "
+                  f"reach it; set THREAT_INGEST_TOKEN", file=sys.stderr)
+        ingest_server = IngestServer(address, collector).serve()
+    return ingest_server
+
+# The server answers /healthz as soon as it listens; subsystems load on a background
+# thread and /readyz turns 200 once they have. With THREAT_WATCH the watcher and its
+# producer start here, so matches are stored before any dashboard connects. THREAT_WARMUP adds optional ones
+# (comma-separated), e.g. "ttp" to load the transformer before the first extraction.
+def _warm_catalog():
+    catalog_body({})
+    threat_catalog.random_event(0).to_json()
+
+WARMUP_TASKS = {
+    "store": lambda: get_event_store().query(limit=1),
+    "catalog": _warm_catalog,
+    "scanner": get_file_scanner,
+    "watcher": lambda: (get_watcher(), stream_producer.ensure_started()),
+    "ingest": start_ingest,
+    "ttp": lambda: get_ttp_classifier().warm_up(),
+}
+
+def warmup_plan():
+    names = ["store", "catalog"]
+    if SCAN_ROOTS:
+        names.append("scanner")
+    if WATCH_ENABLED:
+        names.append("watcher")
+    if INGEST_PORT:
+        names.append("ingest")
+    for name in os.environ.get("THREAT_WARMUP", "").split(","):
+        name = name.strip()
+        if name in WARMUP_TASKS and name not in names:
+            names.append(name)
+    return [(name, WARMUP_TASKS[name]) for name in names]
+
+warmup = startup.Warmup(warmup_plan())
+
+def readiness():
+    """``(body, status)`` for /readyz; the first probe starts the warm-up if nothing else has."""
+    state = warmup.start().snapshot()
+    state["status"] = "ready" if state["ready"] else "starting"
+    state["uptime"] = round(startup.elapsed(), 3)
+    return state, 200 if state["ready"] else 503
+
+@app.route('/readyz', methods=['GET'])
+def readyz():
+    body, status = readiness()
+    return jsonify(body), status
+
 @app.route('/api/stream', methods=['GET'])
 def stream_endpoint():
-    """Server-Sent Events endpoint streaming real-time threat detections."""
+    """Server-Sent Events endpoint streaming real-time threat detections.
+
+    With ``?mode=ref`` catalog threats arrive as ``{id, catalog_ref, timestamp,
+    location}``; the client merges in the fields from /api/catalog.
+    """
+    last_event_id = parse_last_event_id(
+        request.headers.get('Last-Event-ID') or request.args.get('lastEventId'))
+    compact = request.args.get('mode') == 'ref'
+
     def event_stream():
-        yield "retry: 3000\n\n"
-        next_id = 1000
+        stream_producer.ensure_started()
+        sub = stream_hub.subscribe(last_event_id, compact=compact)
         try:
-            last_ping = time.time()
-            while True:
-                if random.random() < 0.6:
-                    threat = _generate_random_threat(next_id)
-                    next_id += 1
-                    payload = json.dumps(threat)
-                    yield f"id: {threat['id']}\n"
-                    yield "event: threat\n"
-                    yield f"data: {payload}\n\n"
-
-                now = time.time()
-                if now - last_ping >= 10:
-                    last_ping = now
-                    yield "event: ping\n"
-                    yield "data: keepalive\n\n"
-
-                time.sleep(1)
+            yield "retry: 3000\n\n"
+            yield from iter_sse(sub)
         except GeneratorExit:
             return
         except Exception as e:
             err = json.dumps({"status": "error", "message": str(e)})
             yield "event: error\n"
             yield f"data: {err}\n\n"
+        finally:
+            sub.close()
 
     response = Response(stream_with_context(event_stream()), mimetype='text/event-stream')
     response.headers['Cache-Control'] = 'no-cache'
@@ -194,4 +642,5 @@ def handle_unexpected_exception(exc: Exception):
     return jsonify({"status": "error", "message": str(exc), "code": 500}), 500
 
 if __name__ == '__main__':
+    warmup.start()
     app.run(host='0.0.0.0', port=5000, debug=True, use_reloader=False, threaded=True)
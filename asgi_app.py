@@ -0,0 +1,275 @@
+"""
+Async (ASGI) serving mode for the threat backend.
+
+Exposes the same routes as app.py, but request handlers and event streams are
+coroutines, so an idle /api/stream connection costs a small task instead of an
+OS thread. Scans run as background jobs on the shared scan pool.
+Detections come from the same shared broadcast hub as the Flask server.
+
+Run with:  python asgi_app.py   (or: uvicorn asgi_app:app --port 5000)
+"""
+
+# First, so THREAT_STARTUP_REPORT=1 can time every import below
+from utils import startup
+startup.track_imports()
+
+import asyncio
+import contextlib
+import json
+import re
+import time
+
+from starlette.applications import Starlette
+from starlette.exceptions import HTTPException
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+from app import (ENGINE_ACTIONS, HTTP_SECONDS, catalog_body, engine_request, export_threats, job_body,
+                 mitigation_jobs, parse_scan_scope, query_threats, readiness, scan_jobs, stream_hub,
+                 stream_producer, submit_mitigation, submit_scan, submit_ttp_batch, ttp_jobs, warmup)
+from utils import metrics
+from utils.broadcast import AsyncSubscription, aiter_sse, parse_last_event_id
+
+
+class RequestTimingMiddleware:
+    """Observe request latency (until response headers) per route, labelled like the Flask app."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        started = time.perf_counter()
+
+        async def timed_send(message):
+            if message["type"] == "http.response.start":
+                route = scope.get("route")
+                template = re.sub(r"\{(\w+)[^}]*\}", r"<\1>", route.path) if route is not None else "unmatched"
+                HTTP_SECONDS.labels(scope["method"], template, message["status"]).observe(
+                    time.perf_counter() - started)
+            await send(message)
+
+        await self.app(scope, receive, timed_send)
+
+
+async def healthz(request: Request):
+    return JSONResponse({"status": "ok"})
+
+
+async def readyz(request: Request):
+    body, status = readiness()
+    return JSONResponse(body, status_code=status)
+
+
+async def metrics_endpoint(request: Request):
+    return Response(metrics.render(), headers={"Content-Type": metrics.CONTENT_TYPE})
+
+
+async def scan_endpoint(request: Request):
+    try:
+        try:
+            data = await request.json()
+        except ValueError:
+            data = None
+        body, status = submit_scan(parse_scan_scope(data))
+        return JSONResponse(body, status_code=status)
+    except Exception as e:
+        return JSONResponse({"status": "error", "message": str(e)}, status_code=500)
+
+
+# Job results can be large: encoding and gzip/brotli run on a worker thread, not the
+# event loop, so open /api/stream connections keep flowing meanwhile.
+async def _job_status(manager, request, label):
+    job = manager.get(request.path_params['job_id'])
+    if job is None:
+        return JSONResponse({"status": "error", "message": f"Unknown {label}."}, status_code=404)
+    try:
+        since = max(int(request.query_params.get('since', 0)), 0)
+    except ValueError:
+        since = 0
+    body, headers = await asyncio.to_thread(job_body, job, request.headers, since)
+    return Response(body, headers=headers)
+
+
+async def _job_cancel(manager, request, label):
+    job = manager.cancel(request.path_params['job_id'])
+    if job is None:
+        return JSONResponse({"status": "error", "message": f"Unknown {label}."}, status_code=404)
+    body, headers = await asyncio.to_thread(job_body, job, request.headers)
+    return Response(body, headers=headers)
+
+
+async def catalog_endpoint(request: Request):
+    """Static threat definitions, fetched once by clients of /api/stream?mode=ref."""
+    body, status, headers = await asyncio.to_thread(catalog_body, request.headers)
+    return Response(body, status_code=status, headers=headers)
+
+
+async def scan_status_endpoint(request: Request):
+    return await _job_status(scan_jobs, request, "scan job")
+
+
+async def scan_cancel_endpoint(request: Request):
+    return await _job_cancel(scan_jobs, request, "scan job")
+
+
+async def ttp_batch_endpoint(request: Request):
+    try:
+        try:
+            data = await request.json()
+        except ValueError:
+            data = None
+        body, status = submit_ttp_batch(data)
+        return JSONResponse(body, status_code=status)
+    except Exception as e:
+        return JSONResponse({"status": "error", "message": str(e)}, status_code=500)
+
+
+async def ttp_batch_status_endpoint(request: Request):
+    return await _job_status(ttp_jobs, request, "TTP batch job")
+
+
+async def ttp_batch_cancel_endpoint(request: Request):
+    return await _job_cancel(ttp_jobs, request, "TTP batch job")
+
+
+async def threats_endpoint(request: Request):
+    """Stored detections, filtered server-side, newest first, keyset-paginated."""
+    try:
+        return JSONResponse(await asyncio.to_thread(query_threats, request.query_params))
+    except ValueError as e:
+        return JSONResponse({"status": "error", "message": str(e)}, status_code=400)
+    except Exception as e:
+        return JSONResponse({"status": "error", "message": str(e)}, status_code=500)
+
+
+async def threats_export_endpoint(request: Request):
+    """All matching detections as a streamed download (?format=jsonl|csv|pdf)."""
+    try:
+        chunks, media_type, filename = export_threats(request.query_params)
+    except ValueError as e:
+        return JSONResponse({"status": "error", "message": str(e)}, status_code=400)
+    # Starlette iterates the synchronous generator on its thread pool
+    return StreamingResponse(chunks, media_type=media_type,
+                             headers={'Content-Disposition': f'attachment; filename="{filename}"'})
+
+
+async def mitigate_endpoint(request: Request):
+    try:
+        try:
+            data = await request.json()
+        except ValueError:
+            data = None
+        body, status = submit_mitigation(data)
+        return JSONResponse(body, status_code=status)
+    except Exception as e:
+        return JSONResponse({"status": "error", "message": str(e)}, status_code=500)
+
+
+async def mitigate_status_endpoint(request: Request):
+    return await _job_status(mitigation_jobs, request, "mitigation job")
+
+
+async def mitigate_cancel_endpoint(request: Request):
+    return await _job_cancel(mitigation_jobs, request, "mitigation job")
+
+
+async def engine_status_endpoint(request: Request):
+    body, status = await asyncio.to_thread(engine_request, "status")
+    return JSONResponse(body, status_code=status)
+
+
+async def engine_logs_endpoint(request: Request):
+    body, status = await asyncio.to_thread(engine_request, "logs", request.query_params)
+    return JSONResponse(body, status_code=status)
+
+
+async def engine_action_endpoint(request: Request):
+    action = request.path_params['action']
+    if action not in ENGINE_ACTIONS:
+        return JSONResponse({"status": "error", "message": f"Unknown engine action: {action}"}, status_code=404)
+    body, status = await asyncio.to_thread(engine_request, action)
+    return JSONResponse(body, status_code=status)
+
+
+async def stream_endpoint(request: Request):
+    """Server-Sent Events endpoint streaming real-time threat detections."""
+    last_event_id = parse_last_event_id(
+        request.headers.get('last-event-id') or request.query_params.get('lastEventId'))
+    compact = request.query_params.get('mode') == 'ref'
+
+    async def event_stream():
+        stream_producer.ensure_started()
+        sub = stream_hub.subscribe(last_event_id, factory=AsyncSubscription, compact=compact)
+        try:
+            yield "retry: 3000\n\n"
+            async for chunk in aiter_sse(sub):
+                yield chunk
+        except Exception as e:
+            err = json.dumps({"status": "error", "message": str(e)})
+            yield f"event: error\ndata: {err}\n\n"
+        finally:
+            sub.close()
+
+    headers = {
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+        'Access-Control-Allow-Origin': '*',
+    }
+    return StreamingResponse(event_stream(), media_type='text/event-stream', headers=headers)
+
+
+async def handle_http_exception(request: Request, exc: HTTPException):
+    return JSONResponse({"status": "error", "message": exc.detail, "code": exc.status_code},
+                        status_code=exc.status_code)
+
+
+async def handle_unexpected_exception(request: Request, exc: Exception):
+    return JSONResponse({"status": "error", "message": str(exc), "code": 500}, status_code=500)
+
+
+routes = [
+    Route('/healthz', healthz, methods=['GET']),
+    Route('/readyz', readyz, methods=['GET']),
+    Route('/metrics', metrics_endpoint, methods=['GET']),
+    Route('/api/catalog', catalog_endpoint, methods=['GET']),
+    Route('/api/scan', scan_endpoint, methods=['POST']),
+    Route('/api/scan/{job_id}', scan_status_endpoint, methods=['GET']),
+    Route('/api/scan/{job_id}', scan_cancel_endpoint, methods=['DELETE']),
+    Route('/api/threats', threats_endpoint, methods=['GET']),
+    Route('/api/threats/export', threats_export_endpoint, methods=['GET']),
+    Route('/api/ttp/batch', ttp_batch_endpoint, methods=['POST']),
+    Route('/api/ttp/batch/{job_id}', ttp_batch_status_endpoint, methods=['GET']),
+    Route('/api/ttp/batch/{job_id}', ttp_batch_cancel_endpoint, methods=['DELETE']),
+    Route('/api/mitigate', mitigate_endpoint, methods=['POST']),
+    Route('/api/mitigate/{job_id}', mitigate_status_endpoint, methods=['GET']),
+    Route('/api/mitigate/{job_id}', mitigate_cancel_endpoint, methods=['DELETE']),
+    Route('/api/engine', engine_status_endpoint, methods=['GET']),
+    Route('/api/engine/logs', engine_logs_endpoint, methods=['GET']),
+    Route('/api/engine/{action}', engine_action_endpoint, methods=['POST']),
+    Route('/api/stream', stream_endpoint, methods=['GET']),
+]
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    # Warm up under any ASGI server, not only when run as a script
+    warmup.start()
+    yield
+
+
+app = Starlette(
+    routes=routes,
+    lifespan=lifespan,
+    middleware=[Middleware(RequestTimingMiddleware),
+                Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*'])],
+    exception_handlers={HTTPException: handle_http_exception, Exception: handle_unexpected_exception},
+)
+
+
+if __name__ == '__main__':
+    import uvicorn
+    uvicorn.run(app, host='0.0.0.0', port=5000, log_level='info')
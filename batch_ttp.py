@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Batch TTP extraction over a directory of threat reports.
+
+Usage:
+    python batch_ttp.py reports/ -o ttps.jsonl --batch-size 64 --workers 4
+
+Writes one JSON line per report (technique IDs and names) as soon as the
+report is finished, then prints throughput in documents per minute.
+"""
+
+import argparse
+import json
+import sys
+
+from detection.ttp_batch import BatchTTPRunner
+from detection.ttp_cache import DEFAULT_CACHE_PATH, TTPCache
+from detection.ttp_model import DEFAULT_THRESHOLD, TTPClassifier
+from detection.ttp_prefilter import PrefilteredClassifier
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Extract ATT&CK TTPs from many reports (PDF/TXT).")
+    parser.add_argument('inputs', nargs='+', help="report files or directories")
+    parser.add_argument('-o', '--output', default='-', help="JSONL output file (default: stdout)")
+    parser.add_argument('--batch-size', type=int, default=64, help="sentences per model call")
+    parser.add_argument('--workers', type=int, default=4, help="text extraction workers")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help="classifier confidence threshold")
+    parser.add_argument('--cache', default=DEFAULT_CACHE_PATH, help="TTP cache database")
+    parser.add_argument('--no-prefilter', action='store_true',
+                        help="send every sentence to the model, even explicit technique/tool mentions")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    classifier = TTPClassifier(threshold=args.threshold, batch_size=args.batch_size)
+    if not args.no_prefilter:
+        classifier = PrefilteredClassifier(classifier)
+    runner = BatchTTPRunner(classifier, TTPCache(args.cache), batch_size=args.batch_size, workers=args.workers)
+    out = sys.stdout if args.output == '-' else open(args.output, 'w', encoding='utf-8')
+    try:
+        summary = runner.run(args.inputs, out)
+    except KeyboardInterrupt:
+        print("\n🛑 Batch extraction interrupted", file=sys.stderr)
+        return 130
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    print(f"📊 {summary['documents']} documents ({summary['failed']} failed), "
+          f"{summary['sentences']} sentences in {summary['seconds']:.1f}s "
+          f"→ {summary['docs_per_min']:.1f} docs/min", file=sys.stderr)
+    if isinstance(classifier, PrefilteredClassifier):
+        print(f"⚡ Pre-filter resolved {classifier.resolved} sentences, "
+              f"{classifier.forwarded} sent to the model", file=sys.stderr)
+    print(json.dumps(summary), file=sys.stderr)
+    return 1 if summary['failed'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Compare feature dicts against TelemetryEvent records + EventBatch.
+
+Measures, for the same synthetic telemetry:
+
+* memory per event while queued (tracemalloc)
+* consumer time per batch: vectorize for the model and produce the alert
+  lines (eager f-strings for dicts, lazy AlertLine for records)
+
+Usage:
+    python benchmarks/bench_events.py --events 200000 --batch-size 256 [--json]
+"""
+
+import argparse
+import gc
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from detection.batching import FeatureVectorizer  # noqa: E402
+from detection.events import AlertLine, EventBatch, TelemetryEvent  # noqa: E402
+
+NAMES = ["python", "chrome", "sshd", "postgres", "nginx", "systemd", "bash", "node"]
+
+
+def make_dicts(n, seed=7):
+    rng = random.Random(seed)
+    now = time.time()
+    return [{
+        "event": "create" if i % 5 == 0 else "change",
+        "kind": "process",
+        "ts": now + i * 1e-3,
+        "pid": 1000 + i,
+        "ppid": 1,
+        "name": rng.choice(NAMES),
+        "cpu": rng.random() * 100,
+        "memory": rng.random() * 10,
+        "open_files": rng.randint(0, 64),
+        "create_time": now - rng.random() * 3600,
+    } for i in range(n)]
+
+
+def measure_memory(build):
+    gc.collect()
+    tracemalloc.start()
+    items = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return current / max(len(items), 1), items
+
+
+def consume_dicts(batches):
+    vectorizer = FeatureVectorizer()
+    out = []
+    for batch in batches:
+        X = vectorizer.transform(batch)
+        out.extend(f"[ALERT] {features} → 1, score={0.0:.3f}" for features in batch)
+    return X, out
+
+
+def consume_records(batches):
+    vectorizer = FeatureVectorizer()
+    out = []
+    for batch in batches:
+        events = EventBatch(batch)
+        X = vectorizer.transform(events)
+        out.extend(AlertLine(event, 1, 0.0) for event in batch)
+    return X, out
+
+
+def timed(func, *args, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def chunk(items, size):
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark dict vs record telemetry events.")
+    parser.add_argument("--events", type=int, default=200000)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args(argv)
+
+    dict_bytes, dicts = measure_memory(lambda: make_dicts(args.events))
+    record_bytes, records = measure_memory(
+        lambda: [TelemetryEvent.from_dict(d) for d in make_dicts(args.events)])
+
+    dict_s = timed(consume_dicts, chunk(dicts, args.batch_size))
+    record_s = timed(consume_records, chunk(records, args.batch_size))
+
+    results = {
+        "events": args.events,
+        "batch_size": args.batch_size,
+        "dict_bytes_per_event": round(dict_bytes, 1),
+        "record_bytes_per_event": round(record_bytes, 1),
+        "dict_consumer_us_per_event": round(dict_s / args.events * 1e6, 3),
+        "record_consumer_us_per_event": round(record_s / args.events * 1e6, 3),
+        "memory_ratio": round(record_bytes / dict_bytes, 3),
+        "speedup": round(dict_s / record_s, 2),
+    }
+    if args.json:
+        print(json.dumps(results))
+    else:
+        print(f"📦 memory/event: dict {results['dict_bytes_per_event']} B, "
+              f"record {results['record_bytes_per_event']} B ({results['memory_ratio']:.0%})")
+        print(f"⚡ consumer/event: dict {results['dict_consumer_us_per_event']} µs, "
+              f"record {results['record_consumer_us_per_event']} µs ({results['speedup']}x)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
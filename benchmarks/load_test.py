@@ -0,0 +1,445 @@
+#!/usr/bin/env python3
+"""
+Load generator and benchmark suite for the backend and the detection pipeline.
+
+Scenarios (run any subset with ``--scenarios``):
+
+* ``scan``      POST /api/scan at ``--rate`` requests/s
+* ``mitigate``  POST /api/mitigate (``--batch`` threat IDs per request)
+* ``sse``       ``--clients`` /api/stream subscribers; events are published at
+                ``--rate`` and delivery latency is measured per client
+* ``pipeline``  telemetry replayed at ``--rate`` events/s through the same
+                normalize -> score stages ThreatApp runs (latency from inlet to
+                scored), synthetic or from a JSONL file (``--replay``)
+
+Load is open-loop: requests are scheduled at fixed intervals and latency is
+measured from the scheduled time, so a stalled server shows up as queueing
+delay instead of silently lowering the offered rate. With ``--wait`` the
+scan/mitigate scenarios also poll each job and report completion latency.
+
+By default the Flask app is served in-process on a free port; ``--url``
+targets a running backend instead (the sse scenario needs the in-process
+server, because it publishes its own timestamped events).
+
+Usage:
+    python benchmarks/load_test.py --scenarios scan,sse --rate 50 --duration 10 --clients 20 \\
+        --output results.json [--compare baseline.json]
+"""
+
+import argparse
+import http.client
+import json
+import logging
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SCENARIOS = ("scan", "mitigate", "sse", "pipeline")
+TERMINAL = ("done", "failed", "cancelled")
+
+
+# ---------------- measurement ----------------
+
+def percentiles(samples_ms):
+    """Latency summary in milliseconds (nearest-rank percentiles)."""
+    if not samples_ms:
+        return {"count": 0}
+    s = sorted(samples_ms)
+
+    def rank(p):
+        return s[min(len(s) - 1, max(0, int(round(p / 100.0 * len(s))) - 1))]
+
+    return {
+        "count": len(s),
+        "mean": round(sum(s) / len(s), 3),
+        "p50": round(rank(50), 3),
+        "p95": round(rank(95), 3),
+        "p99": round(rank(99), 3),
+        "max": round(s[-1], 3),
+    }
+
+
+class Recorder:
+    """Thread-safe collector of latency samples and outcome counts."""
+
+    def __init__(self):
+        self.samples = {}
+        self.counts = {}
+        self._lock = threading.Lock()
+
+    def sample(self, name, ms):
+        with self._lock:
+            self.samples.setdefault(name, []).append(ms)
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + n
+
+    def summary(self, elapsed):
+        with self._lock:
+            out = {"seconds": round(elapsed, 3), "counts": dict(self.counts)}
+            for name, values in self.samples.items():
+                out[f"{name}_ms"] = percentiles(values)
+                out[f"{name}_per_sec"] = round(len(values) / max(elapsed, 1e-9), 1)
+            return out
+
+
+def run_open_loop(call, rate, duration, concurrency):
+    """Call ``call(scheduled_time)`` ``rate`` times per second for ``duration`` seconds."""
+    interval = 1.0 / rate
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="load") as pool:
+        i = 0
+        while True:
+            scheduled = start + i * interval
+            if scheduled - start >= duration:
+                break
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(call, scheduled)
+            i += 1
+    return time.perf_counter() - start
+
+
+# ---------------- HTTP ----------------
+
+class Client:
+    """Minimal keep-alive JSON client, one connection per thread (stdlib only)."""
+
+    def __init__(self, base_url, timeout=30):
+        parts = urlsplit(base_url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        return conn
+
+    def request(self, method, path, body=None):
+        data = json.dumps(body).encode("utf-8") if body is not None else None
+        headers = {"Content-Type": "application/json"} if data is not None else {}
+        for attempt in (0, 1):
+            conn = self._conn()
+            try:
+                conn.request(method, path, body=data, headers=headers)
+                resp = conn.getresponse()
+                payload = resp.read()
+                return resp.status, json.loads(payload) if payload else None
+            except (http.client.HTTPException, OSError):
+                conn.close()
+                self._local.conn = None
+                if attempt:
+                    raise
+
+    def wait_job(self, path, timeout=60, poll=0.05):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            status, job = self.request("GET", path)
+            if status != 200 or job.get("status") in TERMINAL:
+                return job
+            time.sleep(poll)
+        return None
+
+
+def serve_in_process():
+    """Start the Flask app on a free local port; returns (base_url, shutdown)."""
+    os.environ.setdefault("THREAT_DB_PATH", os.path.join(tempfile.mkdtemp(), "bench_events.db"))
+    from werkzeug.serving import make_server
+
+    from app import app
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)   # no per-request access log
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, name="bench-server", daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}", server.shutdown
+
+
+# ---------------- scenarios ----------------
+
+def bench_job_endpoint(client, args, path, make_body):
+    rec = Recorder()
+
+    def call(scheduled):
+        try:
+            status, body = client.request("POST", path, make_body())
+        except Exception:
+            rec.count("errors")
+            return
+        rec.sample("latency", (time.perf_counter() - scheduled) * 1000)
+        rec.count(str(status))
+        if args.wait and status == 202:
+            job = client.wait_job(f"{path}/{body['job_id']}")
+            if job is None:
+                rec.count("timeouts")
+            else:
+                rec.sample("completion", (time.perf_counter() - scheduled) * 1000)
+
+    elapsed = run_open_loop(call, args.rate, args.duration, args.concurrency)
+    return dict(rec.summary(elapsed), offered_rate=args.rate)
+
+
+def bench_scan(client, args):
+    scopes = ["quick", "full"]
+    return bench_job_endpoint(client, args, "/api/scan", lambda: {"scope": random.choice(scopes)})
+
+
+def bench_mitigate(client, args):
+    ids = iter(range(1, 1 << 62))
+    lock = threading.Lock()
+
+    def body():
+        with lock:
+            return {"threat_ids": [next(ids) for _ in range(args.batch)]}
+
+    return bench_job_endpoint(client, args, "/api/mitigate", body)
+
+
+def _sse_client(client, rec, sockets, ready):
+    conn = http.client.HTTPConnection(client.host, client.port, timeout=10)
+    try:
+        conn.request("GET", "/api/stream", headers={"Accept": "text/event-stream"})
+        sock = conn.sock             # getresponse() drops it from conn for a streamed body
+        resp = conn.getresponse()
+    except Exception:
+        rec.count("client_errors")
+        return
+    finally:
+        ready.release()
+    sock.settimeout(None)            # bench_sse shuts the socket down to stop the reader
+    sockets.append(sock)
+    try:
+        for line in resp.fp:
+            if line.startswith(b"data: ") and b"bench_sent" in line:
+                sent = json.loads(line[6:])["bench_sent"]
+                rec.sample("delivery", (time.time() - sent) * 1000)
+    except (OSError, ValueError):
+        pass
+
+
+def bench_sse(client, args, in_process):
+    if not in_process:
+        return {"skipped": "sse needs the in-process server (omit --url)"}
+    from app import stream_hub
+    rec = Recorder()
+    sockets = []
+    ready = threading.Semaphore(0)
+    threads = [threading.Thread(target=_sse_client, args=(client, rec, sockets, ready), daemon=True)
+               for _ in range(args.clients)]
+    for t in threads:
+        t.start()
+    for _ in threads:
+        ready.acquire(timeout=10)
+    time.sleep(0.2)              # let every subscriber register with the hub
+
+    def publish(_scheduled):
+        event_id = stream_hub.next_id()
+        stream_hub.publish("threat", json.dumps({"id": event_id, "bench_sent": time.time()}),
+                           event_id=event_id)
+        rec.count("published")
+
+    elapsed = run_open_loop(publish, args.rate, args.duration, 1)
+    time.sleep(1.0)              # drain in-flight deliveries
+    for sock in sockets:
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+    for t in threads:
+        t.join(timeout=5)
+    out = rec.summary(elapsed)
+    expected = out["counts"].get("published", 0) * args.clients
+    delivered = out.get("delivery_ms", {}).get("count", 0)
+    out.update(clients=args.clients, offered_rate=args.rate,
+               delivered_ratio=round(delivered / expected, 4) if expected else None)
+    return out
+
+
+def _synthetic_telemetry(rng):
+    return {
+        "kind": "process",
+        "event": "change",
+        "pid": rng.randint(100, 60000),
+        "name": rng.choice(["python", "chrome", "sshd", "nginx", "bash", "node"]),
+        "cpu": rng.random() * (100 if rng.random() < 0.01 else 20),
+        "memory": rng.random() * 5,
+        "open_files": rng.randint(0, 64),
+    }
+
+
+def load_replay(path):
+    with open(path, "r", encoding="utf-8") as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    return [r for r in records if isinstance(r, dict)]
+
+
+def bench_pipeline(args):
+    """Replay telemetry through normalize -> score, mirroring ThreatApp's stages."""
+    from detection.batching import BatchScorer
+    from detection.events import EventBatch, TelemetryEvent
+    from detection.online_model import OnlineAnomalyModel
+    from detection.pipeline import BLOCK, DROP_OLDEST, Pipeline, Stage
+
+    rng = random.Random(7)
+    model = OnlineAnomalyModel(min_samples=0)
+    model.partial_fit(EventBatch([TelemetryEvent.from_dict(_synthetic_telemetry(rng)) for _ in range(2000)]))
+    scorer = BatchScorer(model)
+    rec = Recorder()
+
+    def normalize(batch):
+        return [TelemetryEvent.from_dict(f, default_ts=f["ts"]) for f in batch]
+
+    def score(batch):
+        labels, _ = scorer.score(EventBatch(batch))
+        now = time.time()
+        for event, label in zip(batch, labels):
+            rec.sample("latency", (now - event.ts) * 1000)
+        rec.count("anomalies", sum(1 for l in labels if l == -1))
+        return None
+
+    pipeline = Pipeline([
+        Stage("normalize", normalize, capacity=10000, policy=DROP_OLDEST),
+        Stage("score", score, capacity=4096, policy=BLOCK, batch_size=256, max_wait=0.05),
+    ])
+    running = threading.Event()
+    running.set()
+    pipeline.start(running)
+
+    source = load_replay(args.replay) if args.replay else None
+    counter = iter(range(1 << 62))
+    lock = threading.Lock()
+
+    def send(_scheduled):
+        with lock:
+            i = next(counter)
+        features = dict(source[i % len(source)]) if source else _synthetic_telemetry(rng)
+        features["ts"] = time.time()
+        pipeline.inlet.put(features)
+
+    elapsed = run_open_loop(send, args.rate, args.duration, 1)
+    deadline = time.monotonic() + 10
+    while pipeline.depth() and time.monotonic() < deadline:
+        time.sleep(0.05)
+    time.sleep(0.2)
+    running.clear()
+    out = rec.summary(elapsed)
+    out.update(offered_rate=args.rate, stages=pipeline.stats(),
+               replay=args.replay or "synthetic")
+    return out
+
+
+# ---------------- reporting ----------------
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def compare(results, baseline):
+    """Print p99 and throughput changes against a previous results file."""
+    for name, current in results["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if not previous:
+            continue
+        for key, value in current.items():
+            if not key.endswith("_ms") or key not in previous:
+                continue
+            old, new = previous[key].get("p99"), value.get("p99")
+            rate_key = key[:-3] + "_per_sec"
+            if old and new:
+                print(f"  {name}.{key[:-3]}: p99 {old} -> {new} ms ({(new - old) / old:+.1%}), "
+                      f"{previous.get(rate_key)} -> {current.get(rate_key)}/s")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the backend API and detection pipeline.")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        help=f"comma-separated subset of: {', '.join(SCENARIOS)}")
+    parser.add_argument("--url", help="benchmark a running backend instead of an in-process one")
+    parser.add_argument("--rate", type=float, default=20.0, help="requests (or events) per second")
+    parser.add_argument("--pipeline-rate", type=float, default=5000.0, help="telemetry events per second")
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds per scenario")
+    parser.add_argument("--concurrency", type=int, default=32, help="max in-flight HTTP requests")
+    parser.add_argument("--clients", type=int, default=10, help="SSE subscribers")
+    parser.add_argument("--batch", type=int, default=5, help="threat IDs per mitigation request")
+    parser.add_argument("--wait", action="store_true", help="also poll jobs and report completion latency")
+    parser.add_argument("--replay", help="JSONL telemetry file to replay through the pipeline")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--compare", help="previous results JSON to compare against")
+    args = parser.parse_args(argv)
+
+    selected = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = set(selected) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(sorted(unknown))}")
+    if args.rate <= 0 or args.pipeline_rate <= 0 or args.duration <= 0:
+        parser.error("--rate, --pipeline-rate and --duration must be positive")
+
+    results = {
+        "started": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "args": vars(args),
+        "scenarios": {},
+    }
+    shutdown = None
+    client = None
+    if {"scan", "mitigate", "sse"} & set(selected):
+        base_url = args.url
+        if not base_url:
+            base_url, shutdown = serve_in_process()
+        client = Client(base_url)
+        results["target"] = base_url
+
+    try:
+        for name in selected:
+            print(f"⏱  {name} ...", flush=True)
+            if name == "scan":
+                out = bench_scan(client, args)
+            elif name == "mitigate":
+                out = bench_mitigate(client, args)
+            elif name == "sse":
+                out = bench_sse(client, args, in_process=shutdown is not None)
+            else:
+                out = bench_pipeline(argparse.Namespace(**dict(vars(args), rate=args.pipeline_rate)))
+            results["scenarios"][name] = out
+            for key, value in out.items():
+                if key.endswith("_ms") and value.get("count"):
+                    print(f"   {key[:-3]}: p50 {value['p50']} / p95 {value['p95']} / p99 {value['p99']} ms, "
+                          f"{out.get(key[:-3] + '_per_sec')}/s")
+            if out.get("counts"):
+                print(f"   counts: {out['counts']}")
+    finally:
+        if shutdown:
+            shutdown()
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, default=str)
+        print(f"📄 Results written to {args.output}")
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            print(f"📊 Compared with {args.compare}:")
+            compare(results, json.load(f))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
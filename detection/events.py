@@ -0,0 +1,180 @@
+"""
+Compact telemetry records.
+
+``TelemetryEvent`` is a fixed-schema ``__slots__`` record that replaces the
+per-event feature dict once telemetry leaves the normalize stage: string
+fields are interned, numeric fields are plain floats, and anything outside
+the schema is kept in a single ``detail`` string.
+
+``EventBatch`` packs a list of records into one NumPy structured array
+(categorical fields as integer codes), so the scorer can slice feature
+columns out of it directly instead of walking dicts key by key.
+
+``AlertLine`` defers the ``[ALERT] ...`` text until a line is displayed,
+spilled to disk or exported.
+"""
+
+import sys
+import threading
+
+import numpy as np
+
+NUMERIC_FIELDS = ("ts", "pid", "ppid", "cpu", "memory", "open_files", "lport", "rport")
+CATEGORICAL_FIELDS = ("kind", "event", "name", "status")
+# Scoring columns; ts is bookkeeping, not behaviour
+FEATURE_COLUMNS = tuple(sorted(f for f in NUMERIC_FIELDS if f != "ts"))
+DETAIL_KEYS = ("cmdline", "laddr", "raddr", "process", "details")
+
+EVENT_DTYPE = np.dtype([(f, np.float64) for f in NUMERIC_FIELDS]
+                       + [(f, np.int32) for f in CATEGORICAL_FIELDS])
+
+
+class Vocabulary:
+    """Interned string <-> integer code table for categorical fields (code 0 is None)."""
+
+    def __init__(self):
+        self._codes = {None: 0}
+        self._values = [None]
+        self._lock = threading.Lock()
+
+    def code(self, value):
+        code = self._codes.get(value)
+        if code is None:
+            with self._lock:
+                code = self._codes.get(value)
+                if code is None:
+                    code = self._codes[value] = len(self._values)
+                    self._values.append(value)
+        return code
+
+    def value(self, code):
+        return self._values[code]
+
+    def __len__(self):
+        return len(self._values)
+
+
+VOCAB = Vocabulary()
+
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else (None if value is None else sys.intern(str(value)))
+
+
+class TelemetryEvent:
+    __slots__ = NUMERIC_FIELDS + CATEGORICAL_FIELDS + ("detail",)
+
+    def __init__(self, kind=None, event=None, name=None, status=None, ts=0.0, pid=0.0, ppid=0.0,
+                 cpu=0.0, memory=0.0, open_files=0.0, lport=0.0, rport=0.0, detail=None):
+        self.kind = _intern(kind)
+        self.event = _intern(event)
+        self.name = _intern(name)
+        self.status = _intern(status)
+        self.ts = float(ts)
+        self.pid = float(pid)
+        self.ppid = float(ppid)
+        self.cpu = float(cpu)
+        self.memory = float(memory)
+        self.open_files = float(open_files)
+        self.lport = float(lport)
+        self.rport = float(rport)
+        self.detail = detail
+
+    @classmethod
+    def from_dict(cls, features, default_ts=0.0):
+        """Build a record from a monitor's feature dict; unknown keys go to ``detail``."""
+        self = cls.__new__(cls)
+        get = features.get
+        for field in CATEGORICAL_FIELDS:
+            setattr(self, field, _intern(get(field)))
+        if self.name is None:
+            self.name = _intern(get("process"))
+        for field in NUMERIC_FIELDS:
+            value = get(field)
+            setattr(self, field, float(value) if isinstance(value, (int, float)) else 0.0)
+        if not self.ts:
+            self.ts = float(default_ts)
+        detail = [f"{k}={features[k]}" for k in DETAIL_KEYS if features.get(k)]
+        self.detail = " ".join(detail) or None
+        return self
+
+    def get(self, key, default=None):
+        if key in self.__slots__:
+            value = getattr(self, key)
+            return default if value is None else value
+        return default
+
+    def __getitem__(self, key):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def to_dict(self):
+        out = {f: getattr(self, f) for f in CATEGORICAL_FIELDS if getattr(self, f) is not None}
+        out.update((f, getattr(self, f)) for f in NUMERIC_FIELDS)
+        if self.detail:
+            out["detail"] = self.detail
+        return out
+
+    def __repr__(self):
+        parts = [f"{self.kind or 'event'}:{self.event or '-'}", f"pid={int(self.pid)}"]
+        if self.name:
+            parts.append(f"name={self.name}")
+        if self.cpu or self.memory:
+            parts.append(f"cpu={self.cpu:.1f} mem={self.memory:.2f}")
+        if self.lport or self.rport:
+            parts.append(f"lport={int(self.lport)} rport={int(self.rport)}")
+        if self.status:
+            parts.append(f"status={self.status}")
+        if self.detail:
+            parts.append(self.detail)
+        return " ".join(parts)
+
+
+class EventBatch:
+    """A batch of TelemetryEvents backed by one structured array."""
+
+    def __init__(self, events, vocab=VOCAB):
+        self.events = events
+        self.vocab = vocab
+        data = np.empty(len(events), dtype=EVENT_DTYPE)
+        for field in NUMERIC_FIELDS:
+            data[field] = [getattr(e, field) for e in events]
+        code = vocab.code
+        for field in CATEGORICAL_FIELDS:
+            data[field] = [code(getattr(e, field)) for e in events]
+        self.data = data
+
+    def __len__(self):
+        return len(self.events)
+
+    def __iter__(self):
+        return iter(self.events)
+
+    def __getitem__(self, i):
+        return self.events[i]
+
+    def matrix(self, columns=FEATURE_COLUMNS):
+        """Float matrix of ``columns``; names outside the schema become zero columns."""
+        X = np.zeros((len(self.data), len(columns)), dtype=np.float64)
+        for j, col in enumerate(columns):
+            if col in NUMERIC_FIELDS:
+                X[:, j] = self.data[col]
+        return X
+
+    def codes(self, field):
+        return self.data[field]
+
+
+class AlertLine:
+    """One scored event in the log; rendered to text only when someone reads it."""
+
+    __slots__ = ("event", "label", "score")
+
+    def __init__(self, event, label, score):
+        self.event = event
+        self.label = label
+        self.score = score
+
+    def __str__(self):
+        return f"[ALERT] {self.event!r} → {self.label}, score={self.score:.3f}"
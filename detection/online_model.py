@@ -0,0 +1,286 @@
+"""
+Incrementally trained anomaly model with on-disk snapshots.
+
+OnlineAnomalyModel keeps per-column streaming statistics (count, mean and
+sum of squared deviations) and flags rows whose largest z-score exceeds a
+threshold. ``partial_fit`` merges a whole batch at once (Chan et al.), and
+older observations are exponentially down-weighted with a half-life given in
+events, so the baseline follows recent telemetry instead of all history.
+
+Training never runs on the scoring path:
+
+* the scorer calls ``OnlineTrainer.observe(batch, labels)``, which only
+  appends a reference to a bounded deque
+* the trainer thread fits a copy of the live model on the queued batches,
+  saves it as a new snapshot and swaps it into the LiveModel in one
+  attribute assignment, so scoring always sees either the old or the new
+  model, never a half-updated one
+
+Snapshots are ``model-<version>.npy`` (a 3 x columns float64 array) plus a
+small JSON sidecar, written to a temporary file and renamed into place. They
+are loaded with ``mmap_mode="r"``, so startup cost does not depend on how
+long the baseline has been learning.
+"""
+
+import collections
+import glob
+import json
+import os
+import re
+import threading
+import time
+
+import numpy as np
+
+from detection.batching import score_matrix
+from detection.events import FEATURE_COLUMNS, EventBatch
+
+DEFAULT_MODEL_DIR = os.path.join(os.path.expanduser("~"), ".cache", "threat_app", "models")
+_SNAPSHOT_RE = re.compile(r"model-(\d+)\.npy$")
+
+
+def _as_matrix(data, columns):
+    """Float matrix from a matrix, an EventBatch or an EVENT_DTYPE structured array."""
+    if isinstance(data, EventBatch):
+        return data.matrix(columns)
+    data = np.asarray(data)
+    if data.dtype.names:
+        X = np.zeros((len(data), len(columns)), dtype=np.float64)
+        for j, col in enumerate(columns):
+            if col in data.dtype.names:
+                X[:, j] = data[col]
+        return X
+    return data.astype(np.float64, copy=False)
+
+
+class OnlineAnomalyModel:
+    """Z-score anomaly model over streaming per-column statistics.
+
+    Scores follow the ``decision_function`` convention (negative means
+    anomalous). Until ``min_samples`` events have been seen every row is
+    treated as normal.
+    """
+
+    def __init__(self, columns=FEATURE_COLUMNS, threshold=4.0, half_life=100000, min_samples=500):
+        self.columns = list(columns)
+        self.threshold = threshold
+        self.half_life = half_life
+        self.min_samples = min_samples
+        self.version = 0
+        n = len(self.columns)
+        self.count = 0.0
+        self.mean = np.zeros(n)
+        self.m2 = np.zeros(n)
+
+    @property
+    def ready(self):
+        return self.count >= self.min_samples
+
+    def copy(self):
+        other = OnlineAnomalyModel(self.columns, self.threshold, self.half_life, self.min_samples)
+        other.version = self.version
+        other.count, other.mean, other.m2 = self.count, np.array(self.mean), np.array(self.m2)
+        return other
+
+    def partial_fit(self, X):
+        X = _as_matrix(X, self.columns)
+        n = len(X)
+        if not n:
+            return self
+        if self.half_life and self.count:
+            decay = 0.5 ** (n / self.half_life)
+            self.count *= decay
+            self.m2 = self.m2 * decay
+        batch_mean = X.mean(axis=0)
+        batch_m2 = ((X - batch_mean) ** 2).sum(axis=0)
+        total = self.count + n
+        delta = batch_mean - self.mean
+        self.mean = self.mean + delta * (n / total)
+        self.m2 = self.m2 + batch_m2 + delta ** 2 * (self.count * n / total)
+        self.count = total
+        return self
+
+    def _zscores(self, X):
+        std = np.sqrt(self.m2 / max(self.count - 1, 1.0))
+        # constant columns: any deviation counts as one std of 1
+        return np.abs(X - self.mean) / np.where(std > 1e-9, std, 1.0)
+
+    def decision_function(self, X):
+        X = _as_matrix(X, self.columns)
+        if not self.ready:
+            return np.full(len(X), self.threshold)
+        return self.threshold - self._zscores(X).max(axis=1, initial=0.0)
+
+    def predict_score_batch(self, X):
+        scores = self.decision_function(X)
+        return np.where(scores < 0, -1, 1), scores
+
+    # ---- snapshots ----
+
+    def state(self):
+        return np.vstack([np.full(len(self.columns), self.count), self.mean, self.m2])
+
+    def meta(self):
+        return {"version": self.version, "columns": self.columns, "threshold": self.threshold,
+                "half_life": self.half_life, "min_samples": self.min_samples}
+
+    @classmethod
+    def from_snapshot(cls, state, meta):
+        model = cls(meta["columns"], meta["threshold"], meta["half_life"], meta["min_samples"])
+        model.version = meta["version"]
+        # mmap-backed rows are read-only; partial_fit replaces them rather than writing in place
+        model.count, model.mean, model.m2 = float(state[0, 0]) if state.shape[1] else 0.0, state[1], state[2]
+        return model
+
+
+class SnapshotStore:
+    """Versioned model snapshots in one directory; keeps the newest ``keep``."""
+
+    def __init__(self, directory=DEFAULT_MODEL_DIR, keep=5):
+        self.directory = directory
+        self.keep = keep
+        os.makedirs(directory, exist_ok=True)
+
+    def versions(self):
+        found = []
+        for path in glob.glob(os.path.join(self.directory, "model-*.npy")):
+            m = _SNAPSHOT_RE.search(path)
+            if m:
+                found.append(int(m.group(1)))
+        return sorted(found)
+
+    def _path(self, version, ext):
+        return os.path.join(self.directory, f"model-{version:08d}.{ext}")
+
+    def save(self, model):
+        """Write ``model``, bumping its version past any saved one; returns the version."""
+        versions = self.versions()
+        if versions and model.version <= versions[-1]:
+            model.version = versions[-1] + 1
+        meta_path, npy_path = self._path(model.version, "json"), self._path(model.version, "npy")
+        with open(meta_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(dict(model.meta(), saved=time.time()), f)
+        os.replace(meta_path + ".tmp", meta_path)
+        # np.save appends .npy unless the name already ends with it
+        tmp = npy_path[:-4] + ".tmp.npy"
+        np.save(tmp, model.state())
+        os.replace(tmp, npy_path)
+        for old in versions[:max(len(versions) + 1 - self.keep, 0)]:
+            for ext in ("npy", "json"):
+                try:
+                    os.remove(self._path(old, ext))
+                except OSError:
+                    pass
+        return model.version
+
+    def load(self, version=None):
+        """Load a snapshot (the newest by default) memory-mapped; None when there is none."""
+        versions = self.versions()
+        if version is None:
+            if not versions:
+                return None
+            version = versions[-1]
+        with open(self._path(version, "json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        return OnlineAnomalyModel.from_snapshot(np.load(self._path(version, "npy"), mmap_mode="r"), meta)
+
+
+class LiveModel:
+    """Stable handle the scorer holds; ``swap()`` replaces the model behind it atomically.
+
+    While the online model has too little data it delegates to ``fallback``
+    (the static model), so a fresh install still scores something.
+    """
+
+    def __init__(self, model, fallback=None):
+        self.current = model
+        self.fallback = fallback
+
+    def swap(self, model):
+        self.current = model
+
+    def predict_score_batch(self, X):
+        model = self.current
+        if not model.ready and self.fallback is not None:
+            return score_matrix(self.fallback, X, model.columns)
+        return model.predict_score_batch(X)
+
+
+class OnlineTrainer:
+    """Background thread that folds scored batches into the live model.
+
+    Only rows scored as normal are learned, so detections do not drag the
+    baseline toward the attack. Every ``interval`` seconds the queued batches
+    are fitted into a copy of the live model, snapshotted and swapped in.
+    """
+
+    def __init__(self, live, store=None, interval=30.0, max_batches=256):
+        self.live = live
+        self.store = store
+        self.interval = interval
+        self._pending = collections.deque(maxlen=max_batches)
+        self._stop = threading.Event()
+        self._thread = None
+        self.stats = {"batches": 0, "rows": 0, "dropped": 0, "updates": 0, "version": live.current.version}
+
+    def observe(self, batch, labels):
+        """Queue a scored batch (matrix, EventBatch or structured array); O(1)."""
+        if isinstance(batch, EventBatch):
+            batch = batch.data
+        if len(self._pending) == self._pending.maxlen:
+            self.stats["dropped"] += 1
+        self._pending.append((batch, labels))
+
+    def train_once(self):
+        """Fit everything queued so far; returns the new model or None."""
+        items = []
+        while self._pending:
+            items.append(self._pending.popleft())
+        if not items:
+            return None
+        model = self.live.current.copy()
+        columns = model.columns
+        rows = [_as_matrix(b, columns)[np.asarray(l) != -1] for b, l in items]
+        X = np.concatenate(rows) if rows else np.empty((0, len(columns)))
+        model.partial_fit(X)
+        model.version += 1
+        if self.store is not None:
+            self.store.save(model)
+        self.live.swap(model)
+        self.stats["batches"] += len(items)
+        self.stats["rows"] += len(X)
+        self.stats["updates"] += 1
+        self.stats["version"] = model.version
+        return model
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            if not self._stop.is_set():
+                return
+            # Stopping: let it finish its final update, then start a fresh thread
+            self._thread.join()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="online-trainer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def join(self, timeout=None):
+        """Wait for the thread to finish its final update after ``stop()``."""
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.train_once()
+            except Exception as e:
+                print(f"[ERROR] Online model update failed: {e}")
+        self.train_once()
+
+
+def load_live_model(store=None, fallback=None, **options):
+    """LiveModel from the newest snapshot in ``store``, or a fresh model."""
+    model = store.load() if store is not None else None
+    return LiveModel(model or OnlineAnomalyModel(**options), fallback)
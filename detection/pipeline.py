@@ -0,0 +1,168 @@
+"""
+Bounded, staged telemetry pipeline: collect -> normalize -> score -> mitigate.
+
+Every stage reads micro-batches from a bounded input queue and runs on a
+configurable number of worker threads. When a queue is full its overflow
+policy decides what happens:
+
+* ``block``        the producer waits (backpressure up the chain)
+* ``drop_oldest``  the oldest queued item is discarded to make room
+* ``sample``       one of every ``sample_every`` overflowing items is kept
+                   (replacing the oldest), the rest are discarded
+
+Queue depth, drops and per-stage throughput are available from ``stats()``.
+"""
+
+import queue
+import threading
+import time
+
+from detection.batching import BatchStats, drain_batch
+from utils import metrics
+
+BLOCK = "block"
+DROP_OLDEST = "drop_oldest"
+SAMPLE = "sample"
+POLICIES = (BLOCK, DROP_OLDEST, SAMPLE)
+
+QUEUE_DEPTH = metrics.gauge("threat_pipeline_queue_depth", "Items waiting in a pipeline stage's queue", ["stage"])
+QUEUE_DROPPED = metrics.counter("threat_pipeline_dropped_total", "Items dropped by a stage's overflow policy",
+                                ["stage"])
+STAGE_SECONDS = metrics.histogram("threat_pipeline_batch_seconds", "Time to process one batch in a stage",
+                                  ["stage"])
+
+
+class BoundedQueue(queue.Queue):
+    """``queue.Queue`` with a fixed capacity and a selectable overflow policy."""
+
+    def __init__(self, maxsize=1024, policy=BLOCK, sample_every=10):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown overflow policy: {policy!r}")
+        super().__init__(maxsize=maxsize)
+        self.policy = policy
+        self.sample_every = max(1, int(sample_every))
+        self.enqueued = 0
+        self.dropped = 0
+        self._overflow = 0
+
+    def put(self, item, block=True, timeout=None):
+        if self.policy == BLOCK:
+            super().put(item, block, timeout)
+            with self.mutex:
+                self.enqueued += 1
+            return
+        with self.mutex:
+            if 0 < self.maxsize <= self._qsize():
+                self._overflow += 1
+                if self.policy == SAMPLE and self._overflow % self.sample_every:
+                    self.dropped += 1
+                    return
+                self._get()
+                self.dropped += 1
+                self.unfinished_tasks -= 1
+            self._put(item)
+            self.enqueued += 1
+            self.unfinished_tasks += 1
+            self.not_empty.notify()
+
+    def put_while(self, item, running_flag, poll=0.25):
+        """Put ``item``, waiting only while ``running_flag`` is set; False (counted as a drop) if stopped."""
+        while running_flag.is_set():
+            try:
+                self.put(item, timeout=poll)
+                return True
+            except queue.Full:
+                continue
+        with self.mutex:
+            self.dropped += 1
+        return False
+
+    def stats(self):
+        with self.mutex:
+            return {
+                "depth": self._qsize(),
+                "capacity": self.maxsize,
+                "policy": self.policy,
+                "enqueued": self.enqueued,
+                "dropped": self.dropped,
+            }
+
+
+class Stage:
+    """One pipeline stage: ``func(batch) -> iterable of outputs`` on N workers."""
+
+    def __init__(self, name, func, capacity=1024, policy=BLOCK, workers=1,
+                 batch_size=256, max_wait=0.05, sample_every=10):
+        self.name = name
+        self.func = func
+        self.workers = max(1, int(workers))
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.inbox = BoundedQueue(capacity, policy, sample_every)
+        self.outbox = None
+        self.errors = 0
+        self.stats = BatchStats()
+        self._threads = []
+        QUEUE_DEPTH.labels(name).set_function(self.inbox.qsize)
+        QUEUE_DROPPED.labels(name).set_function(lambda: self.inbox.dropped)
+        self._latency = STAGE_SECONDS.labels(name)
+
+    def start(self, running_flag):
+        self._threads = [t for t in self._threads if t.is_alive()]
+        for i in range(self.workers - len(self._threads)):
+            t = threading.Thread(target=self._work, args=(running_flag,),
+                                 name=f"pipeline-{self.name}-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def _work(self, running_flag):
+        while running_flag.is_set():
+            batch = drain_batch(self.inbox, self.batch_size, self.max_wait, timeout=0.5)
+            if not batch:
+                continue
+            start = time.perf_counter()
+            try:
+                outputs = self.func(batch)
+            except Exception as e:
+                self.errors += 1
+                print(f"[ERROR] Pipeline stage '{self.name}' failed: {e}")
+                outputs = None
+            elapsed = time.perf_counter() - start
+            self.stats.record(len(batch), elapsed)
+            self._latency.observe(elapsed)
+            if outputs and self.outbox is not None:
+                for item in outputs:
+                    # A stopped downstream stage must not leave this worker blocked forever
+                    if not self.outbox.put_while(item, running_flag):
+                        break
+
+    def snapshot(self):
+        info = {"stage": self.name, "workers": self.workers, "errors": self.errors}
+        info.update(self.inbox.stats())
+        info.update(self.stats.snapshot())
+        return info
+
+
+class Pipeline:
+    """Chain of stages; producers put raw telemetry into ``inlet``."""
+
+    def __init__(self, stages):
+        if not stages:
+            raise ValueError("A pipeline needs at least one stage")
+        self.stages = list(stages)
+        for upstream, downstream in zip(self.stages, self.stages[1:]):
+            upstream.outbox = downstream.inbox
+
+    @property
+    def inlet(self):
+        return self.stages[0].inbox
+
+    def start(self, running_flag):
+        for stage in self.stages:
+            stage.start(running_flag)
+
+    def stats(self):
+        return [stage.snapshot() for stage in self.stages]
+
+    def depth(self):
+        return sum(stage.inbox.qsize() for stage in self.stages)
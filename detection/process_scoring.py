@@ -0,0 +1,157 @@
+"""
+Process-pool scoring backend.
+
+Scoring in the GUI process runs under the GIL, so more monitors do not mean
+more throughput. ProcessPoolScorer keeps a pool of worker processes that each
+load the anomaly model once (via the pool initializer). Batches are vectorized
+in the parent into compact float32 arrays. Batches that split across several
+workers go to them through one shared-memory block, smaller ones as pickled
+arrays. The default ``shm_threshold`` (16 KiB) sits below the engine's full
+batches (512 rows per worker of 7 float32 columns is 14 KiB per worker); it
+keeps the small, timer-flushed batches pickled, where creating and unlinking
+a block costs more than the copy it saves. Each batch is
+split into contiguous chunks, one per worker, and results are reassembled in
+submission order, so callers see the same ordering as with BatchScorer.
+
+Given the online model's ``live`` handle and its snapshot directory, workers
+score with the newest baseline snapshot (memory-mapped, the static model
+answering until it is ready), like BatchScorer does in-process. Every batch
+carries the live model's version, and a worker reloads that snapshot when its
+own copy is older.
+"""
+
+import importlib
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from detection.batching import MODEL_BATCH_SECONDS, MODEL_EVENTS, BatchStats, FeatureVectorizer, score_matrix
+
+DEFAULT_MODEL = "detection.anomaly_model:SimpleAnomalyModel"
+
+# Per-worker state, populated once by _init_worker
+_MODEL = None
+_COLUMNS = None
+_STORE = None
+
+
+def model_spec(model):
+    """The ``"package.module:ClassName"`` spec that rebuilds ``model`` in a worker."""
+    cls = type(model)
+    return f"{cls.__module__}:{cls.__qualname__}"
+
+
+def load_model(spec):
+    """Instantiate a model from a ``"package.module:ClassName"`` spec."""
+    module_name, _, attr = spec.partition(":")
+    return getattr(importlib.import_module(module_name), attr)()
+
+
+def _init_worker(spec, columns, snapshot_dir=None):
+    global _MODEL, _COLUMNS, _STORE
+    fallback = load_model(spec) if spec else None
+    _COLUMNS = list(columns)
+    if snapshot_dir is None:
+        _MODEL = fallback
+        return
+    from detection.online_model import SnapshotStore, load_live_model
+    _STORE = SnapshotStore(snapshot_dir)
+    _MODEL = load_live_model(_STORE, fallback=fallback)
+
+
+def _refresh(version):
+    """Swap in snapshot ``version`` if it is newer than the worker's copy."""
+    if _STORE is None or version is None or version <= _MODEL.current.version:
+        return
+    try:
+        model = _STORE.load(version)
+    except (OSError, ValueError) as e:     # pruned or half-written: keep scoring with the old one
+        print(f"[ERROR] Scoring worker could not load model snapshot {version}: {e}")
+        return
+    if model is not None:
+        _MODEL.swap(model)
+
+
+def _score_chunk(X, version=None):
+    _refresh(version)
+    labels, scores = score_matrix(_MODEL, X, _COLUMNS)
+    return np.asarray(labels, dtype=np.int8), np.asarray(scores, dtype=np.float32)
+
+
+def _score_shared_chunk(name, shape, start, stop, version=None):
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        X = np.ndarray(shape, dtype=np.float32, buffer=shm.buf)[start:stop].copy()
+    finally:
+        shm.close()
+    return _score_chunk(X, version)
+
+
+class ProcessPoolScorer:
+    """Drop-in alternative to BatchScorer that scores on all cores."""
+
+    def __init__(self, model_spec=DEFAULT_MODEL, workers=None, min_chunk=512,
+                 shm_threshold=16 * 1024, vectorizer=None, live=None, snapshot_dir=None):
+        self.model_spec = model_spec
+        self.live = live
+        self.snapshot_dir = snapshot_dir
+        self.workers = workers or os.cpu_count() or 1
+        self.min_chunk = min_chunk
+        self.shm_threshold = shm_threshold
+        self.vectorizer = vectorizer or FeatureVectorizer()
+        self.stats = BatchStats()
+        self._latency = MODEL_BATCH_SECONDS.labels("process_pool")
+        self._events = MODEL_EVENTS.labels("process_pool")
+        self._pool = None
+
+    def _ensure_pool(self):
+        # Started lazily: workers need the column order learned from the first batch
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=_init_worker,
+                initargs=(self.model_spec, self.vectorizer.columns, self.snapshot_dir),
+            )
+        return self._pool
+
+    def _chunks(self, n):
+        count = max(1, min(self.workers, n // self.min_chunk))
+        bounds = np.linspace(0, n, count + 1, dtype=int)
+        return list(zip(bounds[:-1], bounds[1:]))
+
+    def score(self, features):
+        start = time.perf_counter()
+        X = np.ascontiguousarray(self.vectorizer.transform(features), dtype=np.float32)
+        pool = self._ensure_pool()
+        chunks = self._chunks(len(X))
+        version = self.live.current.version if self.live is not None else None
+
+        shm = None
+        try:
+            if X.nbytes >= self.shm_threshold and len(chunks) > 1:
+                shm = shared_memory.SharedMemory(create=True, size=X.nbytes)
+                np.ndarray(X.shape, dtype=X.dtype, buffer=shm.buf)[:] = X
+                futures = [pool.submit(_score_shared_chunk, shm.name, X.shape, a, b, version) for a, b in chunks]
+            else:
+                futures = [pool.submit(_score_chunk, X[a:b], version) for a, b in chunks]
+            parts = [f.result() for f in futures]  # submission order == row order
+        finally:
+            if shm is not None:
+                shm.close()
+                shm.unlink()
+
+        labels = np.concatenate([p[0] for p in parts])
+        scores = np.concatenate([p[1] for p in parts])
+        elapsed = time.perf_counter() - start
+        self.stats.record(len(features), elapsed)
+        self._latency.observe(elapsed)
+        self._events.inc(len(features))
+        return labels.astype(int).tolist(), scores.astype(float).tolist()
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
@@ -0,0 +1,161 @@
+"""
+Headless batch TTP extraction over many reports.
+
+Documents stream through three steps:
+
+1. text extraction + sentence splitting on a worker pool (bounded prefetch)
+2. batched model inference; sentences from different documents share a batch
+3. one JSONL line per document, written and flushed as soon as it completes
+
+Paragraph results are shared with the desktop app through TTPCache, so
+reports that were already processed are not classified again.
+"""
+
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from detection.ttp_cache import (TTP_CLASSIFY_SECONDS, TTP_DOCUMENT_SECONDS, TTP_SENTENCES, CachedTTPExtractor,
+                                 sha256_file)
+from detection.ttp_model import label_ids, technique_name
+from detection.ttp_text import iter_chunks, split_sentences
+
+REPORT_SUFFIXES = (".pdf", ".txt", ".md")
+
+
+def iter_report_files(paths, suffixes=REPORT_SUFFIXES):
+    """Yield report files from files and (recursively) directories, in sorted order."""
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.lower().endswith(suffixes):
+                        yield os.path.join(root, name)
+        elif os.path.isfile(path):
+            yield path
+
+
+class _Document:
+    def __init__(self, path, file_hash, chunk_keys, results, started):
+        self.path = path
+        self.file_hash = file_hash
+        self.chunk_keys = chunk_keys
+        self.results = results          # chunk key -> set of technique IDs
+        self.remaining = 0
+        self.sentences = 0
+        self.started = started
+
+    def record(self):
+        ttps = []
+        for key in self.chunk_keys:
+            for tid in sorted(self.results.get(key, ())):
+                if tid not in ttps:
+                    ttps.append(tid)
+        return {
+            "file": self.path,
+            "sha256": self.file_hash,
+            "ttps": ttps,
+            "names": [technique_name(tid) for tid in ttps],
+            "sentences": self.sentences,
+            "seconds": round(time.perf_counter() - self.started, 3),
+        }
+
+
+class BatchTTPRunner:
+    def __init__(self, classifier, cache=None, batch_size=64, workers=4, prefetch=None):
+        self.classifier = classifier
+        self.extractor = CachedTTPExtractor(classifier, cache)
+        self.batch_size = batch_size
+        self.workers = workers
+        self.prefetch = prefetch or workers * 2
+
+    def _prepare(self, path):
+        """Worker step: load text, resolve cached chunks, split the rest into sentences."""
+        started = time.perf_counter()
+        file_hash = sha256_file(path)
+        pages = self.extractor.load_pages(path, file_hash)
+        chunks = [(self.extractor.chunk_key(text), text) for _, text in iter_chunks(pages)]
+        cached = self.extractor.cache.get_chunks({key for key, _ in chunks})
+        results = {key: set(ttps) for key, ttps in cached.items()}
+        todo = {}
+        for key, text in chunks:
+            if key not in results and key not in todo:
+                todo[key] = split_sentences(text)
+        doc = _Document(path, file_hash, [key for key, _ in chunks], results, started)
+        return doc, todo
+
+    def run(self, paths, out, cancelled=None, on_document=None):
+        """Process ``paths`` and write JSONL records to the open file ``out``.
+
+        ``on_document(record)`` is called for every finished document. Returns
+        a summary with documents/sentences counts and documents per minute.
+        """
+        started = time.perf_counter()
+        summary = {"documents": 0, "failed": 0, "sentences": 0}
+        queue = []          # (doc, chunk key, sentence) waiting for inference
+        inflight = deque()
+
+        def emit(record):
+            out.write(json.dumps(record) + "\n")
+            out.flush()
+            if on_document:
+                on_document(record)
+
+        def finish(doc):
+            if doc.remaining == 0:
+                self.extractor.cache.put_chunks({k: sorted(v) for k, v in doc.results.items()})
+                summary["documents"] += 1
+                record = doc.record()
+                TTP_DOCUMENT_SECONDS.labels("batch").observe(record["seconds"])
+                emit(record)
+
+        def classify(items):
+            with TTP_CLASSIFY_SECONDS.labels("batch").time():
+                labels = self.classifier.classify([sentence for _, _, sentence in items])
+            TTP_SENTENCES.labels("batch").inc(len(items))
+            touched = []
+            for (doc, key, _), label in zip(items, labels):
+                doc.results[key].update(label_ids(label))
+                doc.remaining -= 1
+                if doc.remaining == 0:
+                    touched.append(doc)
+            for doc in touched:
+                finish(doc)
+
+        def accept(future, path):
+            try:
+                doc, todo = future.result()
+            except Exception as e:
+                summary["failed"] += 1
+                emit({"file": path, "error": str(e)})
+                return
+            for key, sentences in todo.items():
+                doc.results[key] = set()
+                doc.remaining += len(sentences)
+                doc.sentences += len(sentences)
+                queue.extend((doc, key, sentence) for sentence in sentences)
+            summary["sentences"] += doc.sentences
+            finish(doc)
+            while len(queue) >= self.batch_size:
+                classify(queue[:self.batch_size])
+                del queue[:self.batch_size]
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="ttp-batch") as pool:
+            for path in iter_report_files(paths):
+                if cancelled and cancelled():
+                    break
+                inflight.append((pool.submit(self._prepare, path), path))
+                if len(inflight) >= self.prefetch:
+                    accept(*inflight.popleft())
+            while inflight:
+                accept(*inflight.popleft())
+        if queue and not (cancelled and cancelled()):
+            classify(queue)
+
+        elapsed = time.perf_counter() - started
+        summary["seconds"] = round(elapsed, 3)
+        summary["docs_per_min"] = round(summary["documents"] * 60.0 / elapsed, 1) if elapsed > 0 else 0.0
+        return summary
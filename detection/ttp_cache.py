@@ -0,0 +1,166 @@
+"""
+Content-addressed cache for TTP extraction.
+
+Two layers, both keyed by SHA-256:
+
+* file hash  -> extracted page text, so a report is never parsed twice
+* chunk hash -> TTPs inferred for one paragraph (the key includes the model
+  version), so a revised report only re-runs the paragraphs that changed
+
+The cache is a single SQLite file and is safe to share between threads.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from detection.ttp_model import label_ids
+from detection.ttp_text import extract_pages, iter_chunks, split_sentences
+from utils import metrics
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "threat_app", "ttp_cache.db")
+
+TTP_DOCUMENT_SECONDS = metrics.histogram("threat_ttp_document_seconds", "TTP extraction time per report",
+                                         ["mode"])
+TTP_CLASSIFY_SECONDS = metrics.histogram("threat_ttp_classify_seconds", "Classifier time per call", ["mode"])
+TTP_SENTENCES = metrics.counter("threat_ttp_sentences_total", "Sentences sent to the classifier", ["mode"])
+
+
+def sha256_file(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def sha256_text(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class TTPCache:
+    def __init__(self, path=DEFAULT_CACHE_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS texts (file_hash TEXT PRIMARY KEY, pages TEXT NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS chunks (chunk_key TEXT PRIMARY KEY, ttps TEXT NOT NULL);"
+        )
+        self._lock = threading.Lock()
+
+    def get_pages(self, file_hash):
+        with self._lock:
+            row = self._conn.execute("SELECT pages FROM texts WHERE file_hash = ?", (file_hash,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put_pages(self, file_hash, pages):
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO texts VALUES (?, ?)", (file_hash, json.dumps(pages)))
+
+    def get_chunks(self, keys):
+        """Return ``{key: ttps}`` for the keys that are cached."""
+        found = {}
+        keys = list(keys)
+        with self._lock:
+            for i in range(0, len(keys), 500):
+                part = keys[i:i + 500]
+                rows = self._conn.execute(
+                    f"SELECT chunk_key, ttps FROM chunks WHERE chunk_key IN ({', '.join('?' * len(part))})", part)
+                found.update((k, json.loads(v)) for k, v in rows)
+        return found
+
+    def put_chunks(self, items):
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO chunks VALUES (?, ?)",
+                                   [(k, json.dumps(v)) for k, v in items.items()])
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class CachedTTPExtractor:
+    """Incremental report -> TTP extraction on top of a sentence classifier.
+
+    ``classifier`` needs ``classify(sentences)`` returning, per sentence, a
+    technique ID, a tuple of IDs or None, plus a ``version`` string (see
+    detection.ttp_model.TTPClassifier and ttp_prefilter.PrefilteredClassifier).
+    """
+
+    def __init__(self, classifier, cache=None, chunks_per_call=8):
+        self.classifier = classifier
+        self.cache = cache or TTPCache()
+        self.chunks_per_call = chunks_per_call
+
+    def chunk_key(self, text):
+        return sha256_text(f"{self.classifier.version}\0{text}")
+
+    def load_pages(self, path, file_hash=None):
+        file_hash = file_hash or sha256_file(path)
+        pages = self.cache.get_pages(file_hash)
+        if pages is None:
+            pages = extract_pages(path)
+            self.cache.put_pages(file_hash, pages)
+        return pages
+
+    def extract(self, path, progress=None, cancelled=None):
+        """Extract TTPs from ``path``.
+
+        ``progress(done, total)`` is called as chunks complete; ``cancelled()``
+        is polled between chunk groups. Returns a result dict with the unique
+        technique IDs in order of first appearance.
+        """
+        started = time.perf_counter()
+        file_hash = sha256_file(path)
+        pages = self.load_pages(path, file_hash)
+        chunks = [(page, text, self.chunk_key(text)) for page, text in iter_chunks(pages)]
+        results = self.cache.get_chunks({key for _, _, key in chunks})
+        cached = sum(1 for _, _, key in chunks if key in results)
+        total = len(chunks)
+        if progress:
+            progress(cached, total)
+
+        pending = []
+        seen = set()
+        for _, text, key in chunks:
+            if key not in results and key not in seen:
+                seen.add(key)
+                pending.append((key, text))
+        done = cached
+        for i in range(0, len(pending), self.chunks_per_call):
+            if cancelled and cancelled():
+                break
+            group = pending[i:i + self.chunks_per_call]
+            group_sentences = [split_sentences(text) for _, text in group]
+            flat = [s for sentences in group_sentences for s in sentences]
+            with TTP_CLASSIFY_SECONDS.labels("document").time():
+                labels = iter(self.classifier.classify(flat))
+            TTP_SENTENCES.labels("document").inc(len(flat))
+            fresh = {}
+            for (key, _), sentences in zip(group, group_sentences):
+                fresh[key] = sorted({tid for _ in sentences for tid in label_ids(next(labels))})
+            self.cache.put_chunks(fresh)
+            results.update(fresh)
+            done += len(group)
+            if progress:
+                progress(min(done, total), total)
+
+        ttps = []
+        for _, _, key in chunks:
+            for tid in results.get(key, ()):
+                if tid not in ttps:
+                    ttps.append(tid)
+        TTP_DOCUMENT_SECONDS.labels("document").observe(time.perf_counter() - started)
+        return {
+            "file": str(path),
+            "sha256": file_hash,
+            "ttps": ttps,
+            "chunks": total,
+            "cached_chunks": cached,
+            "complete": all(key in results for _, _, key in chunks),
+        }
@@ -0,0 +1,102 @@
+"""
+Sentence-level TTP classifier (TTPXHunter RoBERTa model).
+
+The model and tokenizer are loaded on first use, and sentences are classified
+in batches rather than one forward pass per sentence. Predicted class labels
+(``LABEL_<n>``) map to ATT&CK technique IDs through data/ttp_labels.json,
+which holds the label_dict / ttp_id_name tables from TTPXHunter.
+"""
+
+import json
+import os
+import threading
+
+MODEL_NAME = "nanda-rani/TTPXHunter"
+DEFAULT_THRESHOLD = 0.644
+LABELS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "ttp_labels.json")
+
+_tables = None
+
+
+def technique_tables():
+    """Return ``(label -> technique ID, technique ID -> name)``."""
+    global _tables
+    if _tables is None:
+        with open(LABELS_PATH, "r", encoding="utf-8") as f:
+            raw = json.load(f)
+        _tables = ({v["label"]: tid for tid, v in raw.items()}, {tid: v["name"] for tid, v in raw.items()})
+    return _tables
+
+
+def technique_name(tid):
+    return technique_tables()[1].get(tid, tid)
+
+
+def label_ids(label):
+    """Normalize a classifier output (an ID, several IDs or None) to a tuple."""
+    if not label:
+        return ()
+    if isinstance(label, str):
+        return (label,)
+    return tuple(label)
+
+
+class TTPClassifier:
+    """Batched sentence -> technique classifier with a confidence threshold."""
+
+    def __init__(self, model_name=MODEL_NAME, threshold=DEFAULT_THRESHOLD, batch_size=32, device=None):
+        self.model_name = model_name
+        self.threshold = threshold
+        self.batch_size = batch_size
+        self.device = device
+        self._model = None
+        self._tokenizer = None
+        self._lock = threading.Lock()
+
+    @property
+    def version(self):
+        """Identifies the model + threshold; part of every cache key."""
+        return f"{self.model_name}@{self.threshold}"
+
+    def _load(self):
+        with self._lock:
+            if self._model is None:
+                import torch
+                from transformers import RobertaForSequenceClassification, RobertaTokenizer
+
+                self.device = self.device or torch.device("cuda" if torch.cuda.is_available() else "cpu")
+                self._tokenizer = RobertaTokenizer.from_pretrained(self.model_name)
+                model = RobertaForSequenceClassification.from_pretrained(self.model_name)
+                model.to(self.device)
+                model.eval()
+                self._model = model
+        return self._model, self._tokenizer
+
+    def warm_up(self):
+        """Load the model now instead of on the first ``classify()``."""
+        self._load()
+        return self
+
+    def classify(self, sentences):
+        """Return one technique ID (or None below threshold) per sentence."""
+        if not sentences:
+            return []
+        import torch
+
+        model, tokenizer = self._load()
+        label_to_tid = technique_tables()[0]
+        results = []
+        for i in range(0, len(sentences), self.batch_size):
+            batch = sentences[i:i + self.batch_size]
+            inputs = tokenizer(batch, padding=True, truncation=True, max_length=256,
+                               return_tensors="pt").to(self.device)
+            with torch.no_grad():
+                probabilities = torch.softmax(model(**inputs).logits, dim=1)
+            max_prob, indices = torch.max(probabilities, dim=1)
+            for prob, idx in zip(max_prob.tolist(), indices.tolist()):
+                if prob > self.threshold:
+                    label = model.config.id2label[idx]
+                    results.append(label_to_tid.get(int(label.split("_")[1])))
+                else:
+                    results.append(None)
+        return results
@@ -0,0 +1,106 @@
+"""
+Fast first pass for explicit ATT&CK mentions.
+
+Sentences that spell out a technique ID ("(T1059)", "T1547.001") or a known
+tool/behaviour keyword ("PowerShell", "scheduled tasks") are resolved here
+with two compiled regular expressions, so only the remaining sentences go to
+the transformer model.
+
+Keywords are compiled into a single trie-shaped pattern: shared prefixes are
+merged, so the regex engine walks each position once, much like an
+Aho-Corasick automaton, instead of trying every keyword in turn.
+"""
+
+import hashlib
+import json
+import os
+import re
+
+from detection.ttp_model import technique_tables
+
+KEYWORDS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "attack_keywords.json")
+
+_TECHNIQUE_ID = re.compile(r"\bT(\d{4})(?:\.\d{3})?\b")
+
+
+def _trie_pattern(words):
+    """Build a regex matching any of ``words``, factored on shared prefixes."""
+    trie = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def render(node):
+        end = "" in node
+        branches = [re.escape(ch) + render(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if end:
+            return "(?:" + body + ")?"
+        return body
+
+    return render(trie)
+
+
+class TTPPrefilter:
+    def __init__(self, keywords=None):
+        if keywords is None:
+            with open(KEYWORDS_PATH, "r", encoding="utf-8") as f:
+                keywords = json.load(f)
+        self.keywords = {k.lower(): v for k, v in keywords.items()}
+        self.known = set(technique_tables()[1])
+        self._keyword_re = re.compile(r"(?<!\w)" + _trie_pattern(self.keywords) + r"(?!\w)", re.IGNORECASE)
+        digest = hashlib.sha256(json.dumps(sorted(self.keywords.items())).encode()).hexdigest()[:12]
+        self.version = f"prefilter-{digest}"
+
+    def match(self, sentence):
+        """Return the set of technique IDs explicitly mentioned in ``sentence``."""
+        found = set()
+        for m in _TECHNIQUE_ID.finditer(sentence):
+            tid = f"T{m.group(1)}"   # sub-techniques roll up to their parent
+            if tid in self.known:
+                found.add(tid)
+        for m in self._keyword_re.finditer(sentence):
+            found.add(self.keywords[m.group(0).lower()])
+        return found
+
+
+class PrefilteredClassifier:
+    """Classifier wrapper: explicit mentions from the prefilter, the rest from the model.
+
+    ``classify`` returns, per sentence, a tuple of technique IDs from the
+    prefilter or the wrapped model's single ID (or None).
+    """
+
+    def __init__(self, classifier, prefilter=None):
+        self.classifier = classifier
+        self.prefilter = prefilter or TTPPrefilter()
+        self.resolved = 0
+        self.forwarded = 0
+
+    @property
+    def version(self):
+        return f"{self.classifier.version}+{self.prefilter.version}"
+
+    def warm_up(self):
+        self.classifier.warm_up()
+        return self
+
+    def classify(self, sentences):
+        results = [None] * len(sentences)
+        ambiguous = []
+        for i, sentence in enumerate(sentences):
+            found = self.prefilter.match(sentence)
+            if found:
+                results[i] = tuple(sorted(found))
+            else:
+                ambiguous.append(i)
+        self.resolved += len(sentences) - len(ambiguous)
+        self.forwarded += len(ambiguous)
+        if ambiguous:
+            for i, label in zip(ambiguous, self.classifier.classify([sentences[i] for i in ambiguous])):
+                results[i] = label
+        return results
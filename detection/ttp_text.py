@@ -0,0 +1,57 @@
+"""
+Text extraction and segmentation for threat reports.
+
+PDFs are read page by page with pypdf; plain-text reports are read directly.
+Pages are split into paragraphs, which are the unit of caching, and
+paragraphs into sentences, which are the unit of model inference. The
+sentence cleanup follows the TTPXHunter reference notebook.
+"""
+
+import re
+
+TEXT_SUFFIXES = (".txt", ".md", ".text")
+
+_PARAGRAPH_SPLIT = re.compile(r"\n\s*\n")
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+(?=[A-Z0-9\"'(])")
+
+
+def extract_pages(path):
+    """Return the report's text as a list of pages."""
+    if str(path).lower().endswith(TEXT_SUFFIXES):
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            return f.read().split("\f")
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        raise RuntimeError("PDF text extraction requires pypdf (pip install pypdf)")
+    reader = PdfReader(path)
+    return [page.extract_text() or "" for page in reader.pages]
+
+
+def split_paragraphs(page):
+    """Split a page into non-empty paragraphs (blank-line separated)."""
+    return [p.strip() for p in _PARAGRAPH_SPLIT.split(page) if p.strip()]
+
+
+def _sent_tokenize(text):
+    try:
+        import nltk
+        return nltk.sent_tokenize(text)
+    except (ImportError, LookupError):
+        return _SENTENCE_SPLIT.split(text)
+
+
+def split_sentences(text):
+    """Sentences for inference: collapse repeated newlines, drop tabs, split per line."""
+    text = re.sub(r"\n{2,}", "\n", text).replace("\t", " ").replace("\\'", "'")
+    sentences = []
+    for sentence in _sent_tokenize(text):
+        sentences += [line.strip() for line in sentence.split("\n") if line.strip()]
+    return sentences
+
+
+def iter_chunks(pages):
+    """Yield ``(page_number, paragraph)`` for every paragraph in the report."""
+    for page_no, page in enumerate(pages, start=1):
+        for paragraph in split_paragraphs(page):
+            yield page_no, paragraph
@@ -0,0 +1,194 @@
+"""
+Local control socket for a running DetectionEngine.
+
+The daemon listens on a Unix domain socket (owner-only permissions) and
+answers one JSON request per line with one JSON response per line:
+
+    {"cmd": "status"}                   -> {"ok": true, "result": {...}}
+    {"cmd": "logs", "since": 120}       -> {"ok": true, "result": {"seq": 180, "lines": [...]}}
+    {"cmd": "start"} / {"cmd": "stop"} / {"cmd": "shutdown"} / {"cmd": "ping"}
+
+EngineClient is the matching client. RemoteEngine wraps it in the same
+start/stop/status/logs surface as DetectionEngine, mirroring the daemon's
+log into a local LogBuffer, so the desktop window can drive either one.
+"""
+
+import json
+import os
+import socket
+import socketserver
+import threading
+
+from utils.log_buffer import LogBuffer
+
+DEFAULT_SOCKET = os.environ.get("THREAT_ENGINE_SOCKET") or os.path.join(
+    os.path.expanduser("~"), ".cache", "threat_app", "engine.sock")
+MAX_LOG_LINES = 5000
+
+
+class EngineUnavailable(Exception):
+    """No engine daemon is listening on the control socket."""
+
+
+class _ControlHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for raw in self.rfile:
+            try:
+                request = json.loads(raw)
+                reply = {"ok": True, "result": self.server.dispatch(request)}
+            except Exception as e:
+                reply = {"ok": False, "error": str(e)}
+            self.wfile.write(json.dumps(reply, default=str).encode("utf-8") + b"\n")
+
+
+class ControlServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Serves control requests for ``engine``; ``shutdown`` sets ``stop_requested``."""
+
+    daemon_threads = True
+
+    def __init__(self, engine, path=DEFAULT_SOCKET):
+        self.engine = engine
+        self.path = path
+        self.stop_requested = threading.Event()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        _remove_stale(path)
+        # Created owner-only: a chmod after bind() would leave a window with umask permissions
+        umask = os.umask(0o177)
+        try:
+            super().__init__(path, _ControlHandler)
+        finally:
+            os.umask(umask)
+
+    def dispatch(self, request):
+        cmd = request.get("cmd")
+        engine = self.engine
+        if cmd == "ping":
+            return {"pid": os.getpid()}
+        if cmd == "status":
+            return engine.status()
+        if cmd == "start":
+            return {"started": engine.start()}
+        if cmd == "stop":
+            return {"drained": engine.stop()}
+        if cmd == "logs":
+            since = int(request.get("since", 0))
+            limit = min(int(request.get("limit", MAX_LOG_LINES)), MAX_LOG_LINES)
+            seq, lines = engine.logs.since(since)
+            return {"seq": seq, "lines": [str(line) for line in lines[-limit:]]}
+        if cmd == "shutdown":
+            self.stop_requested.set()
+            return {"stopping": True}
+        raise ValueError(f"unknown command: {cmd!r}")
+
+    def serve(self):
+        threading.Thread(target=self.serve_forever, name="engine-control", daemon=True).start()
+        return self
+
+    def close(self):
+        self.shutdown()
+        self.server_close()
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+def _remove_stale(path):
+    """Remove a socket file left by a crashed daemon; refuse to replace a live one."""
+    if not os.path.exists(path):
+        return
+    try:
+        EngineClient(path, timeout=1.0).call("ping")
+    except EngineUnavailable:
+        os.remove(path)
+        return
+    raise RuntimeError(f"An engine is already running on {path}")
+
+
+class EngineClient:
+    """One short-lived connection per call; cheap on a local socket."""
+
+    def __init__(self, path=DEFAULT_SOCKET, timeout=2.0):
+        self.path = path
+        self.timeout = timeout
+
+    def call(self, cmd, timeout=None, **args):
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.settimeout(timeout or self.timeout)
+                sock.connect(self.path)
+                sock.sendall(json.dumps(dict(args, cmd=cmd)).encode("utf-8") + b"\n")
+                with sock.makefile("rb") as stream:
+                    raw = stream.readline()
+        except (OSError, AttributeError) as e:        # AttributeError: no AF_UNIX on this platform
+            raise EngineUnavailable(f"engine not reachable at {self.path}: {e}")
+        if not raw:
+            raise EngineUnavailable(f"engine at {self.path} closed the connection")
+        reply = json.loads(raw)
+        if not reply.get("ok"):
+            raise RuntimeError(reply.get("error") or "engine request failed")
+        return reply["result"]
+
+    def available(self):
+        try:
+            self.call("ping")
+            return True
+        except (EngineUnavailable, RuntimeError):
+            return False
+
+    def status(self):
+        return self.call("status")
+
+    def start(self):
+        return self.call("start")["started"]
+
+    def stop(self, timeout=30.0):
+        # The daemon lets its pipeline drain before answering
+        return self.call("stop", timeout=timeout)["drained"]
+
+    def logs(self, since=0, limit=MAX_LOG_LINES):
+        return self.call("logs", since=since, limit=limit)
+
+    def shutdown(self):
+        return self.call("shutdown")
+
+
+class RemoteEngine:
+    """DetectionEngine look-alike backed by a daemon; ``sync()`` pulls new log lines."""
+
+    def __init__(self, client, capacity=20000, logs=None):
+        self.client = client
+        self.logs = logs if logs is not None else LogBuffer(capacity=capacity)
+        self._seq = max(client.status()["log_seq"] - self.logs.capacity, 0)
+
+    def start(self):
+        return self.client.start()
+
+    def stop(self):
+        return self.client.stop()
+
+    def status(self):
+        return self.client.status()
+
+    def sync(self):
+        page = self.client.logs(since=self._seq)
+        self._seq = page["seq"]
+        self.logs.extend(page["lines"])
+        return len(page["lines"])
+
+    def shutdown(self):
+        """Detach only; the daemon keeps running."""
+        self.logs.close()
+
+
+def status_line(status):
+    """One-line summary of ``status()`` for status bars and logs (empty before the first batch)."""
+    stats = status["scoring"]
+    if not stats["batches"]:
+        return ""
+    stages = " ".join(
+        f"{s['stage']}={s['depth']}/{s['capacity']}" + (f" (-{s['dropped']})" if s['dropped'] else "")
+        for s in status["pipeline"])
+    return (f"Scored {stats['events']} events in {stats['batches']} batches | "
+            f"last batch {stats['last_batch_size']} in {stats['last_latency_ms']:.1f} ms | "
+            f"{stats['events_per_sec']:.0f} events/s | queues {stages}")
@@ -0,0 +1,328 @@
+"""
+GUI-free detection engine.
+
+DetectionEngine owns everything the desktop window used to build itself:
+the telemetry pipeline (normalize -> score -> mitigate), the monitors that
+feed it, the online model and its trainer, the mitigation executor, the
+event store and the log buffer. Nothing here imports Qt, so the same engine
+runs in the window process, in the ``threat_engine.py`` daemon, or in a test.
+
+``start()`` / ``stop()`` toggle collection; ``shutdown()`` stops the
+monitors, lets queued telemetry drain through the pipeline, saves a final
+model snapshot and flushes detections before returning.
+"""
+
+import os
+import threading
+import time
+
+from detection.batching import BatchScorer
+from detection.events import AlertLine, EventBatch, TelemetryEvent
+from detection.online_model import DEFAULT_MODEL_DIR, OnlineTrainer, SnapshotStore, load_live_model
+from detection.pipeline import BLOCK, DROP_OLDEST, Pipeline, Stage
+from mitigation.executor import SUCCEEDED, MitigationExecutor, MitigationQueueFull, target_key
+from utils import metrics
+from utils.event_store import EventStore
+from utils.log_buffer import DEFAULT_LOG_PATH, LogBuffer
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class DetectionEngine:
+    def __init__(self, fallback=None, mitigator=None, event_store=None, logs=None, collectors=None,
+                 monitor_mode=None, scoring_workers=None):
+        if fallback is None:
+            from detection.anomaly_model import SimpleAnomalyModel
+            fallback = SimpleAnomalyModel()
+        if mitigator is None:
+            from mitigation.actions import MitigationEngine
+            mitigator = MitigationEngine()
+        # Monitors run while ``collecting`` is set; pipeline stages while ``running`` is set,
+        # so stopping collection can still drain what is already queued.
+        self.collecting = threading.Event()
+        self.running = threading.Event()
+        self.started = None
+        self.monitor_mode = monitor_mode or os.environ.get("THREAT_MONITOR", "delta")
+        self._collectors = collectors
+        self._monitors = []
+        self._lock = threading.Lock()
+
+        # The online model resumes from its newest snapshot (memory-mapped) and keeps
+        # learning from normal traffic on a background thread; the static model
+        # answers until the baseline has enough samples.
+        self.model_store = SnapshotStore(os.environ.get("THREAT_MODEL_DIR", DEFAULT_MODEL_DIR))
+        self.model = load_live_model(self.model_store, fallback=fallback)
+        self.trainer = OnlineTrainer(self.model, self.model_store)
+        self.mitigator = mitigator
+        # Remediation runs on its own pool so a slow kill/quarantine never stalls scoring
+        self.mitigation_executor = MitigationExecutor(workers=4, timeout=10.0, retries=2)
+
+        # THREAT_SCORING_WORKERS > 1 scores on a process pool instead of under the GIL
+        if scoring_workers is None:
+            scoring_workers = int(os.environ.get("THREAT_SCORING_WORKERS", "1") or 1)
+        if scoring_workers > 1:
+            from detection.process_scoring import ProcessPoolScorer, model_spec
+            # Workers score with the online baseline's snapshots, reloading as it is retrained,
+            # and rebuild the same fallback model until it is ready
+            self.scorer = ProcessPoolScorer(model_spec(fallback), workers=scoring_workers, live=self.model,
+                                            snapshot_dir=self.model_store.directory)
+            score_batch_size = 512 * scoring_workers
+        else:
+            self.scorer = BatchScorer(self.model)
+            score_batch_size = 256
+        # Detections are persisted in the same store the backend serves from /api/threats
+        self.event_store = event_store or EventStore(os.environ.get(
+            "THREAT_DB_PATH", os.path.join(BASE_DIR, "threat_events.db"))).export_metrics()
+
+        # Newest lines stay in memory; older ones spill to logs/threat_app.log
+        self.logs = logs if logs is not None else LogBuffer(capacity=20000, spill_path=DEFAULT_LOG_PATH)
+
+        # Telemetry pipeline: monitors (collect) -> normalize -> score -> mitigate.
+        # Every queue is bounded; overflow policy per stage is block/drop_oldest/sample.
+        self.pipeline = Pipeline([
+            Stage("normalize", self._normalize_batch, capacity=10000, policy=DROP_OLDEST),
+            Stage("score", self._score_batch, capacity=max(4096, 4 * score_batch_size), policy=BLOCK,
+                  batch_size=score_batch_size, max_wait=0.05),
+            Stage("mitigate", self._mitigate_batch, capacity=1024, policy=BLOCK, workers=2,
+                  batch_size=16),
+        ])
+        self.queue = self.pipeline.inlet
+        # Optional watchdog-driven YARA scanning of changed files (THREAT_WATCH=1)
+        self.watcher = None
+
+    # ---------------- lifecycle ----------------
+
+    @property
+    def active(self):
+        return self.collecting.is_set()
+
+    def start(self):
+        """Start the pipeline and the monitors; a no-op when already collecting."""
+        with self._lock:
+            if self.collecting.is_set():
+                return False
+            # Built first: if this raises, nothing has been started yet
+            monitors = self._build_monitors()
+            self.collecting.set()
+            self.running.set()
+            self.pipeline.start(self.running)
+            self.trainer.start()
+            self._monitors = []
+            for name, monitor in monitors:
+                self._monitors.append(monitor)
+                threading.Thread(target=self._safe_run, args=(monitor.run,), name=f"monitor-{name}",
+                                 daemon=True).start()
+            self.started = time.time()
+        self.logs.append("▶ Monitoring started")
+        return True
+
+    def _build_monitors(self):
+        from monitor.delta import ConnectionDeltaCollector, DeltaMonitor, ProcessDeltaCollector
+        if self._collectors is not None:
+            return [(f"collector-{i}", DeltaMonitor(self.queue, self.collecting, c, interval=0.25))
+                    for i, c in enumerate(self._collectors)]
+        # Delta collectors only enqueue process/connection changes;
+        # THREAT_MONITOR=full falls back to rescanning everything each cycle.
+        if self.monitor_mode == "full":
+            from monitor.network_monitor import NetworkMonitor
+            from monitor.process_monitor import ProcessMonitor
+            monitors = [("process", ProcessMonitor(self.queue, self.collecting)),
+                        ("network", NetworkMonitor(self.queue, self.collecting))]
+        else:
+            monitors = [("process", DeltaMonitor(self.queue, self.collecting, ProcessDeltaCollector())),
+                        ("network", DeltaMonitor(self.queue, self.collecting, ConnectionDeltaCollector()))]
+        watcher = self._file_watcher()
+        if watcher is not None:
+            monitors.append(("files", DeltaMonitor(self.queue, self.collecting, watcher, interval=0.25)))
+        return monitors
+
+    def _file_watcher(self):
+        """THREAT_WATCH=1: feed changed files under THREAT_SCAN_ROOTS through YARA into the pipeline."""
+        roots = [p for p in os.environ.get("THREAT_SCAN_ROOTS", "").split(os.pathsep) if p]
+        if os.environ.get("THREAT_WATCH", "") in ("", "0") or not roots:
+            return None
+        if self.watcher is None:
+            from scanner.engine import FileScanner
+            from scanner.watch import WatchScanner
+            self.watcher = WatchScanner(FileScanner(), roots)
+            self.watcher.start()
+        return self.watcher
+
+    def _safe_run(self, target_func):
+        """Run a monitor loop, logging instead of dying silently."""
+        try:
+            target_func()
+        except Exception as e:
+            error_msg = f"[ERROR] Monitor thread crashed: {e}"
+            self.logs.append(error_msg)
+            print(error_msg)
+
+    def stop(self, drain_timeout=5.0):
+        """Stop collecting and let queued telemetry finish; returns False if it did not drain in time."""
+        with self._lock:
+            if not self.collecting.is_set():
+                return True
+            self.collecting.clear()
+            for monitor in self._monitors:
+                stop = getattr(monitor, "stop", None)
+                if stop is not None:
+                    stop()
+            self._monitors = []
+            drained = self.drain(drain_timeout)
+            self.running.clear()
+            self.trainer.stop()
+        self.logs.append("⏹ Monitoring stopped")
+        return drained
+
+    def drain(self, timeout=5.0):
+        """Wait until every pipeline queue is empty."""
+        deadline = time.monotonic() + timeout
+        while self.pipeline.depth():
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.02)
+        return True
+
+    def shutdown(self, drain_timeout=5.0):
+        """Stop everything and persist state; the engine cannot be restarted afterwards."""
+        drained = self.stop(drain_timeout)
+        self.trainer.join(drain_timeout)
+        if self.watcher is not None:
+            self.watcher.stop()
+        self.mitigation_executor.shutdown(wait=False)
+        shutdown = getattr(self.scorer, "shutdown", None)
+        if shutdown is not None:
+            shutdown()
+        self.event_store.flush()
+        self.logs.close()
+        return drained
+
+    # ---------------- pipeline stages ----------------
+
+    def _normalize_batch(self, batch):
+        """Drop malformed telemetry and convert it to compact, timestamped records.
+
+        YARA matches stay dicts: they are detections already, not features to score.
+        """
+        now = time.time()
+        normalized = []
+        for features in batch:
+            if isinstance(features, TelemetryEvent):
+                features.ts = features.ts or now
+                normalized.append(features)
+            elif isinstance(features, dict):
+                if is_file_match(features):
+                    normalized.append(dict(features, ts=features.get("ts") or now))
+                else:
+                    normalized.append(TelemetryEvent.from_dict(features, default_ts=now))
+        return normalized
+
+    def _score_batch(self, batch):
+        """Score a batch in one model call; pass anomalies (and YARA matches) on to mitigation."""
+        anomalies = []
+        for features in batch:
+            if isinstance(features, dict):
+                self.logs.append(f"[ALERT] YARA match: {features.get('details')} 🚨")
+                self.event_store.add(file_match_record(features), source="watch")
+                anomalies.append(features)
+        batch = [event for event in batch if not isinstance(event, dict)]
+        if not batch:
+            return anomalies
+        events = EventBatch(batch)
+        try:
+            labels, scores = self.scorer.score(events)
+        except Exception as e:
+            print(f"[ERROR] Model prediction failed: {e}")
+            labels = [1] * len(batch)  # Assume normal
+            scores = [0.0] * len(batch)
+
+        self.trainer.observe(events, labels)
+        # Alert text is only rendered when the line is shown or written out
+        self.logs.extend(map(AlertLine, batch, labels, scores))
+        for event, label, score in zip(batch, labels, scores):
+            if label == -1:  # anomaly
+                features = event.to_dict()
+                anomalies.append(features)
+                self.event_store.add(detection_record(features, score), source="desktop")
+        return anomalies
+
+    def _mitigate_batch(self, batch):
+        """Hand anomalies to the mitigation executor; one action per process/file at a time."""
+        for features in batch:
+            try:
+                task, created = self.mitigation_executor.submit(target_key(features), self.mitigator.apply, features)
+            except MitigationQueueFull as e:
+                self.logs.append(f"[ERROR] Mitigation skipped: {e}")
+                continue
+            if created:
+                task.add_done_callback(self._mitigation_done)
+
+    def _mitigation_done(self, task):
+        if task.status != SUCCEEDED:
+            self.logs.append(f"[ERROR] Mitigation {task.status} for {task.target} "
+                             f"after {task.attempts} attempt(s): {task.error}")
+
+    # ---------------- introspection ----------------
+
+    def sync(self):
+        """Nothing to pull in-process (RemoteEngine mirrors a daemon's log here)."""
+        return 0
+
+    def status(self):
+        """JSON-serializable snapshot for status bars and the control socket."""
+        return {
+            "active": self.active,
+            "started": self.started,
+            "monitor_mode": self.monitor_mode,
+            "scoring": self.scorer.stats.snapshot(),
+            "pipeline": self.pipeline.stats(),
+            "mitigation": self.mitigation_executor.stats(),
+            "model": dict(self.trainer.stats, ready=bool(self.model.current.ready)),
+            "log_seq": self.logs.seq,
+        }
+
+
+def detection_record(features, score):
+    """Shape an anomalous telemetry event like the backend's threat dicts."""
+    name = features.get("name") or features.get("process") or "Unknown"
+    return {
+        "name": f"Anomalous activity: {name}",
+        "type": "Behavioral Anomaly",
+        "severity": "High",
+        "location": str(name),
+        "description": "Telemetry deviates from the learned baseline",
+        "details": str(features),
+        "score": round(float(score), 4),
+        "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+
+
+def is_file_match(features):
+    return features.get("kind") == "file" and features.get("event") == "match"
+
+
+def file_match_record(features):
+    """Shape a YARA match from the file watcher like the backend's threat dicts."""
+    return {
+        "name": f"YARA match: {', '.join(features.get('rules') or ()) or features.get('name')}",
+        "type": "Malicious File",
+        "severity": features.get("severity", "High"),
+        "location": features.get("path") or features.get("name"),
+        "description": "File matched a YARA rule",
+        "details": str(features.get("details", "")),
+        "timestamp": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(features.get("ts") or time.time())),
+    }
+
+
+def serve_metrics(logs):
+    """THREAT_METRICS_PORT exposes pipeline, model, mitigation and TTP metrics at /metrics."""
+    metrics_port = os.environ.get("THREAT_METRICS_PORT")
+    if not metrics_port:
+        return None
+    try:
+        server = metrics.serve(int(metrics_port))
+        logs.append(f"📊 Metrics on http://127.0.0.1:{metrics_port}/metrics")
+        return server
+    except (OSError, ValueError) as e:
+        logs.append(f"[ERROR] Metrics server failed: {e}")
+        return None
@@ -0,0 +1,216 @@
+"""
+Central collector: receives agent batches, scores them together, fans out detections.
+
+IngestServer accepts persistent agent connections (one thread each) and
+hands every decoded batch to the Collector, which
+
+* rejects batches without the shared ``token`` when one is configured
+* drops batches it has already seen (``(agent, boot, seq)``, e.g. resent
+  after a lost ack) and individual events seen again within a short window
+* normalizes events to TelemetryEvents tagged with their agent and queues
+  them on one bounded scoring stage, so events from all agents are scored
+  together in micro-batches; a full queue blocks the agent connection
+  before it is acked, which pushes back into the agents' spools
+* passes anomalies to ``on_detection`` as threat dicts (the backend stores
+  them and publishes them on /api/stream)
+"""
+
+import collections
+import hmac
+import socketserver
+import threading
+import time
+
+from detection.events import EventBatch, TelemetryEvent
+from detection.pipeline import BLOCK, Stage
+from ingest.protocol import ProtocolError, encode_frame, read_frame
+from utils import metrics
+
+INGEST_BATCHES = metrics.counter("threat_ingest_batches_total", "Agent batches received", ["result"])
+INGEST_EVENTS = metrics.counter("threat_ingest_events_total", "Agent events received", ["result"])
+INGEST_AGENTS = metrics.gauge("threat_ingest_agents", "Connected sensor agents")
+
+
+class RecentSet:
+    """Membership over the last ``size`` keys added (FIFO eviction)."""
+
+    def __init__(self, size):
+        self.size = size
+        self._keys = collections.OrderedDict()
+
+    def add(self, key):
+        """Add ``key``; False when it was already present."""
+        if key in self._keys:
+            return False
+        self._keys[key] = None
+        if len(self._keys) > self.size:
+            self._keys.popitem(last=False)
+        return True
+
+    def discard(self, key):
+        self._keys.pop(key, None)
+
+
+class CollectorStopped(Exception):
+    """The collector stopped before a batch was fully queued; the agent should resend it."""
+
+
+def event_key(agent, event):
+    return (agent, event.get("kind"), event.get("event"), event.get("pid"), event.get("ts"),
+            event.get("name"), event.get("lport"), event.get("rport"), event.get("status"))
+
+
+class Collector:
+    def __init__(self, scorer, on_detection, batch_size=512, max_wait=0.05, capacity=16384,
+                 batch_window=65536, event_window=262144, trainer=None, token=None):
+        self.scorer = scorer
+        self.token = token
+        self.on_detection = on_detection
+        self.trainer = trainer
+        self.stage = Stage("ingest", self._score_batch, capacity=capacity, policy=BLOCK,
+                           batch_size=batch_size, max_wait=max_wait)
+        self.running = threading.Event()
+        self._batches = RecentSet(batch_window)
+        self._events = RecentSet(event_window)
+        self._lock = threading.Lock()
+        self.stats = {"batches": 0, "duplicate_batches": 0, "events": 0, "duplicate_events": 0,
+                      "scored": 0, "detections": 0}
+        self._accepted_events = INGEST_EVENTS.labels("accepted")
+        self._duplicate_events = INGEST_EVENTS.labels("duplicate")
+
+    def start(self):
+        self.running.set()
+        self.stage.start(self.running)
+        if self.trainer is not None:
+            self.trainer.start()
+
+    def stop(self):
+        self.running.clear()
+        if self.trainer is not None:
+            self.trainer.stop()
+
+    def accept(self, message):
+        """Queue one agent batch for scoring; returns the number of new events.
+
+        Raises CollectorStopped if the collector is (or stops while) waiting for
+        queue space; the batch is forgotten so a resend is not taken for a duplicate.
+        """
+        if not self.running.is_set():
+            raise CollectorStopped("collector is not running")
+        if self.token is not None and not hmac.compare_digest(str(message.get("token") or ""), self.token):
+            raise ValueError("invalid ingest token")
+        agent = str(message.get("agent") or "unknown")
+        events = message.get("events")
+        if not isinstance(events, list):
+            raise ValueError("batch has no event list")
+        key = (agent, message.get("boot"), message.get("seq"))
+        with self._lock:
+            if not self._batches.add(key):
+                self.stats["duplicate_batches"] += 1
+                INGEST_BATCHES.labels("duplicate").inc()
+                return 0
+            fresh = [e for e in events if isinstance(e, dict) and self._events.add(event_key(agent, e))]
+            self.stats["batches"] += 1
+            self.stats["events"] += len(fresh)
+            self.stats["duplicate_events"] += len(events) - len(fresh)
+        INGEST_BATCHES.labels("accepted").inc()
+        self._accepted_events.inc(len(fresh))
+        self._duplicate_events.inc(len(events) - len(fresh))
+        host = message.get("host") or agent
+        now = time.time()
+        inbox = self.stage.inbox
+        for i, features in enumerate(fresh):
+            if not inbox.put_while((agent, host, TelemetryEvent.from_dict(features, default_ts=now)), self.running):
+                with self._lock:
+                    self._batches.discard(key)
+                    for unsent in fresh[i:]:
+                        self._events.discard(event_key(agent, unsent))
+                raise CollectorStopped("collector stopped while queueing a batch")
+        return len(fresh)
+
+    def _score_batch(self, batch):
+        events = EventBatch([event for _agent, _host, event in batch])
+        labels, scores = self.scorer.score(events)
+        if self.trainer is not None:
+            self.trainer.observe(events, labels)
+        detections = 0
+        for (agent, host, event), label, score in zip(batch, labels, scores):
+            if label == -1:
+                detections += 1
+                self.on_detection(detection_record(agent, host, event, score))
+        with self._lock:
+            self.stats["scored"] += len(batch)
+            self.stats["detections"] += detections
+
+
+def detection_record(agent, host, event, score):
+    """An anomalous agent event shaped like the backend's threat dicts."""
+    features = event.to_dict()
+    name = features.get("name") or "Unknown"
+    return {
+        "name": f"Anomalous activity: {name}",
+        "type": "Behavioral Anomaly",
+        "severity": "High",
+        "location": f"{host}: {name}",
+        "description": f"Telemetry from agent {agent} deviates from the learned baseline",
+        "details": str(features),
+        "agent": agent,
+        "score": round(float(score), 4),
+        "timestamp": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(event.ts or time.time())),
+    }
+
+
+class _AgentHandler(socketserver.StreamRequestHandler):
+    disable_nagle_algorithm = True
+
+    def handle(self):
+        collector = self.server.collector
+        INGEST_AGENTS.inc()
+        try:
+            while True:
+                try:
+                    message = read_frame(self.rfile)
+                except ProtocolError as e:
+                    print(f"[ERROR] Dropping agent connection {self.client_address}: {e}")
+                    return
+                if message is None:
+                    return
+                seq = message.get("seq") if isinstance(message, dict) else None
+                try:
+                    collector.accept(message)
+                    reply = {"ack": seq}
+                except CollectorStopped:
+                    return          # no ack: the agent keeps the batch and resends it
+                except (ValueError, TypeError, AttributeError) as e:
+                    INGEST_BATCHES.labels("rejected").inc()
+                    reply = {"ack": seq, "error": str(e)}
+                self.wfile.write(encode_frame(reply))
+        except OSError:
+            return
+        finally:
+            INGEST_AGENTS.dec()
+
+
+class IngestServer(socketserver.ThreadingTCPServer):
+    """TCP endpoint for agents; ``serve()`` runs it on a daemon thread."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, collector):
+        self.collector = collector
+        super().__init__(address, _AgentHandler)
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def serve(self):
+        self.collector.start()
+        threading.Thread(target=self.serve_forever, name="ingest-server", daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        self.collector.stop()
@@ -0,0 +1,80 @@
+"""
+Wire format between sensor agents and the central collector.
+
+Every message is one frame: a 5-byte header (payload length as a big-endian
+uint32, then a codec byte) followed by the payload, a JSON object that is
+zlib-compressed when the codec says so. Agents send telemetry batches
+
+    {"agent": ..., "boot": ..., "seq": n, "host": ..., "sent": ts, "events": [...]}
+
+and the collector answers each one with ``{"ack": n}`` once the batch is
+queued for scoring; ``(agent, boot, seq)`` identifies a batch, so a batch
+resent after a lost ack is recognised as a duplicate.
+"""
+
+import json
+import struct
+import zlib
+
+HEADER = struct.Struct(">IB")
+RAW, ZLIB = 0, 1
+MAX_FRAME = 16 * 1024 * 1024
+# Payloads smaller than this are sent raw; zlib barely helps and costs a call
+COMPRESS_MIN_BYTES = 256
+
+
+class ProtocolError(Exception):
+    """Malformed or oversized frame; the connection should be dropped."""
+
+
+def encode_frame(message, level=6):
+    payload = json.dumps(message, separators=(",", ":"), default=str).encode("utf-8")
+    codec = RAW
+    if level and len(payload) >= COMPRESS_MIN_BYTES:
+        payload, codec = zlib.compress(payload, level), ZLIB
+    if len(payload) > MAX_FRAME:
+        raise ProtocolError(f"frame of {len(payload)} bytes exceeds {MAX_FRAME}")
+    return HEADER.pack(len(payload), codec) + payload
+
+
+def decode_payload(codec, payload):
+    if codec == ZLIB:
+        try:
+            payload = zlib.decompress(payload)
+        except zlib.error as e:
+            raise ProtocolError(f"bad compressed payload: {e}")
+    elif codec != RAW:
+        raise ProtocolError(f"unknown codec {codec}")
+    try:
+        return json.loads(payload)
+    except ValueError as e:
+        raise ProtocolError(f"bad JSON payload: {e}")
+
+
+def _read_exact(stream, size):
+    data = stream.read(size)
+    if len(data) < size:
+        if data:
+            raise ProtocolError("connection closed mid-frame")
+        return None
+    return data
+
+
+def read_frame(stream):
+    """Next message from a binary file-like ``stream``; None on a clean EOF."""
+    header = _read_exact(stream, HEADER.size)
+    if header is None:
+        return None
+    size, codec = HEADER.unpack(header)
+    if size > MAX_FRAME:
+        raise ProtocolError(f"frame of {size} bytes exceeds {MAX_FRAME}")
+    payload = _read_exact(stream, size) if size else b""
+    if payload is None:
+        raise ProtocolError("connection closed mid-frame")
+    return decode_payload(codec, payload)
+
+
+def parse_address(value, default_port=5070):
+    """``host:port`` (or just ``host``) as a tuple."""
+    host, _, port = value.rpartition(":") if ":" in value else (value, "", "")
+    return (host or "127.0.0.1", int(port) if port else default_port)
@@ -0,0 +1,189 @@
+"""
+Agent side of the ingest link: ships telemetry batches to the collector.
+
+``submit(events)`` encodes a batch into a frame right away and never blocks
+on the network. One sender thread keeps a persistent TCP connection to the
+collector and sends frames one at a time, each until it is acknowledged:
+
+* frames wait in memory (up to ``max_memory``); when that overflows, the
+  queued frames move to a DiskSpool, and new frames follow them there until
+  the spool has drained, so the spool only ever holds frames older than the
+  ones in memory; everything still queued at ``stop()`` is spooled too
+* while disconnected the thread reconnects with exponential backoff
+* spooled frames are replayed (oldest first) before in-memory ones, and a
+  frame is only removed after its ack, so nothing is lost on a dropped
+  connection; the collector discards the duplicates a lost ack causes
+"""
+
+import collections
+import os
+import socket
+import threading
+import time
+import uuid
+
+from ingest.protocol import ProtocolError, encode_frame, read_frame
+from ingest.spool import DiskSpool
+
+
+class Shipper:
+    def __init__(self, address, agent_id, spool_dir, max_memory=64, spool_bytes=64 * 1024 * 1024,
+                 connect_timeout=5.0, ack_timeout=30.0, backoff=(0.5, 30.0), level=6, token=None):
+        self.address = address
+        self.agent_id = agent_id
+        self.token = token
+        self.host = socket.gethostname()
+        # Sequence numbers restart with the process; the boot id keeps them unique
+        self.boot = uuid.uuid4().hex[:12]
+        self.max_memory = max_memory
+        self.connect_timeout = connect_timeout
+        self.ack_timeout = ack_timeout
+        self.backoff = backoff
+        self.level = level
+        self.spool = DiskSpool(spool_dir, spool_bytes)
+        self.connected = False
+        self._seq = 0
+        self._memory = collections.deque()      # (seq, frame), oldest first
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._thread = None
+        self._sock = None
+        self.stats = {"batches": 0, "events": 0, "sent": 0, "bytes": 0, "spooled": 0, "rejected": 0,
+                      "reconnects": 0, "errors": 0}
+
+    def submit(self, events):
+        """Queue one batch of event dicts; returns its sequence number."""
+        with self._cond:
+            self._seq += 1
+            seq = self._seq
+            message = {"agent": self.agent_id, "boot": self.boot, "seq": seq, "host": self.host,
+                       "sent": time.time(), "events": events}
+            if self.token:
+                message["token"] = self.token
+            frame = encode_frame(message, self.level)
+            self.stats["batches"] += 1
+            self.stats["events"] += len(events)
+            if len(self._memory) >= self.max_memory or len(self.spool):
+                # Keep batch order: older frames never stay in memory behind spooled ones
+                while self._memory:
+                    self.spool.write(self._memory.popleft()[1])
+                    self.stats["spooled"] += 1
+                self.spool.write(frame)
+                self.stats["spooled"] += 1
+            else:
+                self._memory.append((seq, frame))
+            self._cond.notify()
+        return seq
+
+    def pending(self):
+        with self._cond:
+            return len(self._memory) + len(self.spool)
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="ingest-shipper", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=5.0):
+        """Stop sending; frames not yet acknowledged are kept in the spool."""
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+        sock = self._sock
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        if self._thread is not None:
+            self._thread.join(timeout)
+        with self._cond:
+            while self._memory:
+                self.spool.write(self._memory.popleft()[1])
+                self.stats["spooled"] += 1
+
+    def flush(self, timeout=10.0):
+        """Wait until everything queued so far is acknowledged; False on timeout."""
+        deadline = time.monotonic() + timeout
+        while self.pending():
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.02)
+        return True
+
+    # ---- sender thread ----
+
+    def _connect(self):
+        sock = socket.create_connection(self.address, timeout=self.connect_timeout)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.settimeout(self.ack_timeout)
+        return sock
+
+    def _next(self):
+        """``(spool name or None, seq or None, frame)`` to send next, waiting briefly for work."""
+        spooled = self.spool.peek()
+        if spooled is not None:
+            return spooled[0], None, spooled[1]
+        with self._cond:
+            if not self._memory:
+                self._cond.wait(0.5)
+            if self._memory:
+                seq, frame = self._memory[0]
+                return None, seq, frame
+        return None
+
+    def _run(self):
+        delay = self.backoff[0]
+        while not self._stop.is_set():
+            try:
+                self._sock = self._connect()
+            except OSError:
+                self._stop.wait(delay)
+                delay = min(delay * 2, self.backoff[1])
+                continue
+            delay = self.backoff[0]
+            self.connected = True
+            try:
+                self._send_loop(self._sock)
+            except (OSError, ProtocolError) as e:
+                if not self._stop.is_set():
+                    self.stats["errors"] += 1
+                    self.stats["reconnects"] += 1
+                    print(f"[ERROR] Ingest connection to {self.address[0]}:{self.address[1]} lost: {e}")
+            finally:
+                self.connected = False
+                try:
+                    self._sock.close()
+                except OSError:
+                    pass
+                self._sock = None
+
+    def _send_loop(self, sock):
+        stream = sock.makefile("rb")
+        while not self._stop.is_set():
+            item = self._next()
+            if item is None:
+                continue
+            name, seq, frame = item
+            sock.sendall(frame)
+            reply = read_frame(stream)
+            if reply is None:
+                raise ProtocolError("collector closed the connection")
+            if reply.get("error"):
+                # Malformed for the collector; resending would not help
+                self.stats["rejected"] += 1
+                print(f"[ERROR] Collector rejected a batch: {reply['error']}")
+            self.stats["sent"] += 1
+            self.stats["bytes"] += len(frame)
+            if name is not None:
+                self.spool.remove(name)
+            else:
+                with self._cond:
+                    if self._memory and self._memory[0][0] == seq:
+                        self._memory.popleft()
+
+
+def default_spool_dir(agent_id):
+    return os.path.join(os.path.expanduser("~"), ".cache", "threat_app", "spool", agent_id)
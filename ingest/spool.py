@@ -0,0 +1,75 @@
+"""
+On-disk spool for encoded frames the collector has not acknowledged yet.
+
+Frames are written one file each (temporary name, then renamed), named by a
+monotonically increasing sequence so they are replayed in the order they
+were spooled, including across agent restarts. The spool is capped at
+``max_bytes``; when it is full the oldest frames are discarded first.
+"""
+
+import os
+import threading
+
+
+class DiskSpool:
+    def __init__(self, directory, max_bytes=64 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._names = sorted(n for n in os.listdir(directory) if n.endswith(".frame"))
+        self._sizes = {n: os.path.getsize(os.path.join(directory, n)) for n in self._names}
+        self._bytes = sum(self._sizes.values())
+        self._next = int(self._names[-1].split(".")[0]) + 1 if self._names else 0
+        self.stats = {"written": 0, "replayed": 0, "discarded": 0}
+
+    def __len__(self):
+        with self._lock:
+            return len(self._names)
+
+    @property
+    def bytes(self):
+        return self._bytes
+
+    def write(self, frame):
+        with self._lock:
+            name = f"{self._next:016d}.frame"
+            self._next += 1
+            path = os.path.join(self.directory, name)
+            with open(path + ".tmp", "wb") as f:
+                f.write(frame)
+            os.replace(path + ".tmp", path)
+            self._names.append(name)
+            self._sizes[name] = len(frame)
+            self._bytes += len(frame)
+            self.stats["written"] += 1
+            while self._bytes > self.max_bytes and len(self._names) > 1:
+                self._discard(self._names[0])
+                self.stats["discarded"] += 1
+
+    def peek(self):
+        """``(name, frame)`` of the oldest spooled frame, or None."""
+        with self._lock:
+            while self._names:
+                name = self._names[0]
+                try:
+                    with open(os.path.join(self.directory, name), "rb") as f:
+                        return name, f.read()
+                except OSError:
+                    self._discard(name)
+            return None
+
+    def remove(self, name):
+        """Drop a frame once the collector has acknowledged it."""
+        with self._lock:
+            if name in self._sizes:
+                self._discard(name)
+                self.stats["replayed"] += 1
+
+    def _discard(self, name):
+        self._names.remove(name)
+        self._bytes -= self._sizes.pop(name, 0)
+        try:
+            os.remove(os.path.join(self.directory, name))
+        except OSError:
+            pass
@@ -5,15 +5,20 @@ import os
 if 'DISPLAY' not in os.environ:
     os.environ['QT_QPA_PLATFORM'] = 'offscreen'
 
-import sys, threading, queue, time
+# Before the other imports, so THREAT_STARTUP_REPORT=1 can time them
+from utils import startup
+startup.track_imports()
+
+import sys, threading
 from PyQt6 import QtCore, QtWidgets, QtGui
 
-from detection.anomaly_model import SimpleAnomalyModel
-from mitigation.actions import MitigationEngine
-from monitor.process_monitor import ProcessMonitor
-from monitor.network_monitor import NetworkMonitor
-from utils.report_export import export_report
-from detection.ttp_infer import infer_ttps
+# Only what the first window needs is imported here; the detection engine (numpy,
+# models), TTP extraction and report export load on first use or on the
+# warm-up thread once the window is up.
+from engine.control import EngineClient, EngineUnavailable, RemoteEngine, status_line
+from ui.log_view import LogListModel, LogView
+from utils.jobs import DONE, JobManager
+from utils.log_buffer import DEFAULT_LOG_PATH, LogBuffer
 
 
 class ThreatApp(QtWidgets.QMainWindow):
@@ -22,12 +27,47 @@ class ThreatApp(QtWidgets.QMainWindow):
         self.setWindowTitle("AI Threat Prediction & Mitigation")
         self.resize(900, 600)
 
-        # Shared objects
-        self.queue = queue.Queue()
-        self.running_flag = threading.Event()
-        self.model = SimpleAnomalyModel()
-        self.mitigator = MitigationEngine()
-        self.logs = []
+        # Detection runs in the engine: attach to a running threat_engine.py daemon
+        # when there is one, otherwise build the same engine in this process on the
+        # warm-up thread, after the window is shown.
+        client = EngineClient(timeout=1.0)
+        self.engine = None
+        self.engine_loaded = threading.Event()
+        warmups = []
+        if client.available():
+            try:
+                logs = LogBuffer(capacity=20000)
+                self.engine = RemoteEngine(client, logs=logs)
+                self.logs = logs
+                self.engine_loaded.set()
+            except EngineUnavailable:
+                pass            # the daemon went away since the ping; run in-process instead
+        if self.engine is None:
+            self.logs = LogBuffer(capacity=20000, spill_path=DEFAULT_LOG_PATH)
+            warmups.append(("engine", self._load_engine))
+        # THREAT_WARMUP=ttp also loads the TTP model in the background
+        if "ttp" in os.environ.get("THREAT_WARMUP", "").split(","):
+            warmups.append(("ttp", lambda: self._get_ttp_extractor().classifier.warm_up()))
+        self.warmup = startup.Warmup(warmups, label="warm-up done")
+        self._closing = None
+        # A poll thread syncs the engine's log and caches (status, reachable) for refresh(),
+        # so a slow or hung daemon never blocks the GUI thread
+        self._engine_state = (None, True)
+        self._poll_stop = threading.Event()
+        self._poller = threading.Thread(target=self._poll_engine, name="engine-poll", daemon=True)
+        self._poller.start()
+
+        # TTP extraction runs off the GUI thread; text and per-paragraph results are cached,
+        # and explicit technique/tool mentions are resolved before the transformer runs
+        self.ttp_extractor = None
+        self._ttp_lock = threading.Lock()
+        self.ttp_jobs = JobManager("ttp", max_workers=1, max_pending=4)
+        self.ttp_job = None
+        self.last_ttps = []
+
+        # Report export streams the log buffer to disk in the background
+        self.export_jobs = JobManager("export", max_workers=1, max_pending=2)
+        self.export_job = None
 
         # ---- Toolbar ----
         toolbar = self.addToolBar("Controls")
@@ -49,136 +89,229 @@ class ThreatApp(QtWidgets.QMainWindow):
         toolbar.addAction(report_btn)
 
         # ---- Central log widget ----
-        self.text = QtWidgets.QTextEdit()
-        self.text.setReadOnly(True)
-        self.setCentralWidget(self.text)
+        # Worker threads only append to self.logs; the view pulls new lines in
+        # batches from the refresh timer, so alert bursts never block the GUI.
+        self.log_model = LogListModel(self.logs, capacity=5000)
+        self.log_view = LogView(self.log_model)
+        self.setCentralWidget(self.log_view)
 
         # ---- Timer for UI refresh ----
         self.timer = QtCore.QTimer()
         self.timer.timeout.connect(self.refresh)
-        self.timer.start(1500)
+        self.timer.start(250)
 
-    # ---------------- CORE FUNCTIONS ----------------
+        if self.engine is not None:
+            self.logs.append(f"🔗 Attached to detection engine at {client.path}")
 
-    def start(self):
+    def on_shown(self):
+        """Runs once the event loop has painted the window; the rest loads in the background."""
+        startup.mark("window shown")
+        self.warmup.start()
+
+    def _load_engine(self):
+        """Warm-up task: build the in-process engine (imports numpy and the models)."""
         try:
-            self.running_flag.set()
-            self.text.append("▶ Monitoring started")
+            from engine.service import DetectionEngine, serve_metrics
+            self.engine = DetectionEngine(logs=self.logs)
+            serve_metrics(self.logs)
+        except Exception as e:
+            self.logs.append(f"[ERROR] Detection engine failed to load: {e}")
+            raise
+        finally:
+            self.engine_loaded.set()
+
+    def _get_ttp_extractor(self):
+        """The TTP pipeline, built on first use (result cache, prefilter, lazy transformer)."""
+        with self._ttp_lock:
+            if self.ttp_extractor is None:
+                from detection.ttp_cache import CachedTTPExtractor
+                from detection.ttp_model import TTPClassifier
+                from detection.ttp_prefilter import PrefilteredClassifier
+                self.ttp_extractor = CachedTTPExtractor(PrefilteredClassifier(TTPClassifier()))
+            return self.ttp_extractor
 
-            # Start monitoring threads
-            self.proc = ProcessMonitor(self.queue, self.running_flag)
-            self.net = NetworkMonitor(self.queue, self.running_flag)
+    # ---------------- CORE FUNCTIONS ----------------
 
-            threading.Thread(target=self._safe_run, args=(self.proc.run,), daemon=True).start()
-            threading.Thread(target=self._safe_run, args=(self.net.run,), daemon=True).start()
-            threading.Thread(target=self.consume, daemon=True).start()
-        except Exception as e:
-            error_msg = f"[ERROR] Failed to start monitoring: {e}"
-            self.text.append(error_msg)
-            print(error_msg)
+    def start(self):
+        # Starting and stopping may wait on the engine (loading, monitor setup, pipeline drain)
+        threading.Thread(target=self._engine_call, args=("start",), daemon=True).start()
 
-    def _safe_run(self, target_func):
-        """Wrapper to safely run monitoring functions with error handling"""
+    def stop(self):
+        threading.Thread(target=self._engine_call, args=("stop",), daemon=True).start()
+
+    def _engine_call(self, label):
+        self.engine_loaded.wait()
+        if self.engine is None:
+            self.logs.append(f"[ERROR] Cannot {label} monitoring: the detection engine did not load")
+            return
         try:
-            target_func()
+            getattr(self.engine, label)()
         except Exception as e:
-            error_msg = f"[ERROR] Monitor thread crashed: {e}"
+            error_msg = f"[ERROR] Failed to {label} monitoring: {e}"
             self.logs.append(error_msg)
             print(error_msg)
 
-    def stop(self):
-        self.running_flag.clear()
-        self.text.append("⏹ Monitoring stopped")
-
-    def consume(self):
-        while self.running_flag.is_set():
-            try:
-                features = self.queue.get(timeout=1)
-
-                # Safely predict and score
-                try:
-                    label = self.model.predict(features)
-                    score = self.model.score(features)
-                except Exception as e:
-                    print(f"[ERROR] Model prediction failed: {e}")
-                    label = 1  # Assume normal
-                    score = 0.0
-
-                log_msg = f"[ALERT] {features} → {label}, score={score:.3f}"
-                self.logs.append(log_msg)
-                self.text.append(log_msg)
-
-                if label == -1:  # anomaly
-                    try:
-                        self.mitigator.apply(features)
-                    except Exception as e:
-                        error_msg = f"[ERROR] Mitigation failed: {e}"
-                        self.logs.append(error_msg)
-                        self.text.append(error_msg)
-
-            except queue.Empty:
+    def _poll_engine(self):
+        while not self._poll_stop.wait(0.25):
+            engine = self.engine
+            if engine is None:
                 continue
-            except Exception as e:
-                error_msg = f"[ERROR] Consumer error: {e}"
-                self.logs.append(error_msg)
-                self.text.append(error_msg)
+            try:
+                engine.sync()
+                self._engine_state = (engine.status(), True)
+            except (EngineUnavailable, RuntimeError):
+                self._engine_state = (None, False)
+
+    def closeEvent(self, event):
+        # In-process engines drain and persist, which can take seconds: do it off the GUI
+        # thread and close once it is done (refresh() re-closes). A remote daemon keeps running.
+        if self._closing is None:
+            self._poll_stop.set()
+            self._closing = threading.Thread(target=self._shutdown_engine, name="engine-shutdown", daemon=True)
+            self._closing.start()
+            self.setEnabled(False)
+            self.statusBar().showMessage("Shutting down: draining the pipeline and saving the model...")
+        if self._closing.is_alive():
+            event.ignore()
+            return
+        super().closeEvent(event)
+
+    def _shutdown_engine(self):
+        self._poller.join(2.0)
+        self.engine_loaded.wait(30.0)
+        if self.engine is None:
+            return
+        try:
+            self.engine.shutdown()
+        except Exception as e:
+            print(f"[ERROR] Detection engine shutdown failed: {e}")
 
     def refresh(self):
-        # could later add system stats refresh here
-        pass
+        if self._closing is not None:
+            if not self._closing.is_alive():
+                self.timer.stop()
+                self.close()
+            return
+        status = []
+        engine_status, reachable = self._engine_state
+        if self.engine is None and not self.engine_loaded.is_set():
+            status.append("Loading detection engine...")
+        elif not reachable:
+            status.append("Detection engine unavailable")
+        self.log_view.refresh()
+        if engine_status is not None:
+            line = status_line(engine_status)
+            if line:
+                status.append(line)
+        if self.ttp_job is not None:
+            if self.ttp_job.active:
+                status.append(f"Extracting TTPs... {self.ttp_job.progress:.0%}")
+            else:
+                self._finish_ttp_job(self.ttp_job)
+                self.ttp_job = None
+        pending = engine_status["mitigation"]["pending"] if engine_status else 0
+        if pending:
+            status.append(f"Mitigating {pending} target(s)")
+        if self.export_job is not None:
+            if self.export_job.active:
+                status.append(f"Exporting report... {self.export_job.progress:.0%}")
+            else:
+                self._finish_export_job(self.export_job)
+                self.export_job = None
+        if status:
+            self.statusBar().showMessage(" | ".join(status))
 
     def extract_ttps(self):
         try:
-            fname, _ = QtWidgets.QFileDialog.getOpenFileName(self, "Select Threat Report", "", "PDF Files (*.pdf)")
+            fname, _ = QtWidgets.QFileDialog.getOpenFileName(
+                self, "Select Threat Report", "", "Reports (*.pdf *.txt);;PDF Files (*.pdf)")
             if fname:
-                try:
-                    ttps = infer_ttps(fname)
-                    self.logs.append(f"[TTP Extracted] {ttps}")
-                    self.text.append(f"[TTP Extracted] {ttps}")
-                    self.last_ttps = ttps
-                except Exception as e:
-                    error_msg = f"[ERROR] TTP extraction failed: {e}"
-                    self.logs.append(error_msg)
-                    self.text.append(error_msg)
-                    self.last_ttps = []
+                if self.ttp_job is not None and self.ttp_job.active:
+                    self.ttp_job.cancel()
+                self.ttp_job, _ = self.ttp_jobs.submit(self._run_ttp_extraction, None, fname)
+                self.logs.append(f"📄 Extracting TTPs from {fname}...")
             else:
                 self.last_ttps = []
         except Exception as e:
             error_msg = f"[ERROR] File dialog failed: {e}"
-            self.text.append(error_msg)
+            self.logs.append(error_msg)
             print(error_msg)
 
+    def _run_ttp_extraction(self, job, fname):
+        result = self._get_ttp_extractor().extract(
+            fname,
+            progress=lambda done, total: job.set_progress(done / total if total else 1.0),
+            cancelled=lambda: job.cancelled,
+        )
+        job.add_result(result)
+
+    def _finish_ttp_job(self, job):
+        """Runs on the GUI thread once an extraction job has ended."""
+        if job.status == DONE and job.results:
+            from detection.ttp_model import technique_name
+            result = job.results[-1]
+            ttps = [f"{tid} - {technique_name(tid)}" for tid in result["ttps"]]
+            self.logs.append(f"[TTP Extracted] {ttps} "
+                             f"({result['cached_chunks']}/{result['chunks']} chunks from cache)")
+            self.last_ttps = ttps
+        elif job.error:
+            self.logs.append(f"[ERROR] TTP extraction failed: {job.error}")
+            self.last_ttps = []
+
     def export_pdf(self):
         try:
-            fname, _ = QtWidgets.QFileDialog.getSaveFileName(self, "Export Report", "report.pdf", "PDF Files (*.pdf)")
+            fname, _ = QtWidgets.QFileDialog.getSaveFileName(
+                self, "Export Report", "report.pdf",
+                "PDF Files (*.pdf);;CSV Files (*.csv);;JSON Lines (*.jsonl)")
             if fname:
-                try:
-                    ttps = getattr(self, "last_ttps", [])
-                    export_report(self.logs, ttps, fname)
-                    self.text.append(f"✅ Report saved to {fname}")
-                except Exception as e:
-                    error_msg = f"[ERROR] Report export failed: {e}"
-                    self.logs.append(error_msg)
-                    self.text.append(error_msg)
+                from utils.stream_export import format_for_path
+                if format_for_path(fname) not in ("pdf", "csv", "jsonl"):
+                    fname += ".pdf"
+                if self.export_job is not None and self.export_job.active:
+                    self.export_job.cancel()
+                self.export_job, _ = self.export_jobs.submit(self._run_export, None, fname, list(self.last_ttps))
+                self.logs.append(f"💾 Exporting report to {fname}...")
         except Exception as e:
             error_msg = f"[ERROR] Export dialog failed: {e}"
-            self.text.append(error_msg)
+            self.logs.append(error_msg)
             print(error_msg)
 
+    def _run_export(self, job, fname, ttps):
+        """Job body: stream every log line (spilled files first) into the report."""
+        from utils.stream_export import export_to_file
+        header = ["Extracted TTPs:"] + (ttps or ["(none)"]) + ["", "Event log:"]
+        summary = export_to_file(
+            self.logs, fname, total=len(self.logs),
+            progress=lambda done, total: job.set_progress(min(done / total, 1.0) if total else 1.0),
+            cancelled=lambda: job.cancelled,
+            title="AI Threat Prediction & Mitigation Report", header_lines=header,
+        )
+        job.add_result(summary)
+
+    def _finish_export_job(self, job):
+        """Runs on the GUI thread once an export job has ended."""
+        if job.status == DONE and job.results:
+            summary = job.results[-1]
+            self.logs.append(f"✅ Report saved to {summary['path']} "
+                             f"({summary['records']} lines, {summary['bytes'] // 1024} KiB)")
+        elif job.error:
+            self.logs.append(f"[ERROR] Report export failed: {job.error}")
+        else:
+            self.logs.append("🛑 Report export cancelled")
+
 
 # ---------------- MAIN ENTRY ----------------
 def main():
+    if 'DISPLAY' not in os.environ:
+        # No display: run the detection engine as a daemon instead of an invisible window
+        print("Running in headless mode - starting the detection engine (threat_engine.py)")
+        import threat_engine
+        sys.exit(threat_engine.main([]))
+
     app = QtWidgets.QApplication(sys.argv)
     w = ThreatApp()
-
-    # Only show window if display is available
-    if 'DISPLAY' in os.environ:
-        w.show()
-    else:
-        print("Running in headless mode - GUI not displayed")
-        print("Application is running. Press Ctrl+C to stop.")
-        # Run for a short time in headless mode for testing
-        QtCore.QTimer.singleShot(5000, app.quit)
+    w.show()
+    QtCore.QTimer.singleShot(0, w.on_shown)
 
     try:
         sys.exit(app.exec())
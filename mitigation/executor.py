@@ -0,0 +1,216 @@
+"""
+Mitigation executor: runs remediation actions off the detection path.
+
+Actions (kill a process, quarantine a file, remove a registry key, ...) are
+submitted per target and run on a bounded worker pool:
+
+* at most one action per target runs at a time; submitting a target that is
+  already pending or running returns the existing task
+* each attempt has a timeout and failed attempts are retried with backoff
+* submit() never blocks; when too many tasks are pending it raises
+  MitigationQueueFull so callers can drop or report instead of stalling
+
+Attempts run on a second bounded pool. A timed-out attempt cannot be
+interrupted from Python: if it is still running, the task fails with
+``timeout`` without retrying, and its target stays in flight (new submissions
+join the timed-out task) until the abandoned attempt returns.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+
+from utils import metrics
+
+PENDING = "pending"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+TIMED_OUT = "timeout"
+CANCELLED = "cancelled"
+
+MITIGATION_SECONDS = metrics.histogram("threat_mitigation_duration_seconds",
+                                       "Mitigation run time including retries", ["status"])
+MITIGATION_PENDING = metrics.gauge("threat_mitigation_pending", "Mitigations queued or running")
+MITIGATION_DEDUPLICATED = metrics.counter("threat_mitigation_deduplicated_total",
+                                          "Submissions joined to a mitigation already in flight")
+
+
+class MitigationQueueFull(Exception):
+    """Raised when the executor already has its maximum number of pending tasks."""
+
+
+class MitigationTimeout(Exception):
+    pass
+
+
+def target_key(features):
+    """Dedup key for a detection: the process (pid + start time) or file it refers to."""
+    if not isinstance(features, dict):
+        features = features.to_dict() if hasattr(features, "to_dict") else {"name": str(features)}
+    for key in ("path", "file"):
+        if features.get(key):
+            return f"file:{features[key]}"
+    if features.get("pid"):
+        return f"pid:{int(features['pid'])}:{features.get('create_time', '')}"
+    return f"name:{features.get('name') or features.get('process') or 'unknown'}"
+
+
+class MitigationTask:
+    def __init__(self, target, action, args):
+        self.target = target
+        self.action = action
+        self.args = args
+        self.status = PENDING
+        self.attempts = 0
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.finished = None
+        self._done = threading.Event()
+        self._callbacks = []
+        self._lock = threading.Lock()
+        self._straggler = None    # timed-out attempt that is still running
+
+    @property
+    def busy(self):
+        """True until the task is done and no abandoned attempt is still running."""
+        straggler = self._straggler
+        return not self._done.is_set() or (straggler is not None and not straggler.done())
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        return self._done.wait(timeout)
+
+    def cancel(self):
+        """Cancel the task if it has not started yet; returns True when it was cancelled."""
+        with self._lock:
+            if self.status != PENDING:
+                return False
+            self.status = CANCELLED
+        self._finish()
+        return True
+
+    def add_done_callback(self, callback):
+        with self._lock:
+            if not self._done.is_set():
+                self._callbacks.append(callback)
+                return
+        callback(self)
+
+    def _finish(self):
+        with self._lock:
+            self.finished = time.time()
+            callbacks, self._callbacks = self._callbacks, []
+            self._done.set()
+        for callback in callbacks:
+            callback(self)
+
+    def to_dict(self):
+        return {
+            "target": self.target,
+            "status": self.status,
+            "attempts": self.attempts,
+            "result": self.result,
+            "error": self.error,
+            "seconds": round(self.finished - self.created, 3) if self.finished else None,
+        }
+
+
+class MitigationExecutor:
+    def __init__(self, workers=4, timeout=10.0, retries=2, backoff=0.5, max_pending=1000):
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_pending = max_pending
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="mitigate")
+        # Actions themselves run here, so hung attempts occupy at most ``workers`` more threads
+        self._actions = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="mitigate-action")
+        self._inflight = {}       # target -> task
+        self._lock = threading.Lock()
+        self.counts = {SUCCEEDED: 0, FAILED: 0, TIMED_OUT: 0, CANCELLED: 0, "deduplicated": 0}
+        MITIGATION_PENDING.set_function(self.pending)
+
+    def submit(self, target, action, *args):
+        """Queue ``action(*args)`` for ``target``. Returns ``(task, created)``."""
+        with self._lock:
+            task = self._inflight.get(target)
+            if task is not None and task.busy:
+                self.counts["deduplicated"] += 1
+                MITIGATION_DEDUPLICATED.inc()
+                return task, False
+            if len(self._inflight) >= self.max_pending:
+                raise MitigationQueueFull(f"Too many pending mitigations ({len(self._inflight)}).")
+            task = self._inflight[target] = MitigationTask(target, action, args)
+        self._pool.submit(self._run, task)
+        return task, True
+
+    def pending(self):
+        with self._lock:
+            return len(self._inflight)
+
+    def _release(self, task):
+        with self._lock:
+            self.counts[task.status] = self.counts.get(task.status, 0) + 1
+        if task._straggler is None:
+            self._forget(task)
+        else:
+            task._straggler.add_done_callback(lambda _future: self._forget(task))
+
+    def _forget(self, task):
+        with self._lock:
+            if self._inflight.get(task.target) is task:
+                del self._inflight[task.target]
+
+    def _attempt(self, task):
+        if not self.timeout:
+            return task.action(*task.args)
+        future = self._actions.submit(task.action, *task.args)
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            if future.done():          # the action itself raised TimeoutError
+                raise
+            if not future.cancel():    # started: it keeps the target busy until it returns
+                task._straggler = future
+            raise MitigationTimeout(f"timed out after {self.timeout}s")
+
+    def _run(self, task):
+        with task._lock:
+            if task.status != PENDING:     # cancelled while queued
+                self._release(task)
+                return
+            task.status = RUNNING
+        started = time.perf_counter()
+        status = FAILED
+        for attempt in range(self.retries + 1):
+            task.attempts = attempt + 1
+            try:
+                task.result = self._attempt(task)
+                task.error = None
+                status = SUCCEEDED
+                break
+            except MitigationTimeout as e:
+                status, task.error = TIMED_OUT, str(e)
+            except Exception as e:
+                status, task.error = FAILED, str(e)
+            if task._straggler is not None:
+                break                      # never run two attempts for one target at once
+            if attempt < self.retries:
+                time.sleep(self.backoff * (2 ** attempt))
+        task.status = status
+        MITIGATION_SECONDS.labels(status).observe(time.perf_counter() - started)
+        self._release(task)
+        task._finish()
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counts, pending=len(self._inflight))
+
+    def shutdown(self, wait=False):
+        self._pool.shutdown(wait=wait, cancel_futures=True)
+        self._actions.shutdown(wait=wait, cancel_futures=True)
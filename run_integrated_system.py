@@ -4,32 +4,58 @@ TTPXHunter Integrated System Launcher
 Starts the Flask backend and serves the web frontend as a static site.
 
 Backend: Flask (app.py) -> http://localhost:5000
+         or, with --async, ASGI/uvicorn (asgi_app.py) -> http://localhost:5000
 Frontend: Python http.server -> http://localhost:8000/index.html
 """
 
+import argparse
+import json
 import os
 import sys
 import time
 import subprocess
+import urllib.error
+import urllib.request
 from pathlib import Path
 import signal
 import threading
 
-def start_backend():
-    """Start the Flask backend server"""
-    print("🔧 Starting Flask backend server...")
+BACKEND_URL = "http://127.0.0.1:5000"
+
+def start_backend(use_async: bool = False):
+    """Start the backend server (Flask dev server, or the async ASGI server)"""
+    script = 'asgi_app.py' if use_async else 'app.py'
+    print(f"🔧 Starting {'async ASGI' if use_async else 'Flask'} backend server...")
     try:
-        # Start Flask app
         backend_process = subprocess.Popen([
-            sys.executable, 'app.py'
+            sys.executable, script
         ], cwd=Path(__file__).parent)
         
-        print("✅ Backend server started successfully")
+        print("✅ Backend process launched")
         return backend_process
     except Exception as e:
         print(f"❌ Failed to start backend server: {e}")
         return None
 
+def wait_for_backend(process, timeout: float = 30.0, interval: float = 0.05):
+    """Poll the backend's /readyz until it reports ready; returns the seconds waited or None."""
+    started = time.perf_counter()
+    deadline = started + timeout
+    while time.perf_counter() < deadline:
+        if process.poll() is not None:
+            return None
+        try:
+            with urllib.request.urlopen(f"{BACKEND_URL}/readyz", timeout=1.0) as response:
+                state = json.loads(response.read())
+            failed = [name for name, c in state.get("components", {}).items() if c.get("status") == "failed"]
+            if failed:
+                print(f"⚠️  Backend ready without: {', '.join(failed)}")
+            return time.perf_counter() - started
+        except (urllib.error.URLError, OSError, ValueError):
+            # Connection refused while starting, or 503 until warm-up is done
+            time.sleep(interval)
+    return None
+
 def start_static_frontend(port: int = 8000):
     """Start a simple static file server for the web frontend."""
     print("🎨 Starting static web frontend server...")
@@ -43,7 +69,7 @@ def start_static_frontend(port: int = 8000):
         print(f"❌ Failed to start static frontend server: {e}")
         return None
 
-def check_dependencies():
+def check_dependencies(use_async: bool = False):
     """Check if required dependencies are installed"""
     print("📋 Checking dependencies...")
 
@@ -52,6 +78,8 @@ def check_dependencies():
         'flask': 'flask',
         'flask-cors': 'flask_cors',
     }
+    if use_async:
+        package_imports.update({'starlette': 'starlette', 'uvicorn': 'uvicorn'})
 
     missing_packages = []
 
@@ -70,13 +98,22 @@ def check_dependencies():
     print("✅ All required dependencies are installed")
     return True
 
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Start the TTPXHunter backend and web frontend.")
+    parser.add_argument('--async', dest='use_async', action='store_true',
+                        help="serve the API with the asyncio (ASGI/uvicorn) server instead of the Flask dev server")
+    parser.add_argument('--startup-report', action='store_true',
+                        help="have the backend print its startup time broken down by import")
+    return parser.parse_args(argv)
+
 def main():
     """Main launcher function"""
+    args = parse_args()
     print("🚀 TTPXHunter Integrated System Launcher")
     print("=" * 50)
     
     # Check dependencies
-    if not check_dependencies():
+    if not check_dependencies(args.use_async):
         sys.exit(1)
     
     # Change to script directory
@@ -86,23 +123,29 @@ def main():
     frontend_process = None
     
     try:
+        if args.startup_report:
+            os.environ['THREAT_STARTUP_REPORT'] = '1'
+
         # Start backend server
-        backend_process = start_backend()
+        backend_process = start_backend(args.use_async)
         if not backend_process:
             print("❌ Cannot start system without backend")
             sys.exit(1)
         
-        # Wait for backend to start
-        print("⏳ Waiting for backend to initialize...")
-        time.sleep(2)
-        
-        # Start static web frontend
+        # Start static web frontend while the backend warms up
         frontend_process = start_static_frontend(port=8000)
         if not frontend_process:
             print("❌ Cannot start frontend")
             if backend_process:
                 backend_process.terminate()
             sys.exit(1)
+
+        print("⏳ Waiting for backend to become ready...")
+        waited = wait_for_backend(backend_process)
+        if waited is None:
+            print("❌ Backend did not become ready (see its output above)")
+            sys.exit(1)
+        print(f"✅ Backend ready in {waited:.2f}s")
         
         print("\n🎉 TTPXHunter System Started Successfully!")
         print("📊 Backend API: http://localhost:5000")
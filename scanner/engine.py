@@ -0,0 +1,158 @@
+"""
+Parallel YARA file scanner.
+
+Directory listing and file matching both run on one worker pool:
+
+* a listing task scans one directory (``os.scandir``), applies the size and
+  extension filters and resolves cached verdicts for its files in one query
+* files without a valid verdict are matched in chunks; each file is mapped
+  with ``mmap`` and handed to YARA without copying it into Python memory
+
+The coordinator keeps a bounded number of tasks in flight, preferring match
+chunks over new directories so memory stays flat on very large trees.
+"""
+
+import mmap
+import os
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from scanner.rules import CompiledRules
+
+DEFAULT_MAX_SIZE = 32 * 1024 * 1024
+DEFAULT_EXCLUDE_DIRS = (".git", ".hg", ".svn", "node_modules", "__pycache__", ".venv")
+MATCH_CHUNK = 128
+
+
+class FileScanner:
+    def __init__(self, rules=None, cache=None, workers=None, max_size=DEFAULT_MAX_SIZE, extensions=None,
+                 exclude_dirs=DEFAULT_EXCLUDE_DIRS, match_timeout=30):
+        self.rules = rules or CompiledRules()
+        self.cache = cache
+        self.workers = workers or min(32, (os.cpu_count() or 1) * 2)
+        self.max_size = max_size
+        self.extensions = tuple(e.lower() for e in extensions) if extensions else None
+        self.exclude_dirs = frozenset(exclude_dirs)
+        self.match_timeout = match_timeout
+
+    # ---- worker tasks ----
+
+    def _list_dir(self, path, rules_hash):
+        """List one directory: ``(subdirs, cached verdicts, files to match, skipped, errors)``."""
+        subdirs, files, skipped, errors = [], [], 0, 0
+        try:
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if entry.name not in self.exclude_dirs:
+                                subdirs.append(entry.path)
+                            continue
+                        if not entry.is_file(follow_symlinks=False):
+                            continue
+                        if self.extensions and not entry.name.lower().endswith(self.extensions):
+                            skipped += 1
+                            continue
+                        st = entry.stat(follow_symlinks=False)
+                    except OSError:
+                        errors += 1
+                        continue
+                    if st.st_size == 0 or st.st_size > self.max_size:
+                        skipped += 1
+                        continue
+                    files.append((entry.path, st.st_size, st.st_mtime_ns, st.st_ino))
+        except OSError:
+            errors += 1
+        cached = self.cache.lookup(files, rules_hash) if self.cache is not None and files else {}
+        todo = [f for f in files if f[0] not in cached]
+        return subdirs, cached, todo, skipped, errors
+
+    def _match_file(self, rules, path):
+        with open(path, "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                hits = rules.match(data=data, timeout=self.match_timeout)
+        return [{"rule": m.rule, "tags": list(m.tags), "meta": dict(m.meta)} for m in hits]
+
+    def _match_chunk(self, rules, files):
+        verdicts, errors = [], 0
+        for path, size, mtime_ns, inode in files:
+            try:
+                verdicts.append((path, size, mtime_ns, inode, self._match_file(rules, path)))
+            except Exception:
+                # vanished/unreadable/truncated since listing, or a yara.Error such as a timeout
+                errors += 1
+        return verdicts, errors
+
+    # ---- coordinator ----
+
+    def scan(self, roots, on_match=None, progress=None, cancelled=None):
+        """Scan ``roots`` (directories or files).
+
+        ``on_match(path, matches)`` is called for every matching file,
+        including ones answered from the verdict cache; ``progress(stats)``
+        after each completed task. Returns the final stats dict.
+        """
+        started = time.perf_counter()
+        rules, rules_hash = self.rules.load()
+        stats = {"files": 0, "scanned": 0, "cached": 0, "skipped": 0, "matched": 0, "errors": 0,
+                 "rules_hash": rules_hash}
+        dirs, chunks = deque(), deque()
+        loose = []
+        for root in roots:
+            if os.path.isdir(root):
+                dirs.append(root)
+            elif os.path.isfile(root):
+                st = os.stat(root)
+                loose.append((root, st.st_size, st.st_mtime_ns, st.st_ino))
+        if loose:
+            chunks.append(loose)
+            stats["files"] += len(loose)
+
+        def report(path, matches):
+            if matches:
+                stats["matched"] += 1
+                if on_match:
+                    on_match(path, matches)
+
+        limit = self.workers * 4
+        inflight = {}
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="yara-scan") as pool:
+            while dirs or chunks or inflight:
+                if cancelled and cancelled():
+                    for future in inflight:
+                        future.cancel()
+                    break
+                while len(inflight) < limit and (chunks or dirs):
+                    if chunks:
+                        future = pool.submit(self._match_chunk, rules, chunks.popleft())
+                        inflight[future] = "match"
+                    else:
+                        future = pool.submit(self._list_dir, dirs.popleft(), rules_hash)
+                        inflight[future] = "list"
+                done, _ = wait(inflight, timeout=0.5, return_when=FIRST_COMPLETED)
+                for future in done:
+                    kind = inflight.pop(future)
+                    if kind == "list":
+                        subdirs, cached, todo, skipped, errors = future.result()
+                        dirs.extend(subdirs)
+                        stats["files"] += len(cached) + len(todo)
+                        stats["cached"] += len(cached)
+                        stats["skipped"] += skipped
+                        stats["errors"] += errors
+                        for path, matches in cached.items():
+                            report(path, matches)
+                        chunks.extend(todo[i:i + MATCH_CHUNK] for i in range(0, len(todo), MATCH_CHUNK))
+                    else:
+                        verdicts, errors = future.result()
+                        stats["scanned"] += len(verdicts)
+                        stats["errors"] += errors
+                        if self.cache is not None:
+                            self.cache.store(verdicts, rules_hash)
+                        for path, _, _, _, matches in verdicts:
+                            report(path, matches)
+                if done and progress:
+                    progress(dict(stats))
+        stats["seconds"] = round(time.perf_counter() - started, 3)
+        stats["cancelled"] = bool(cancelled and cancelled())
+        return stats
@@ -0,0 +1,81 @@
+"""
+YARA rule loading with a compiled-rule cache.
+
+Rule sources (``*.yar`` / ``*.yara`` under the rules directory) are hashed
+together; the compiled rules are saved as ``<hash>.yarc`` in the cache
+directory and kept in memory, so each rule set is compiled once no matter
+how many scans or processes use it.
+"""
+
+import hashlib
+import os
+import threading
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RULES_DIR = os.environ.get("THREAT_RULES_DIR", os.path.join(BASE_DIR, "rules"))
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "threat_app", "yara")
+RULE_SUFFIXES = (".yar", ".yara")
+
+
+def _yara():
+    try:
+        import yara
+    except ImportError:
+        raise RuntimeError("File scanning requires yara-python (pip install yara-python)")
+    return yara
+
+
+def rule_files(rules_dir=RULES_DIR):
+    """Rule source files under ``rules_dir``, in a stable order."""
+    found = []
+    for root, dirs, files in os.walk(rules_dir):
+        dirs.sort()
+        found.extend(os.path.join(root, name) for name in sorted(files) if name.lower().endswith(RULE_SUFFIXES))
+    return found
+
+
+def ruleset_hash(files, rules_dir=RULES_DIR):
+    """SHA-256 over every rule file's relative path and content."""
+    digest = hashlib.sha256()
+    for path in files:
+        digest.update(os.path.relpath(path, rules_dir).encode("utf-8") + b"\0")
+        with open(path, "rb") as f:
+            digest.update(f.read())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class CompiledRules:
+    def __init__(self, rules_dir=RULES_DIR, cache_dir=DEFAULT_CACHE_DIR):
+        self.rules_dir = rules_dir
+        self.cache_dir = cache_dir
+        self._loaded = {}         # rule-set hash -> yara.Rules
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Return ``(rules, ruleset_hash)`` for the current rule sources."""
+        files = rule_files(self.rules_dir)
+        if not files:
+            raise RuntimeError(f"No YARA rules found in {self.rules_dir}")
+        digest = ruleset_hash(files, self.rules_dir)
+        with self._lock:
+            rules = self._loaded.get(digest)
+            if rules is None:
+                rules = self._loaded[digest] = self._compile(files, digest)
+        return rules, digest
+
+    def _compile(self, files, digest):
+        yara = _yara()
+        compiled = os.path.join(self.cache_dir, f"{digest}.yarc")
+        if os.path.exists(compiled):
+            try:
+                return yara.load(compiled)
+            except yara.Error:
+                os.remove(compiled)     # written by another yara version; rebuild
+        namespaces = {os.path.relpath(path, self.rules_dir): path for path in files}
+        rules = yara.compile(filepaths=namespaces)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp = f"{compiled}.{os.getpid()}.tmp"
+        rules.save(tmp)
+        os.replace(tmp, compiled)
+        return rules
@@ -0,0 +1,56 @@
+"""
+Per-file verdict cache for the YARA scanner.
+
+A verdict is reused while the file's (size, mtime, inode) and the rule-set
+hash are unchanged, so repeat scans only stat files instead of reading them.
+Lookups and writes are batched per directory chunk.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+
+DEFAULT_VERDICT_PATH = os.path.join(os.path.expanduser("~"), ".cache", "threat_app", "verdicts.db")
+
+
+class VerdictCache:
+    def __init__(self, path=DEFAULT_VERDICT_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS verdicts ("
+            " path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, inode INTEGER,"
+            " rules_hash TEXT, matches TEXT NOT NULL)")
+        self._lock = threading.Lock()
+
+    def lookup(self, files, rules_hash):
+        """Return ``{path: matches}`` for ``files`` (path, size, mtime_ns, inode) with a valid verdict."""
+        found = {}
+        with self._lock:
+            for i in range(0, len(files), 500):
+                part = {f[0]: f for f in files[i:i + 500]}
+                rows = self._conn.execute(
+                    "SELECT path, size, mtime_ns, inode, rules_hash, matches FROM verdicts "
+                    f"WHERE path IN ({', '.join('?' * len(part))})", list(part))
+                for path, size, mtime_ns, inode, digest, matches in rows:
+                    if part[path][1:] == (size, mtime_ns, inode) and digest == rules_hash:
+                        found[path] = json.loads(matches)
+        return found
+
+    def store(self, verdicts, rules_hash):
+        """Save ``[(path, size, mtime_ns, inode, matches), ...]``."""
+        if not verdicts:
+            return
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO verdicts VALUES (?, ?, ?, ?, ?, ?)",
+                [(path, size, mtime_ns, inode, rules_hash, json.dumps(matches))
+                 for path, size, mtime_ns, inode, matches in verdicts])
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -4,74 +4,334 @@ Test script to verify backend API and web frontend presence without starting ext
 Uses Flask's test client for backend checks and validates the index.html file for UI hooks.
 """
 
+import gzip
+import json
 import os
 import sys
+import tempfile
+import time
 from pathlib import Path
 from typing import Tuple
 
+# Keep test detections out of the real event store
+os.environ.setdefault('THREAT_DB_PATH', os.path.join(tempfile.mkdtemp(), 'threat_events.db'))
+# ...and the engine endpoints away from a daemon that may be running on this machine
+os.environ.setdefault('THREAT_ENGINE_SOCKET', os.path.join(tempfile.mkdtemp(), 'engine.sock'))
+
 from app import app
 
-def test_backend_connection() -> bool:
+def test_backend_connection():
     """Test backend endpoints using Flask test client."""
     print("🔧 Testing backend API (test client)...")
-    try:
-        with app.test_client() as c:
-            r = c.get('/healthz')
-            payload = r.get_json(silent=True) or {}
-            assert r.status_code == 200 and payload.get('status') == 'ok'
-
-            r = c.post('/api/scan')
-            assert r.status_code == 200
-            scan_results = r.get_json(silent=True) or []
-            print(f"✅ /api/scan returned {len(scan_results)} threats")
-
-            r = c.post('/api/mitigate', json={'threat_ids': [1, 2]})
-            assert r.status_code == 200
-            print("✅ /api/mitigate succeeded")
-
-        # Basic SSE generator smoke test
-        with app.test_request_context('/api/stream'):
-            from app import stream_endpoint
-            resp = stream_endpoint()
-            gen = resp.response
-            got_event = False
-            for i, chunk in enumerate(gen):
-                s = chunk.decode() if isinstance(chunk, (bytes, bytearray)) else str(chunk)
-                if 'event: threat' in s:
-                    got_event = True
-                    break
-                if i > 50:
-                    break
-            assert got_event, "No threat event seen in SSE stream sample"
-            print("✅ /api/stream yields threat events")
-        return True
-    except AssertionError as e:
-        print(f"❌ Backend assertion failed: {e}")
-        return False
-    except Exception as e:
-        print(f"❌ Backend test failed: {e}")
-        return False
+    with app.test_client() as c:
+        r = c.get('/healthz')
+        payload = r.get_json(silent=True) or {}
+        assert r.status_code == 200 and payload.get('status') == 'ok'
+
+        for _ in range(100):
+            r = c.get('/readyz')
+            if r.status_code == 200:
+                break
+            time.sleep(0.05)
+        components = r.get_json()['components']
+        assert r.status_code == 200 and components['store']['status'] == 'ready', r.get_json()
+        print("✅ /readyz reports ready once the warm-up has loaded the store and catalog")
+
+        r = c.post('/api/scan')
+        assert r.status_code == 202
+        job_id = (r.get_json(silent=True) or {}).get('job_id')
+        assert job_id, "No job ID returned by /api/scan"
+        r = c.post('/api/scan', json={'scope': 'full'})
+        assert r.get_json()['job_id'] == job_id, "Concurrent scans were not deduplicated"
+
+        deadline = time.time() + 10
+        job = {}
+        while time.time() < deadline:
+            job = c.get(f'/api/scan/{job_id}').get_json()
+            if job['status'] not in ('queued', 'running'):
+                break
+            time.sleep(0.1)
+        assert job.get('status') == 'done' and job.get('progress') == 1.0
+        print(f"✅ /api/scan job returned {job['result_count']} threats")
+
+        r = c.get(f'/api/scan/{job_id}', headers={'Accept-Encoding': 'gzip'})
+        if job['result_count'] > 2:
+            assert r.headers['Content-Encoding'] == 'gzip'
+            assert json.loads(gzip.decompress(r.get_data()))['results'] == job['results']
+        assert 'Accept-Encoding' in r.headers['Vary']
+
+        r = c.get('/api/catalog')
+        catalog = r.get_json()
+        assert r.status_code == 200 and catalog['entries'] and r.headers['ETag']
+        assert c.get('/api/catalog', headers={'If-None-Match': r.headers['ETag']}).status_code == 304
+        print("✅ /api/scan results are gzip-negotiated and /api/catalog revalidates by ETag")
+
+        r = c.post('/api/scan', json={'scope': 'quick'})
+        cancel_id = r.get_json()['job_id']
+        r = c.delete(f'/api/scan/{cancel_id}')
+        assert r.status_code == 200
+        assert c.get('/api/scan/unknown').status_code == 404
+        print("✅ /api/scan jobs can be polled and cancelled")
+
+        # File scanning needs THREAT_SCAN_ROOTS; without it a "files" scan fails cleanly
+        files_id = c.post('/api/scan', json={'scope': 'files'}).get_json()['job_id']
+        for _ in range(50):
+            job = c.get(f'/api/scan/{files_id}').get_json()
+            if job['status'] not in ('queued', 'running'):
+                break
+            time.sleep(0.05)
+        assert job['status'] == 'failed' and 'THREAT_SCAN_ROOTS' in job['error']
+
+        r = c.post('/api/ttp/batch', json={'paths': ['../../etc']})
+        assert r.status_code == 400, "Batch TTP extraction accepted a path outside the reports dir"
+        assert c.get('/api/ttp/batch/unknown').status_code == 404
+        print("✅ /api/ttp/batch validates report paths")
+
+        r = c.post('/api/mitigate', json={'threat_ids': [1, 2, 2]})
+        assert r.status_code == 202 and r.get_json()['count'] == 2
+        mitigation_id = r.get_json()['job_id']
+        for _ in range(50):
+            job = c.get(f'/api/mitigate/{mitigation_id}').get_json()
+            if job['status'] not in ('queued', 'running'):
+                break
+            time.sleep(0.05)
+        assert job['status'] == 'done', job
+        assert sorted(r['id'] for r in job['results']) == [1, 2]
+        assert all(r['status'] == 'succeeded' for r in job['results'])
+        assert c.post('/api/mitigate', json={'threat_ids': [{}]}).status_code == 400
+        assert c.get('/api/mitigate/unknown').status_code == 404
+        print("✅ /api/mitigate runs a bulk job with per-ID results")
+
+        r = c.get('/api/engine')
+        assert r.status_code == 503 and 'not running' in r.get_json()['message']
+        assert c.post('/api/engine/reboot').status_code == 404
+        print("✅ /api/engine reports a missing detection engine daemon")
+
+        r = c.get('/metrics')
+        text = r.get_data(as_text=True)
+        assert r.status_code == 200 and r.content_type.startswith('text/plain; version=0.0.4')
+        assert 'threat_http_request_duration_seconds_count{method="POST",route="/api/mitigate",status="202"}' in text
+        assert 'threat_job_duration_seconds_count{kind="mitigate",status="done"}' in text
+        assert 'threat_mitigation_duration_seconds_count{status="succeeded"}' in text
+        print("✅ /metrics exports request, job and mitigation metrics")
+
+    # Basic SSE generator smoke test
+    with app.test_request_context('/api/stream'):
+        from app import stream_endpoint
+        resp = stream_endpoint()
+        gen = resp.response
+        got_event = False
+        for i, chunk in enumerate(gen):
+            s = chunk.decode() if isinstance(chunk, (bytes, bytearray)) else str(chunk)
+            if 'event: threat' in s:
+                got_event = True
+                break
+            if i > 50:
+                break
+        assert got_event, "No threat event seen in SSE stream sample"
+        print("✅ /api/stream yields threat events")
+
+    with app.test_request_context('/api/stream?mode=ref'):
+        from app import stream_endpoint
+        for chunk in stream_endpoint().response:
+            s = chunk.decode() if isinstance(chunk, (bytes, bytearray)) else str(chunk)
+            if 'event: threat' in s:
+                event = json.loads(s.split('data: ', 1)[1].split('\n', 1)[0])
+                break
+        if 'catalog_ref' in event:
+            assert set(event) == {'id', 'catalog_ref', 'timestamp', 'location'}
+            assert event['catalog_ref'] in catalog['entries']
+        print("✅ /api/stream?mode=ref sends catalog references")
+
+def test_stream_fanout():
+    """Check the SSE broadcast hub: shared frames, replay and slow-consumer drops."""
+    print("\n📡 Testing SSE broadcast hub...")
+    from utils.broadcast import BroadcastHub, DISCONNECT
+
+    hub = BroadcastHub(history=10, buffer_size=4)
+    a, b = hub.subscribe(), hub.subscribe()
+    first = hub.publish("threat", '{"id": 1}')
+    frames_a, frames_b = a.get(timeout=1), b.get(timeout=1)
+    assert frames_a == frames_b and f"id: {first}" in frames_a[0]
 
-def test_frontend_presence() -> bool:
+    for i in range(6):
+        hub.publish("threat", f'{{"n": {i}}}')
+    assert len(a.drain()) == 4 and a.dropped == 2
+
+    replay = hub.subscribe(last_event_id=first)
+    assert len(replay.get(timeout=1)) == 4  # replay is capped by the ring buffer
+
+    full, compact = hub.subscribe(), hub.subscribe(compact=True)
+    last = hub.publish("threat", '{"id": 9, "name": "long"}', compact='{"id": 9}')
+    hub.publish("threat", '{"n": 0}')
+    assert '{"id": 9, "name": "long"}' in full.get(timeout=1)[0]
+    frames = compact.get(timeout=1)
+    assert 'data: {"id": 9}' in frames[0] and '{"n": 0}' in frames[1]
+    assert 'data: {"id": 9}' in hub.subscribe(last_event_id=last - 1, compact=True).get(timeout=1)[0]
+
+    strict = BroadcastHub(buffer_size=1, policy=DISCONNECT, max_drops=0)
+    slow = strict.subscribe()
+    strict.publish("threat", "{}")
+    strict.publish("threat", "{}")
+    assert slow.closed
+
+    # An ASGI subscriber whose event loop has closed is dropped without stopping the fan-out
+    import asyncio
+    from utils.broadcast import AsyncSubscription
+    hub = BroadcastHub()
+    loop = asyncio.new_event_loop()
+    async def _subscribe():
+        return hub.subscribe(factory=AsyncSubscription)
+    dead = loop.run_until_complete(_subscribe())
+    loop.close()
+    live = hub.subscribe()
+    hub.publish("threat", "{}")
+    assert dead.closed and len(live.get(timeout=1)) == 1 and hub.subscriber_count() == 1
+    print("✅ Broadcast hub fans out, replays and bounds slow consumers")
+
+def test_event_store():
+    """Check stored detections: filters, keyset pagination, counts and streamed export."""
+    print("\n🗄️  Testing threat event store...")
+    from utils.event_store import STORE_BACKLOG, EventStore, parse_time
+    from utils.stream_export import iter_event_store
+
+    served = STORE_BACKLOG._default().func
+    with tempfile.TemporaryDirectory() as tmp:
+        store = EventStore(os.path.join(tmp, 'events.db'))
+        assert STORE_BACKLOG._default().func is served     # only the served store reports metrics
+        for i in range(7):
+            severity = 'Critical' if i % 2 else 'Medium'
+            store.add({'id': i, 'name': f't{i}', 'type': 'Heuristic', 'severity': severity,
+                       'location': 'Runtime'}, source='test', ts=1000.0 + i)
+        store.flush()
+
+        page = store.query(limit=3)
+        assert [t['id'] for t in page['items']] == [6, 5, 4] and page['total'] == 7
+        page = store.query(limit=3, cursor=page['next_cursor'])
+        assert [t['id'] for t in page['items']] == [3, 2, 1]
+        page = store.query(severity=['Critical'], since=1002)
+        assert [t['id'] for t in page['items']] == [5, 3] and page['counts'] == {'Critical': 2}
+        assert page['next_cursor'] is None
+        assert [t['id'] for t in iter_event_store(store, page_size=2)] == [6, 5, 4, 3, 2, 1, 0]
+
+        # Time filters use the threat's own timestamp, not when it was stored
+        store.add({'id': 99, 'severity': 'Low', 'timestamp': '2001-01-01 12:00:00'}, source='test')
+        store.flush()
+        old = store.query(since=parse_time('2001-01-01 00:00:00'), until=parse_time('2001-01-02 00:00:00'))
+        assert [t['id'] for t in old['items']] == [99] and old['total'] == 1
+
+    with app.test_client() as c:
+        r = c.get('/api/threats?limit=5&severity=High,Critical')
+        body = r.get_json()
+        assert r.status_code == 200 and {'items', 'next_cursor', 'total', 'counts'} <= set(body)
+        assert c.get('/api/threats?cursor=bogus').status_code == 400
+        r = c.get('/api/threats/export?format=csv&severity=Critical')
+        assert r.status_code == 200 and r.mimetype == 'text/csv'
+        assert r.get_data(as_text=True).startswith('timestamp,severity,type,name,location')
+        assert c.get('/api/threats/export?format=xml').status_code == 400
+    print("✅ Event store filters, pages and counts detections")
+
+def test_agent_ingest():
+    """Agents spool while the collector is down, then ship, deduplicate and score in batches."""
+    print("\n🛰️  Testing agent ingest...")
+    import socket
+    from ingest.collector import Collector, CollectorStopped, IngestServer
+    from ingest.protocol import read_frame
+    from ingest.shipper import Shipper
+
+    class HotScorer:
+        def score(self, events):
+            labels = [-1 if e.cpu > 90 else 1 for e in events]
+            return labels, [float(-e.cpu) for e in events]
+
+    probe = socket.socket()
+    probe.bind(('127.0.0.1', 0))
+    port = probe.getsockname()[1]
+    probe.close()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        shippers = [Shipper(('127.0.0.1', port), f'agent-{i}', os.path.join(tmp, f'spool-{i}'),
+                            max_memory=1, backoff=(0.05, 0.2)) for i in range(2)]
+        for i, shipper in enumerate(shippers):
+            shipper.start()
+            hot = {'kind': 'process', 'event': 'change', 'pid': 100 + i, 'name': 'miner', 'cpu': 99.0,
+                   'ts': 1000.0}
+            shipper.submit([hot, dict(hot)])          # same event twice -> scored once
+            for n in range(3):
+                shipper.submit([{'kind': 'process', 'event': 'create', 'pid': 200 + n, 'name': 'sh',
+                                 'cpu': 1.0, 'ts': 1000.0 + n}])
+            assert len(shipper.spool) >= 2, "batches were not spooled while the collector was down"
+            spooled = []
+            for name in shipper.spool._names:
+                with open(os.path.join(shipper.spool.directory, name), 'rb') as f:
+                    spooled.append(read_frame(f)['seq'])
+            assert spooled == sorted(spooled) and not shipper._memory, "batches were spooled out of order"
+
+        detections = []
+        collector = Collector(HotScorer(), detections.append, max_wait=0.01)
+        server = IngestServer(('127.0.0.1', port), collector).serve()
+        try:
+            for shipper in shippers:
+                assert shipper.flush(timeout=10), "spooled batches were not replayed"
+                shipper.stop()
+            deadline = time.time() + 5
+            while collector.stats['scored'] < 8 and time.time() < deadline:
+                time.sleep(0.02)
+            stats = collector.stats
+            assert stats['batches'] == 8 and stats['scored'] == 8 and stats['duplicate_events'] == 2, stats
+            assert sorted(d['agent'] for d in detections) == ['agent-0', 'agent-1']
+            assert all(d['location'].endswith(': miner') for d in detections)
+
+            # A batch resent after a lost ack is acknowledged but not scored again
+            replay = {'agent': 'agent-0', 'boot': shippers[0].boot, 'seq': 1, 'events': [{'pid': 1}]}
+            assert collector.accept(replay) == 0 and collector.stats['duplicate_batches'] == 1
+        finally:
+            server.stop()
+        try:
+            collector.accept({'agent': 'agent-0', 'boot': 'x', 'seq': 1, 'events': [{'pid': 1}]})
+            raise AssertionError("a stopped collector accepted a batch")
+        except CollectorStopped:
+            pass
+
+        # With a token configured, batches without it are rejected before they are counted
+        guarded = Collector(HotScorer(), detections.append, token='s3cret')
+        guarded.start()
+        try:
+            for message in ({}, {'token': 'wrong'}):
+                try:
+                    guarded.accept(dict(message, agent='x', boot='b', seq=1, events=[{'pid': 1}]))
+                    raise AssertionError("a batch without the ingest token was accepted")
+                except ValueError:
+                    pass
+            assert guarded.stats['batches'] == 0
+            batch = {'agent': 'x', 'boot': 'b', 'seq': 1, 'token': 's3cret', 'events': [{'pid': 1}]}
+            assert guarded.accept(batch) == 1
+        finally:
+            guarded.stop()
+    print("✅ Agents spool offline, replay on reconnect and are deduplicated and batch-scored")
+
+def test_frontend_presence():
     """Validate that the web frontend file exists and includes live monitor hooks."""
     print("\n🎨 Testing web frontend presence...")
+    index_path = Path(__file__).parent / 'index.html'
+    assert index_path.is_file(), "index.html not found"
+    content = index_path.read_text(encoding='utf-8')
+    # Check for key UI elements introduced
+    assert 'Start Live Monitor' in content
+    assert '/api/stream' in content
+    assert '/api/scan' in content
+    print("✅ index.html contains required UI and API references")
+
+def _passed(test, label) -> bool:
+    """Run a test for the script summary; failures are reported instead of raised."""
     try:
-        index_path = Path(__file__).parent / 'index.html'
-        if not index_path.is_file():
-            print("❌ index.html not found")
-            return False
-        content = index_path.read_text(encoding='utf-8')
-        # Check for key UI elements introduced
-        assert 'Start Live Monitor' in content
-        assert '/api/stream' in content
-        assert '/api/scan' in content
-        print("✅ index.html contains required UI and API references")
+        test()
         return True
     except AssertionError as e:
-        print(f"❌ Frontend content assertion failed: {e}")
+        print(f"❌ {label} assertion failed: {e}")
         return False
     except Exception as e:
-        print(f"❌ Frontend test failed: {e}")
+        print(f"❌ {label} test failed: {e}")
         return False
 
 def main():
@@ -80,16 +340,28 @@ def main():
     print("=" * 40)
     
     # Test backend
-    backend_ok = test_backend_connection()
+    backend_ok = _passed(test_backend_connection, "Backend")
     
+    # Test stream fan-out
+    stream_ok = _passed(test_stream_fanout, "Broadcast hub")
+
+    # Test event store
+    store_ok = _passed(test_event_store, "Event store")
+
+    # Test agent ingest
+    ingest_ok = _passed(test_agent_ingest, "Agent ingest")
+
     # Test frontend presence
-    frontend_ok = test_frontend_presence()
+    frontend_ok = _passed(test_frontend_presence, "Frontend")
     
     print("\n📊 Test Results:")
     print(f"   Backend API: {'✅ PASS' if backend_ok else '❌ FAIL'}")
+    print(f"   Stream Fan-out: {'✅ PASS' if stream_ok else '❌ FAIL'}")
+    print(f"   Event Store: {'✅ PASS' if store_ok else '❌ FAIL'}")
+    print(f"   Agent Ingest: {'✅ PASS' if ingest_ok else '❌ FAIL'}")
     print(f"   Frontend Integration: {'✅ PASS' if frontend_ok else '❌ FAIL'}")
     
-    if backend_ok and frontend_ok:
+    if backend_ok and stream_ok and store_ok and ingest_ok and frontend_ok:
         print("\n🎉 Integration test PASSED!")
         print("💡 You can now run the integrated system:")
         print("   python3 run_integrated_system.py")
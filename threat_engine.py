@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Headless detection engine daemon.
+
+Usage:
+    python threat_engine.py [--socket PATH] [--idle]
+
+Runs the monitoring pipeline without importing Qt and keeps running until
+SIGTERM/SIGINT or a ``shutdown`` request on the control socket; shutdown
+drains queued telemetry, saves the model and flushes detections. The desktop
+window and the backend's /api/engine endpoints attach to it through the
+control socket (THREAT_ENGINE_SOCKET, default ~/.cache/threat_app/engine.sock).
+"""
+
+import argparse
+import signal
+import sys
+import time
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run the threat detection engine without a GUI.")
+    parser.add_argument('--socket', help="control socket path (default: THREAT_ENGINE_SOCKET or ~/.cache)")
+    parser.add_argument('--idle', action='store_true', help="wait for a start command instead of monitoring")
+    parser.add_argument('--drain-timeout', type=float, default=10.0,
+                        help="seconds to let queued telemetry finish on shutdown")
+    return parser.parse_args(argv)
+
+
+def main(argv=None, engine=None):
+    args = parse_args(argv)
+    started = time.perf_counter()
+    from utils import startup
+    startup.track_imports()
+    from engine.control import DEFAULT_SOCKET, ControlServer
+    from engine.service import DetectionEngine, serve_metrics
+
+    engine = engine or DetectionEngine()
+    try:
+        control = ControlServer(engine, args.socket or DEFAULT_SOCKET).serve()
+    except RuntimeError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 1
+    stop = control.stop_requested
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(sig, lambda *_: stop.set())
+    serve_metrics(engine.logs)
+    if not args.idle:
+        engine.start()
+    print(f"🛡️  Detection engine ready in {time.perf_counter() - started:.2f}s, control socket {control.path}",
+          file=sys.stderr)
+    startup.mark("ready")
+    if startup.ENABLED:
+        startup.stop_tracking()
+        print(startup.report(), file=sys.stderr)
+    try:
+        while not stop.wait(1.0):
+            pass
+    finally:
+        print("🛑 Shutting down: draining pipeline...", file=sys.stderr)
+        control.close()
+        drained = engine.shutdown(args.drain_timeout)
+        if not drained:
+            print("⚠️  Pipeline did not drain before the timeout", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,74 @@
+"""
+Virtualized log view for the desktop app.
+
+LogListModel mirrors the tail of a LogBuffer in a fixed-size deque. It only
+changes from the GUI thread, when ``refresh()`` pulls new lines in one batch.
+The view is a QListView with uniform item sizes, so it paints only the rows
+on screen no matter how many lines are loaded.
+"""
+
+from collections import deque
+
+from PyQt6 import QtCore, QtWidgets
+
+
+class LogListModel(QtCore.QAbstractListModel):
+    def __init__(self, buffer, capacity=5000, parent=None):
+        super().__init__(parent)
+        self.buffer = buffer
+        self.capacity = capacity
+        self._rows = deque(maxlen=capacity)
+        self._seq = 0
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def data(self, index, role=QtCore.Qt.ItemDataRole.DisplayRole):
+        if role == QtCore.Qt.ItemDataRole.DisplayRole and index.isValid():
+            return str(self._rows[index.row()])
+        return None
+
+    def refresh(self):
+        """Pull lines appended since the last call; returns how many were added."""
+        seq, lines = self.buffer.since(self._seq)
+        self._seq = seq
+        if not lines:
+            return 0
+        if len(lines) >= self.capacity:
+            # Burst larger than the view: replace everything in one reset
+            self.beginResetModel()
+            self._rows.clear()
+            self._rows.extend(lines[-self.capacity:])
+            self.endResetModel()
+            return len(lines)
+
+        overflow = len(self._rows) + len(lines) - self.capacity
+        if overflow > 0:
+            self.beginRemoveRows(QtCore.QModelIndex(), 0, overflow - 1)
+            for _ in range(overflow):
+                self._rows.popleft()
+            self.endRemoveRows()
+        first = len(self._rows)
+        self.beginInsertRows(QtCore.QModelIndex(), first, first + len(lines) - 1)
+        self._rows.extend(lines)
+        self.endInsertRows()
+        return len(lines)
+
+
+class LogView(QtWidgets.QListView):
+    """Read-only list view that keeps following the newest line while at the bottom."""
+
+    def __init__(self, model, parent=None):
+        super().__init__(parent)
+        self.setModel(model)
+        self.setUniformItemSizes(True)
+        self.setLayoutMode(QtWidgets.QListView.LayoutMode.Batched)
+        self.setBatchSize(200)
+        self.setEditTriggers(QtWidgets.QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.setSelectionMode(QtWidgets.QAbstractItemView.SelectionMode.ExtendedSelection)
+
+    def refresh(self):
+        bar = self.verticalScrollBar()
+        follow = bar.value() >= bar.maximum() - 2
+        if self.model().refresh() and follow:
+            self.scrollToBottom()
@@ -0,0 +1,255 @@
+"""
+In-process fan-out hub for Server-Sent Events.
+
+One producer publishes detections into the hub; every connected dashboard
+holds a lightweight Subscription with its own bounded ring buffer. Frames are
+serialized once at publish time and shared by all subscribers, and a short
+history is kept so reconnecting clients can replay from ``Last-Event-ID``.
+
+An event may also carry a compact payload (e.g. a catalog reference);
+subscribers that asked for it receive that frame instead. It is also
+rendered once per event, not once per subscriber.
+"""
+
+import threading
+import time
+from collections import deque
+
+from utils import metrics
+
+# Slow-consumer policies
+DROP_OLDEST = "drop"
+DISCONNECT = "disconnect"
+
+EVENTS_PUBLISHED = metrics.counter("threat_sse_events_published_total", "Events published to the SSE hub")
+FRAMES_SENT = metrics.counter("threat_sse_frames_sent_total", "SSE frames handed to subscriber connections")
+FRAMES_DROPPED = metrics.counter("threat_sse_frames_dropped_total", "SSE frames dropped for slow subscribers")
+SLOW_DISCONNECTS = metrics.counter("threat_sse_slow_disconnects_total",
+                                   "Subscribers disconnected for falling too far behind")
+
+
+def format_sse(event_id, event, data):
+    """Render a single SSE frame."""
+    return f"id: {event_id}\nevent: {event}\ndata: {data}\n\n"
+
+
+class Subscription:
+    """A subscriber's bounded view of the broadcast stream."""
+
+    def __init__(self, hub, maxlen, policy, max_drops):
+        self.hub = hub
+        self.view = 0               # index into each event's (full, compact) frames
+        self.policy = policy
+        self.max_drops = max_drops
+        self.dropped = 0
+        self.closed = False
+        self._buffer = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+
+    def _offer(self, frames):
+        """Called by the hub with an event's pre-rendered frames. Never blocks."""
+        frame = frames[self.view]
+        with self._lock:
+            if self.closed:
+                return
+            if len(self._buffer) == self._buffer.maxlen:
+                self.dropped += 1
+                FRAMES_DROPPED.inc()
+                if self.policy == DISCONNECT and self.dropped > self.max_drops:
+                    self.closed = True
+                    SLOW_DISCONNECTS.inc()
+            self._buffer.append(frame)
+        self._signal()
+
+    def _signal(self):
+        self._ready.set()
+
+    def drain(self):
+        """Return and clear all buffered frames."""
+        with self._lock:
+            frames = list(self._buffer)
+            self._buffer.clear()
+            self._ready.clear()
+        if frames:
+            FRAMES_SENT.inc(len(frames))
+        return frames
+
+    def get(self, timeout=None):
+        """Block until frames are available (or timeout) and return them."""
+        if not self._buffer and not self.closed:
+            self._ready.wait(timeout)
+        return self.drain()
+
+    def close(self):
+        with self._lock:
+            self.closed = True
+        self._signal()
+        self.hub.unsubscribe(self)
+
+
+class AsyncSubscription(Subscription):
+    """Subscription that wakes an asyncio task instead of a blocked thread."""
+
+    def __init__(self, hub, maxlen, policy, max_drops):
+        import asyncio  # only the ASGI server needs it; keeps it off the Flask/desktop startup path
+        super().__init__(hub, maxlen, policy, max_drops)
+        self._loop = asyncio.get_running_loop()
+        self._async_ready = asyncio.Event()
+
+    def _signal(self):
+        self._ready.set()
+        try:
+            self._loop.call_soon_threadsafe(self._async_ready.set)
+        except RuntimeError:
+            # The client's event loop is closed; drop it rather than fail the publisher's fan-out
+            with self._lock:
+                self.closed = True
+            self.hub.unsubscribe(self)
+
+    async def aget(self, timeout=None):
+        """Await frames (or timeout) and return them."""
+        import asyncio
+        if not self._buffer and not self.closed:
+            try:
+                await asyncio.wait_for(self._async_ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        self._async_ready.clear()
+        return self.drain()
+
+
+class BroadcastHub:
+    """Thread-safe publish/subscribe hub with replay history."""
+
+    def __init__(self, history=500, buffer_size=256, policy=DROP_OLDEST, max_drops=1000):
+        self.buffer_size = buffer_size
+        self.policy = policy
+        self.max_drops = max_drops
+        self.published = 0
+        self._history = deque(maxlen=history)
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._next_id = 1000
+
+    def next_id(self):
+        with self._lock:
+            event_id = self._next_id
+            self._next_id += 1
+            return event_id
+
+    def publish(self, event, data, event_id=None, compact=None):
+        """Publish a pre-serialized ``data`` payload to every subscriber.
+
+        ``compact`` is an optional smaller payload for the same event, sent to
+        subscribers that subscribed with ``compact=True``.
+        """
+        with self._lock:
+            if event_id is None:
+                event_id = self._next_id
+            self._next_id = max(self._next_id, event_id + 1)
+            frame = format_sse(event_id, event, data)
+            frames = (frame, format_sse(event_id, event, compact) if compact is not None else frame)
+            self._history.append((event_id, frames))
+            subscribers = list(self._subscribers)
+            self.published += 1
+        EVENTS_PUBLISHED.inc()
+        for sub in subscribers:
+            sub._offer(frames)
+        return event_id
+
+    def subscribe(self, last_event_id=None, factory=Subscription, compact=False):
+        """Register a subscriber, replaying history after ``last_event_id``."""
+        sub = factory(self, self.buffer_size, self.policy, self.max_drops)
+        sub.view = 1 if compact else 0
+        with self._lock:
+            if last_event_id is not None:
+                for event_id, frames in self._history:
+                    if event_id > last_event_id:
+                        sub._buffer.append(frames[sub.view])
+            self._subscribers.add(sub)
+        if sub._buffer:
+            sub._signal()
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            self._subscribers.discard(sub)
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+
+class Producer:
+    """Single background thread that feeds the hub, started on first use."""
+
+    def __init__(self, hub, tick, interval=1.0):
+        self.hub = hub
+        self.tick = tick
+        self.interval = interval
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def ensure_started(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name="sse-producer", daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.tick(self.hub)
+            except Exception as e:
+                print(f"[ERROR] Stream producer failed: {e}")
+            self._stop.wait(self.interval)
+
+
+def parse_last_event_id(value):
+    """Parse a ``Last-Event-ID`` header value, returning None when absent/invalid."""
+    try:
+        return int(value) if value not in (None, "") else None
+    except (TypeError, ValueError):
+        return None
+
+
+SLOW_CONSUMER_FRAME = 'event: error\ndata: {"status": "error", "message": "slow consumer disconnected"}\n\n'
+PING_FRAME = "event: ping\ndata: keepalive\n\n"
+
+
+def iter_sse(sub, ping_interval=10.0):
+    """Yield frames for a subscription with periodic keepalive pings."""
+    last_ping = time.time()
+    while not sub.closed:
+        frames = sub.get(timeout=ping_interval)
+        if frames:
+            yield "".join(frames)
+        if sub.closed:
+            yield SLOW_CONSUMER_FRAME
+            break
+        now = time.time()
+        if now - last_ping >= ping_interval:
+            last_ping = now
+            yield PING_FRAME
+
+
+async def aiter_sse(sub, ping_interval=10.0):
+    """Async counterpart of iter_sse for AsyncSubscription."""
+    last_ping = time.time()
+    while not sub.closed:
+        frames = await sub.aget(timeout=ping_interval)
+        if frames:
+            yield "".join(frames)
+        if sub.closed:
+            yield SLOW_CONSUMER_FRAME
+            break
+        now = time.time()
+        if now - last_ping >= ping_interval:
+            last_ping = now
+            yield PING_FRAME
@@ -0,0 +1,251 @@
+"""
+Persistent threat event store backed by SQLite in WAL mode.
+
+Writers call ``add()``, which only enqueues; a single background thread
+commits events in batches. Readers query with server-side filters, keyset
+pagination (newest first) and per-severity counts, so clients never need the
+full history.
+"""
+
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+from utils import metrics
+from utils.threat_catalog import encode
+
+DETECTIONS = metrics.counter("threat_detections_total", "Detections recorded in the event store", ["source"])
+STORE_BACKLOG = metrics.gauge("threat_event_store_backlog", "Detections waiting to be committed")
+STORE_DROPPED = metrics.counter("threat_event_store_dropped_total", "Detections dropped on a full backlog")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS threats (
+    id        INTEGER PRIMARY KEY AUTOINCREMENT,
+    event_id  INTEGER,
+    ts        REAL NOT NULL,
+    severity  TEXT,
+    type      TEXT,
+    name      TEXT,
+    location  TEXT,
+    source    TEXT,
+    payload   TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_threats_ts ON threats (ts, id);
+CREATE INDEX IF NOT EXISTS idx_threats_severity ON threats (severity, ts, id);
+CREATE INDEX IF NOT EXISTS idx_threats_type ON threats (type, ts, id);
+CREATE INDEX IF NOT EXISTS idx_threats_location ON threats (location, ts, id);
+"""
+
+MAX_PAGE_SIZE = 500
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def parse_time(value):
+    """Accept epoch seconds or ``YYYY-MM-DD HH:MM:SS``; return epoch seconds or None."""
+    if value in (None, ""):
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        pass
+    try:
+        return time.mktime(time.strptime(str(value), TIMESTAMP_FORMAT))
+    except ValueError:
+        raise ValueError(f"Invalid time value: {value!r}")
+
+
+def event_time(threat):
+    """Epoch seconds of a threat's ``timestamp`` field, or None when missing or unreadable."""
+    try:
+        return parse_time(threat.get("timestamp"))
+    except ValueError:
+        return None
+
+
+def encode_cursor(ts, row_id):
+    return f"{ts!r}:{row_id}"
+
+
+def decode_cursor(cursor):
+    try:
+        ts, row_id = cursor.rsplit(":", 1)
+        return float(ts), int(row_id)
+    except (AttributeError, ValueError):
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+
+
+class EventStore:
+    def __init__(self, path, batch_size=500, flush_interval=0.5, max_pending=100000):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self._dropped_lock = threading.Lock()
+        self._pending = queue.Queue(maxsize=max_pending)
+        self._local = threading.local()
+        self._writer = None
+        self._writer_lock = threading.Lock()
+        self._init_db()
+
+    def export_metrics(self):
+        """Report this store's backlog and drops on /metrics; call it for the served store only."""
+        STORE_BACKLOG.set_function(self._pending.qsize)
+        STORE_DROPPED.set_function(lambda: self.dropped)
+        return self
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _init_db(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.executescript(SCHEMA)
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _reader(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    # ---- writes ----
+
+    def add(self, threat, source=None, ts=None):
+        """Queue a threat dict for insertion. Never blocks; drops when the backlog is full.
+
+        ``ts`` defaults to the threat's own ``timestamp``, or the current time
+        when it has none.
+        """
+        self._ensure_writer()
+        try:
+            self._pending.put_nowait((threat, source, ts or event_time(threat) or time.time()))
+        except queue.Full:
+            with self._dropped_lock:
+                self.dropped += 1
+            return
+        DETECTIONS.labels(source or "unknown").inc()
+
+    def add_many(self, threats, source=None):
+        now = time.time()
+        for threat in threats:
+            self.add(threat, source, event_time(threat) or now)
+
+    def flush(self, timeout=10.0):
+        """Block until everything queued so far has been committed."""
+        deadline = time.monotonic() + timeout
+        while self._pending.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def _ensure_writer(self):
+        if self._writer is not None and self._writer.is_alive():
+            return
+        with self._writer_lock:
+            if self._writer is None or not self._writer.is_alive():
+                self._writer = threading.Thread(target=self._write_loop, name="event-store-writer", daemon=True)
+                self._writer.start()
+
+    def _write_loop(self):
+        conn = self._connect()
+        while True:
+            try:
+                batch = [self._pending.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                continue
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._pending.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                with conn:
+                    conn.executemany(
+                        "INSERT INTO threats (event_id, ts, severity, type, name, location, source, payload)"
+                        " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        [self._row(threat, source, ts) for threat, source, ts in batch],
+                    )
+            except Exception as e:
+                print(f"[ERROR] Event store write failed: {e}")
+            finally:
+                for _ in batch:
+                    self._pending.task_done()
+
+    @staticmethod
+    def _row(threat, source, ts):
+        event_id = threat.get("id")
+        return (
+            event_id if isinstance(event_id, int) else None,
+            ts,
+            threat.get("severity"),
+            threat.get("type"),
+            threat.get("name"),
+            threat.get("location"),
+            source,
+            encode(threat),
+        )
+
+    # ---- reads ----
+
+    def query(self, since=None, until=None, severity=None, threat_type=None, location=None,
+              limit=100, cursor=None):
+        """Return matching threats newest first, with a keyset cursor and counts.
+
+        ``since``/``until`` are epoch seconds compared with each threat's own
+        timestamp (its insertion time when it had none). ``severity`` may be a
+        list. ``cursor`` is the ``next_cursor`` from the previous page.
+        """
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        where, params = [], []
+        if since is not None:
+            where.append("ts >= ?")
+            params.append(since)
+        if until is not None:
+            where.append("ts <= ?")
+            params.append(until)
+        if severity:
+            severities = [severity] if isinstance(severity, str) else list(severity)
+            where.append(f"severity IN ({', '.join('?' * len(severities))})")
+            params.extend(severities)
+        if threat_type:
+            where.append("type = ?")
+            params.append(threat_type)
+        if location:
+            where.append("location = ?")
+            params.append(location)
+        filter_sql = f" WHERE {' AND '.join(where)}" if where else ""
+
+        page_where, page_params = list(where), list(params)
+        if cursor:
+            ts, row_id = decode_cursor(cursor)
+            page_where.append("(ts < ? OR (ts = ? AND id < ?))")
+            page_params.extend([ts, ts, row_id])
+        page_sql = f" WHERE {' AND '.join(page_where)}" if page_where else ""
+
+        conn = self._reader()
+        rows = conn.execute(
+            f"SELECT id, ts, source, payload FROM threats{page_sql} ORDER BY ts DESC, id DESC LIMIT ?",
+            page_params + [limit + 1],
+        ).fetchall()
+        counts = {
+            (row["severity"] or "Unknown"): row["n"]
+            for row in conn.execute(
+                f"SELECT severity, COUNT(*) AS n FROM threats{filter_sql} GROUP BY severity", params)
+        }
+
+        items = []
+        for row in rows[:limit]:
+            item = json.loads(row["payload"])
+            item["stored_id"] = row["id"]
+            item["source"] = row["source"]
+            items.append(item)
+        next_cursor = encode_cursor(rows[limit - 1]["ts"], rows[limit - 1]["id"]) if len(rows) > limit else None
+        return {"items": items, "next_cursor": next_cursor, "total": sum(counts.values()), "counts": counts}
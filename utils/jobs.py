@@ -0,0 +1,195 @@
+"""
+Background job runner shared by the API endpoints.
+
+Long-running work (scans, batch extraction, mitigation) is submitted to a
+bounded thread pool and tracked by job ID. Jobs report progress and partial
+results as they go, can be cancelled cooperatively, and identical requests that
+arrive while a job for the same key is still active share that job.
+"""
+
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from utils import metrics
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+ACTIVE_STATES = (QUEUED, RUNNING)
+
+JOBS_ACTIVE = metrics.gauge("threat_jobs_active", "Queued and running background jobs", ["kind"])
+JOB_SECONDS = metrics.histogram("threat_job_duration_seconds", "Background job run time", ["kind", "status"])
+
+
+class JobQueueFull(Exception):
+    """Raised when the pool already has its maximum number of pending jobs."""
+
+
+class Job:
+    """State of one background job. Mutators are safe to call from the worker."""
+
+    def __init__(self, kind, key=None):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.key = key
+        self.status = QUEUED
+        self.progress = 0.0
+        self.results = []
+        self.info = {}
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self._cancel = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    @property
+    def active(self):
+        return self.status in ACTIVE_STATES
+
+    def cancel(self):
+        self._cancel.set()
+        with self._lock:
+            if self.status == QUEUED:
+                self.status = CANCELLED
+                self.finished = time.time()
+
+    def add_result(self, item):
+        with self._lock:
+            self.results.append(item)
+
+    def set_progress(self, fraction):
+        with self._lock:
+            self.progress = max(0.0, min(1.0, float(fraction)))
+
+    def _snapshot(self, since):
+        with self._lock:
+            return {
+                "job_id": self.id,
+                "kind": self.kind,
+                "status": self.status,
+                "progress": round(self.progress, 3),
+                "result_count": len(self.results),
+                "info": dict(self.info),
+                "error": self.error,
+                "created": self.created,
+                "started": self.started,
+                "finished": self.finished,
+            }, self.results[since:]
+
+    def to_dict(self, since=0):
+        """Snapshot for the API; ``since`` returns only results after that offset."""
+        body, results = self._snapshot(since)
+        body["results"] = [r.to_dict() if hasattr(r, "to_json") else r for r in results]
+        return body
+
+    def to_json(self, since=0):
+        """``to_dict()`` as JSON text; results with a ``to_json()`` method are spliced in pre-encoded."""
+        body, results = self._snapshot(since)
+        items = ", ".join(r.to_json() if hasattr(r, "to_json") else json.dumps(r, default=str) for r in results)
+        return json.dumps(body, default=str)[:-1] + ', "results": [' + items + ']}'
+
+
+class JobManager:
+    """Run jobs on a bounded worker pool and keep recent jobs for polling."""
+
+    def __init__(self, kind, max_workers=4, max_pending=64, retain=256):
+        self.kind = kind
+        self.max_pending = max_pending
+        self.retain = retain
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"{kind}-job")
+        self._jobs = OrderedDict()
+        self._active_by_key = {}
+        self._lock = threading.Lock()
+        JOBS_ACTIVE.labels(kind).set_function(self.active_count)
+
+    def submit(self, func, key=None, *args, **kwargs):
+        """Start ``func(job, *args, **kwargs)`` in the pool.
+
+        Returns ``(job, created)``. When an active job with the same ``key``
+        exists it is returned instead and ``created`` is False.
+        """
+        with self._lock:
+            if key is not None:
+                existing = self._active_by_key.get(key)
+                if existing is not None and existing.active:
+                    return existing, False
+            pending = sum(1 for j in self._jobs.values() if j.active)
+            if pending >= self.max_pending:
+                raise JobQueueFull(f"Too many pending {self.kind} jobs ({pending}).")
+            job = Job(self.kind, key)
+            self._jobs[job.id] = job
+            if key is not None:
+                self._active_by_key[key] = job
+            self._prune()
+        self._pool.submit(self._run, job, func, args, kwargs)
+        return job, True
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def active_count(self):
+        """Queued plus running jobs."""
+        with self._lock:
+            return sum(1 for j in self._jobs.values() if j.active)
+
+    def cancel(self, job_id):
+        job = self.get(job_id)
+        if job is not None:
+            job.cancel()
+            self._release(job)
+        return job
+
+    def _run(self, job, func, args, kwargs):
+        with job._lock:
+            # Same lock as Job.cancel(): a cancel cannot slip in between the check and RUNNING
+            start = job.status == QUEUED and not job.cancelled
+            if start:
+                job.status = RUNNING
+                job.started = time.time()
+        if not start:
+            self._release(job)
+            return
+        try:
+            func(job, *args, **kwargs)
+            status, error = (CANCELLED, None) if job.cancelled else (DONE, None)
+        except Exception as e:
+            status, error = FAILED, str(e)
+        with job._lock:
+            job.status = status
+            job.error = error
+            if status == DONE:
+                job.progress = 1.0
+            job.finished = time.time()
+        JOB_SECONDS.labels(self.kind, status).observe(job.finished - job.started)
+        self._release(job)
+
+    def _release(self, job):
+        with self._lock:
+            if job.key is not None and self._active_by_key.get(job.key) is job:
+                del self._active_by_key[job.key]
+
+    def _prune(self):
+        # Called with the lock held: drop the oldest finished jobs beyond `retain`
+        excess = len(self._jobs) - self.retain
+        if excess <= 0:
+            return
+        for job_id in [jid for jid, j in self._jobs.items() if not j.active][:excess]:
+            del self._jobs[job_id]
+
+    def shutdown(self, wait=False):
+        for job in list(self._jobs.values()):
+            job.cancel()
+        self._pool.shutdown(wait=wait)
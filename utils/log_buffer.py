@@ -0,0 +1,125 @@
+"""
+Fixed-capacity, thread-safe log buffer that spills old entries to disk.
+
+Producers (monitor and pipeline threads) append lines from any thread. The
+newest ``capacity`` lines stay in memory; older lines are appended to a spill
+file that rotates at ``max_spill_bytes``. Readers poll for new lines with
+``since(seq)`` instead of being called back for every line, so the GUI can
+render in batches from its refresh timer.
+"""
+
+import os
+import threading
+from collections import deque
+from itertools import islice
+
+# Where the detection engine spills its log (repo-level logs/ directory)
+DEFAULT_LOG_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                "logs", "threat_app.log")
+
+
+class LogBuffer:
+    def __init__(self, capacity=10000, spill_path=None, max_spill_bytes=50 * 1024 * 1024, backups=5):
+        self.capacity = capacity
+        self.spill_path = spill_path
+        self.max_spill_bytes = max_spill_bytes
+        self.backups = backups
+        self.seq = 0          # total lines ever appended
+        self.spilled = 0      # lines moved from memory to disk
+        self._spill_lines = 0                      # lines in the current spill file
+        self._backup_lines = deque(maxlen=backups)  # lines in this session's kept backups, oldest first
+        self._ring = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+        self._spill = None
+        self._rotations = 0   # spill files rotated out during this session
+        if spill_path is not None and os.path.exists(spill_path) and os.path.getsize(spill_path):
+            # A previous session's log becomes the newest backup; iteration covers this session only
+            self._shift_backups()
+
+    def append(self, line):
+        with self._lock:
+            if len(self._ring) == self.capacity:
+                self._spill_line(self._ring[0])
+            self._ring.append(line)
+            self.seq += 1
+
+    def extend(self, lines):
+        for line in lines:
+            self.append(line)
+
+    def since(self, seq):
+        """Return ``(current_seq, lines)`` for lines appended after ``seq``.
+
+        If more than ``capacity`` lines arrived since then, only the ones
+        still in memory are returned.
+        """
+        with self._lock:
+            missing = min(self.seq - seq, len(self._ring))
+            if missing <= 0:
+                return self.seq, []
+            lines = list(islice(reversed(self._ring), missing))
+            lines.reverse()
+            return self.seq, lines
+
+    def __len__(self):
+        """Number of lines iteration yields: kept spill files plus memory."""
+        with self._lock:
+            return sum(self._backup_lines) + self._spill_lines + len(self._ring)
+
+    def __iter__(self):
+        """Iterate every line in order: spilled files first, then memory."""
+        self.flush()
+        for path in self._spill_files():
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    yield line.rstrip("\n")
+        with self._lock:
+            tail = list(self._ring)
+        yield from tail
+
+    def flush(self):
+        with self._lock:
+            if self._spill is not None:
+                self._spill.flush()
+
+    def close(self):
+        with self._lock:
+            if self._spill is not None:
+                self._spill.close()
+                self._spill = None
+
+    # ---- spill handling (called with the lock held) ----
+
+    def _spill_line(self, line):
+        self.spilled += 1
+        if self.spill_path is None:
+            return
+        if self._spill is None:
+            os.makedirs(os.path.dirname(self.spill_path) or ".", exist_ok=True)
+            self._spill = open(self.spill_path, "a", encoding="utf-8")
+        self._spill.write(str(line).replace("\n", " ") + "\n")
+        self._spill_lines += 1
+        if self._spill.tell() >= self.max_spill_bytes:
+            self._rotate()
+
+    def _rotate(self):
+        self._spill.close()
+        self._spill = None
+        self._shift_backups()
+        self._rotations += 1
+        if self.backups:
+            self._backup_lines.append(self._spill_lines)
+        self._spill_lines = 0
+
+    def _shift_backups(self):
+        for i in range(self.backups - 1, 0, -1):
+            src = f"{self.spill_path}.{i}"
+            if os.path.exists(src):
+                os.replace(src, f"{self.spill_path}.{i + 1}")
+        os.replace(self.spill_path, f"{self.spill_path}.1")
+
+    def _spill_files(self):
+        if self.spill_path is None:
+            return []
+        rotated = [f"{self.spill_path}.{i}" for i in range(min(self._rotations, self.backups), 0, -1)]
+        return [p for p in rotated + [self.spill_path] if os.path.exists(p)]
@@ -0,0 +1,146 @@
+"""
+Cold-start timing and background warm-up for the entry points.
+
+Entry points import this module first. ``mark()`` records milestones
+("window shown", "ready") relative to that moment. With
+THREAT_STARTUP_REPORT=1, ``track_imports()`` also times every import
+statement that is not nested in another import. Nested imports count toward
+the import that triggered them, and imports made on other threads are
+labelled with the thread name. ``report()`` lists the slowest imports and the
+milestones.
+
+Warmup loads named subsystems one after another on a background thread, so
+the server or window comes up first. Its ``snapshot()`` backs the backend's
+/readyz probe.
+"""
+
+import builtins
+import os
+import sys
+import threading
+import time
+
+STARTED = time.perf_counter()
+ENABLED = os.environ.get("THREAT_STARTUP_REPORT", "") not in ("", "0")
+
+_imports = {}
+_marks = []
+_lock = threading.Lock()
+_local = threading.local()
+_original_import = None
+
+
+def elapsed():
+    """Seconds since this module was imported."""
+    return time.perf_counter() - STARTED
+
+
+def mark(label):
+    """Record a milestone; returns its time in seconds since start."""
+    at = elapsed()
+    with _lock:
+        _marks.append((label, at))
+    return at
+
+
+def _timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+    if getattr(_local, "depth", 0):
+        return _original_import(name, globals, locals, fromlist, level)
+    _local.depth = 1
+    started = time.perf_counter()
+    try:
+        return _original_import(name, globals, locals, fromlist, level)
+    finally:
+        _local.depth = 0
+        spent = time.perf_counter() - started
+        if level and globals:
+            name = f"{globals.get('__package__') or ''}.{name}".strip(".")
+        thread = threading.current_thread()
+        if thread is not threading.main_thread():
+            name = f"{name} [{thread.name}]"
+        with _lock:
+            _imports[name] = _imports.get(name, 0.0) + spent
+
+
+def track_imports(enabled=None):
+    """Start timing imports (only with THREAT_STARTUP_REPORT=1 unless ``enabled``)."""
+    global _original_import
+    if not (ENABLED if enabled is None else enabled) or _original_import is not None:
+        return False
+    _original_import = builtins.__import__
+    builtins.__import__ = _timed_import
+    return True
+
+
+def stop_tracking():
+    global _original_import
+    if _original_import is not None and builtins.__import__ is _timed_import:
+        builtins.__import__ = _original_import
+    _original_import = None
+
+
+def report(limit=15, min_ms=1.0):
+    """The slowest imports and all milestones as printable text."""
+    with _lock:
+        imports = sorted(_imports.items(), key=lambda item: item[1], reverse=True)
+        marks = list(_marks)
+    lines = [f"⏱️  Startup report ({os.path.basename(sys.argv[0]) or 'python'}, "
+             f"{elapsed():.3f}s since start)"]
+    shown = [(name, seconds) for name, seconds in imports if seconds * 1000 >= min_ms][:limit]
+    if shown:
+        lines.append("  imports (including what they import):")
+        lines.extend(f"    {seconds * 1000:8.1f} ms  {name}" for name, seconds in shown)
+        lines.append(f"    {sum(s for _, s in imports) * 1000:8.1f} ms  total over {len(imports)} imports")
+    if marks:
+        lines.append("  milestones:")
+        lines.extend(f"    {at:8.3f} s   {label}" for label, at in marks)
+    return "\n".join(lines)
+
+
+class Warmup:
+    """Runs ``(name, loader)`` pairs once on a background thread.
+
+    A failing loader is reported and skipped; the subsystem then loads (or
+    fails again) on first use as before. ``ready`` is set when every loader
+    has finished.
+    """
+
+    def __init__(self, tasks, label="ready"):
+        self.tasks = list(tasks)
+        self.label = label
+        self.ready = threading.Event()
+        self.components = {name: {"status": "pending"} for name, _ in self.tasks}
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start warming up (once); returns self."""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="warmup", daemon=True)
+                self._thread.start()
+        return self
+
+    def _run(self):
+        for name, loader in self.tasks:
+            self.components[name] = {"status": "loading"}
+            started = time.perf_counter()
+            try:
+                loader()
+                state = {"status": "ready"}
+            except Exception as e:
+                state = {"status": "failed", "error": str(e)}
+                print(f"[ERROR] Warm-up of {name} failed: {e}", file=sys.stderr)
+            state["seconds"] = round(time.perf_counter() - started, 3)
+            self.components[name] = state
+        mark(self.label)
+        self.ready.set()
+        if _original_import is not None:
+            stop_tracking()
+            print(report(), file=sys.stderr)
+
+    def wait(self, timeout=None):
+        return self.ready.wait(timeout)
+
+    def snapshot(self):
+        return {"ready": self.ready.is_set(), "components": dict(self.components)}
@@ -0,0 +1,291 @@
+"""
+Streaming report export (PDF, CSV, JSONL) with constant memory.
+
+Records are pulled one at a time from a source (a list or LogBuffer, rotated
+log files, or the event store) and encoded into bytes as they arrive. The
+PDF encoder writes each page as soon as it is full and keeps only the page
+object offsets for the final cross-reference table, so peak memory does not
+depend on how many lines the report holds.
+
+Encoders are plain ``begin() / encode(record) / end()`` byte producers, which
+lets the same code write a file from a background job or stream an HTTP
+response.
+"""
+
+import csv
+import io
+import json
+import os
+import time
+import zlib
+
+FORMATS = ("pdf", "csv", "jsonl")
+EVENT_FIELDS = ("timestamp", "severity", "type", "name", "location", "description", "source")
+CHUNK_BYTES = 64 * 1024
+
+
+# ---------------- sources ----------------
+
+def iter_log_files(paths):
+    """Yield lines from log files in order (e.g. rotated ``app.log.2, app.log.1, app.log``)."""
+    for path in paths:
+        if not os.path.exists(path):
+            continue
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            for line in f:
+                yield line.rstrip("\n")
+
+
+def iter_event_store(store, page_size=500, **filters):
+    """Yield every stored threat matching ``filters``, newest first, one page in memory at a time."""
+    cursor = None
+    while True:
+        page = store.query(limit=page_size, cursor=cursor, **filters)
+        yield from page["items"]
+        cursor = page["next_cursor"]
+        if not cursor:
+            return
+
+
+def format_record(record):
+    """One text line for a log line or a threat dict."""
+    if not isinstance(record, dict):
+        return str(record)
+    if "line" in record and len(record) == 1:
+        return str(record["line"])
+    head = " ".join(str(record[k]) for k in ("timestamp", "severity") if record.get(k))
+    body = f"{record.get('type', 'Threat')}: {record.get('name', '')}"
+    if record.get("location"):
+        body += f" @ {record['location']}"
+    return f"{head} {body}".strip()
+
+
+# ---------------- encoders ----------------
+
+class JSONLEncoder:
+    media_type = "application/x-ndjson"
+
+    def begin(self):
+        return b""
+
+    def encode(self, record):
+        if not isinstance(record, dict):
+            record = {"line": str(record)}
+        return (json.dumps(record, default=str) + "\n").encode("utf-8")
+
+    def end(self):
+        return b""
+
+
+class CSVEncoder:
+    """CSV with a header row; columns come from ``fields`` or the first record."""
+
+    media_type = "text/csv"
+
+    def __init__(self, fields=None):
+        self.fields = list(fields) if fields else None
+        self._buf = io.StringIO()
+        self._writer = None
+
+    def begin(self):
+        if self.fields is None:
+            return b""
+        self._writer = csv.writer(self._buf)
+        return self._row(self.fields)
+
+    def _row(self, row):
+        self._buf.seek(0)
+        self._buf.truncate()
+        self._writer.writerow(row)
+        return self._buf.getvalue().encode("utf-8")
+
+    def encode(self, record):
+        if not isinstance(record, dict):
+            record = {"line": str(record)}
+        header = b""
+        if self._writer is None:
+            if self.fields is None:
+                self.fields = ["line"] if list(record) == ["line"] else list(EVENT_FIELDS)
+            self._writer = csv.writer(self._buf)
+            header = self._row(self.fields)
+        return header + self._row([record.get(f, "") for f in self.fields])
+
+    def end(self):
+        return b""
+
+
+class PDFEncoder:
+    """Minimal text-only PDF writer that emits one page at a time.
+
+    Uses the built-in Courier font (no embedding) and Flate-compressed page
+    content. Characters outside Windows-1252 are replaced with ``?``.
+    """
+
+    media_type = "application/pdf"
+    PAGE_WIDTH, PAGE_HEIGHT = 612, 792
+    MARGIN = 40
+    FONT_SIZE = 8
+    LEADING = 10
+    WRAP = 110
+
+    def __init__(self, title="Threat Report", header_lines=()):
+        self.title = title
+        self.header_lines = list(header_lines)
+        self.lines_per_page = (self.PAGE_HEIGHT - 2 * self.MARGIN) // self.LEADING - 2
+        self._offset = 0
+        self._offsets = {}
+        self._pages = []
+        self._lines = []
+        self._next_obj = 4      # 1 = catalog, 2 = page tree, 3 = font
+
+    def _emit(self, data):
+        self._offset += len(data)
+        return data
+
+    def _object(self, num, body):
+        self._offsets[num] = self._offset
+        return self._emit(b"%d 0 obj\n" % num + body + b"\nendobj\n")
+
+    @staticmethod
+    def _escape(text):
+        raw = "".join(ch if ch >= " " else " " for ch in text).encode("cp1252", "replace")
+        return raw.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+
+    def _add_line(self, text):
+        out = b""
+        text = str(text)
+        for i in range(0, max(len(text), 1), self.WRAP):
+            self._lines.append(text[i:i + self.WRAP])
+            if len(self._lines) >= self.lines_per_page:
+                out += self._flush_page()
+        return out
+
+    def _flush_page(self):
+        top = self.PAGE_HEIGHT - self.MARGIN
+        ops = [b"BT /F1 %d Tf %d TL %d %d Td" % (self.FONT_SIZE, self.LEADING, self.MARGIN, top)]
+        ops.extend(b"(" + self._escape(line) + b") Tj T*" for line in self._lines)
+        ops.append(b"ET BT /F1 %d Tf %d %d Td (Page %d) Tj ET" % (
+            self.FONT_SIZE, self.PAGE_WIDTH - self.MARGIN - 40, self.MARGIN // 2, len(self._pages) + 1))
+        content = zlib.compress(b"\n".join(ops))
+        self._lines = []
+
+        content_num, page_num = self._next_obj, self._next_obj + 1
+        self._next_obj += 2
+        self._pages.append(page_num)
+        out = self._object(content_num, b"<< /Length %d /Filter /FlateDecode >>\nstream\n" % len(content)
+                           + content + b"\nendstream")
+        out += self._object(page_num, b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] "
+                                      b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>"
+                            % (self.PAGE_WIDTH, self.PAGE_HEIGHT, content_num))
+        return out
+
+    def begin(self):
+        out = self._emit(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        out += self._object(3, b"<< /Type /Font /Subtype /Type1 /BaseFont /Courier "
+                               b"/Encoding /WinAnsiEncoding >>")
+        for line in [self.title, f"Generated {time.strftime('%Y-%m-%d %H:%M:%S')}", ""] + self.header_lines:
+            out += self._add_line(line)
+        return out
+
+    def encode(self, record):
+        return self._add_line(format_record(record))
+
+    def end(self):
+        out = b""
+        if self._lines or not self._pages:
+            out += self._flush_page()
+        kids = b" ".join(b"%d 0 R" % n for n in self._pages)
+        out += self._object(2, b"<< /Type /Pages /Kids [" + kids + b"] /Count %d >>" % len(self._pages))
+        out += self._object(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+        xref_at = self._offset
+        count = self._next_obj
+        xref = [b"xref\n0 %d\n" % count, b"0000000000 65535 f \n"]
+        xref.extend(b"%010d 00000 n \n" % self._offsets[n] for n in range(1, count))
+        out += b"".join(xref)
+        out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (count, xref_at)
+        return out
+
+
+def make_encoder(fmt, title="Threat Report", header_lines=(), fields=None):
+    if fmt == "pdf":
+        return PDFEncoder(title, header_lines)
+    if fmt == "csv":
+        return CSVEncoder(fields)
+    if fmt == "jsonl":
+        return JSONLEncoder()
+    raise ValueError(f"unsupported export format: {fmt!r} (expected one of {', '.join(FORMATS)})")
+
+
+def format_for_path(path):
+    ext = os.path.splitext(str(path))[1].lower().lstrip(".")
+    return {"ndjson": "jsonl", "json": "jsonl"}.get(ext, ext)
+
+
+def iter_export(records, encoder, cancelled=None, on_record=None):
+    """Yield the encoded export in chunks of about CHUNK_BYTES.
+
+    ``on_record(count)`` is called after each record; iteration stops early
+    (without the trailer) once ``cancelled()`` returns True.
+    """
+    buf = [encoder.begin()]
+    size = len(buf[0])
+    count = 0
+    for record in records:
+        if cancelled and cancelled():
+            return
+        data = encoder.encode(record)
+        buf.append(data)
+        size += len(data)
+        count += 1
+        if on_record:
+            on_record(count)
+        if size >= CHUNK_BYTES:
+            yield b"".join(buf)
+            buf, size = [], 0
+    buf.append(encoder.end())
+    yield b"".join(buf)
+
+
+def export_to_file(records, path, fmt=None, total=None, progress=None, cancelled=None, **options):
+    """Stream ``records`` into ``path``; returns a summary dict.
+
+    The file is written as ``<path>.part`` and renamed on success, so a
+    cancelled or failed export never leaves a truncated report behind.
+    ``progress(done, total)`` is called at most every 1000 records.
+    """
+    fmt = fmt or format_for_path(path)
+    encoder = make_encoder(fmt, **options)
+    started = time.perf_counter()
+    counter = [0]
+
+    def on_record(count):
+        counter[0] = count
+        if progress and count % 1000 == 0:
+            progress(count, total)
+
+    tmp = f"{path}.part"
+    written = 0
+    try:
+        with open(tmp, "wb") as f:
+            for chunk in iter_export(records, encoder, cancelled, on_record):
+                f.write(chunk)
+                written += len(chunk)
+        is_cancelled = bool(cancelled and cancelled())
+        if is_cancelled:
+            os.remove(tmp)
+        else:
+            os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    if progress and not is_cancelled:
+        progress(counter[0], total if total is not None else counter[0])
+    return {
+        "path": str(path),
+        "format": fmt,
+        "records": counter[0],
+        "bytes": written,
+        "seconds": round(time.perf_counter() - started, 3),
+        "cancelled": is_cancelled,
+    }
@@ -0,0 +1,158 @@
+"""
+Preloaded threat catalog with pre-encoded JSON.
+
+The simulated scan and the SSE feed only ever emit a handful of known
+threats. Each catalog entry is loaded once from ``data/threat_catalog.json``
+into a read-only mapping and its static fields are JSON-encoded once, so
+emitting a detection only splices the event id and timestamp into that
+fragment instead of building and serializing a fresh dict.
+
+ThreatEvent is what the hot paths pass around: it answers ``get()`` for the
+event store's indexed columns, ``to_json()`` for SSE frames and job
+responses, and ``to_dict()`` (a fresh copy) for anything that needs a dict.
+Entries are never handed out mutably, so one event can no longer change the
+catalog or another event.
+
+Clients that fetched the catalog once (``/api/catalog``) can take events as
+references instead: ``to_ref_json()`` carries only the id, ``catalog_ref``,
+timestamp and location, and the client merges in the static fields.
+"""
+
+import hashlib
+import json
+import os
+import random
+import time
+from types import MappingProxyType
+
+CATALOG_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data",
+                            "threat_catalog.json")
+STATIC_FIELDS = ("name", "type", "severity", "icon", "location", "description", "details")
+
+_clock = (None, None)       # (whole second, formatted timestamp), replaced as one tuple
+
+
+def timestamp(now=None):
+    """``%Y-%m-%d %H:%M:%S`` for ``now``, formatted at most once per second."""
+    global _clock
+    now = int(time.time() if now is None else now)
+    second, text = _clock
+    if second != now:
+        text = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(now))
+        _clock = (now, text)
+    return text
+
+
+class CatalogEntry:
+    __slots__ = ("id", "ref", "fields", "fragment")
+
+    def __init__(self, entry_id, fields, ref=None):
+        self.id = entry_id
+        self.ref = str(entry_id) if ref is None else ref
+        self.fields = MappingProxyType({k: fields[k] for k in STATIC_FIELDS if k in fields})
+        # '"name": ..., "details": ...' -- the body of the object without braces
+        self.fragment = json.dumps(dict(self.fields))[1:-1]
+
+    def event(self, event_id=None, ts=None):
+        return ThreatEvent(self, self.id if event_id is None else event_id, ts or timestamp())
+
+
+class ThreatEvent:
+    """One emitted detection: a catalog entry plus its id and timestamp."""
+
+    __slots__ = ("entry", "id", "timestamp", "_json")
+
+    def __init__(self, entry, event_id, ts):
+        self.entry = entry
+        self.id = event_id
+        self.timestamp = ts
+        self._json = None
+
+    def get(self, key, default=None):
+        if key == "id":
+            return self.id
+        if key == "timestamp":
+            return self.timestamp
+        if key == "selected":
+            return False
+        return self.entry.fields.get(key, default)
+
+    def __getitem__(self, key):
+        value = self.get(key, KeyError)
+        if value is KeyError:
+            raise KeyError(key)
+        return value
+
+    def to_json(self):
+        if self._json is None:
+            self._json = '{"id": %s, %s, "timestamp": %s, "selected": false}' % (
+                json.dumps(self.id), self.entry.fragment, json.dumps(self.timestamp))
+        return self._json
+
+    def to_ref_json(self):
+        """Compact form for clients holding the catalog (see ThreatCatalog.to_json)."""
+        return '{"id": %s, "catalog_ref": %s, "timestamp": %s, "location": %s}' % (
+            json.dumps(self.id), json.dumps(self.entry.ref), json.dumps(self.timestamp),
+            json.dumps(self.entry.fields.get("location")))
+
+    def to_dict(self):
+        out = {"id": self.id}
+        out.update(self.entry.fields)
+        out["timestamp"] = self.timestamp
+        out["selected"] = False
+        return out
+
+    def __repr__(self):
+        return f"ThreatEvent(id={self.id!r}, name={self.entry.fields.get('name')!r})"
+
+
+class ThreatCatalog:
+    def __init__(self, threats, heuristic=()):
+        self.entries = tuple(CatalogEntry(t["id"], t) for t in threats)
+        self.heuristic = tuple(CatalogEntry(None, t, ref=f"h{i}") for i, t in enumerate(heuristic, 1))
+        self._by_id = {e.id: e for e in self.entries}
+        refs = {e.ref: dict(e.fields) for e in self.entries + self.heuristic}
+        # The version changes whenever the catalog content does, so it doubles as an ETag
+        body = json.dumps(refs, sort_keys=True)
+        self.version = hashlib.sha1(body.encode("utf-8")).hexdigest()[:12]
+        self._json = '{"version": %s, "entries": %s}' % (json.dumps(self.version), body)
+
+    @classmethod
+    def load(cls, path=CATALOG_PATH):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data["threats"], data.get("heuristic", ()))
+
+    def get(self, entry_id):
+        return self._by_id.get(entry_id)
+
+    def to_json(self):
+        """``{"version": ..., "entries": {catalog_ref: static fields}}``, encoded once."""
+        return self._json
+
+    def to_dict(self):
+        return json.loads(self._json)
+
+    def sample(self, rng=random):
+        """Events for a random subset of the catalog (ids are the catalog ids)."""
+        ts = timestamp()
+        count = rng.randint(0, len(self.entries))
+        return [entry.event(ts=ts) for entry in rng.sample(self.entries, count)]
+
+    def random_event(self, event_id, rng=random):
+        """One detection for the live feed.
+
+        Same distribution as picking from a random scan result: a heuristic
+        finding when the subset would be empty, otherwise a uniform entry.
+        """
+        if not self.entries or rng.randint(0, len(self.entries)) == 0:
+            if self.heuristic:
+                return rng.choice(self.heuristic).event(event_id)
+        return rng.choice(self.entries).event(event_id)
+
+
+def encode(item):
+    """JSON text for a ThreatEvent (pre-encoded) or any JSON-serializable value."""
+    to_json = getattr(item, "to_json", None)
+    return to_json() if to_json is not None else json.dumps(item, default=str)
+
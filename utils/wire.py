@@ -0,0 +1,141 @@
+"""
+Negotiated response encodings for the JSON API.
+
+``encode_body()`` picks a body format from the ``Accept`` header (JSON, or
+MessagePack / CBOR when msgpack / cbor2 are installed) and a compression
+from ``Accept-Encoding`` (brotli when the brotli module is installed,
+otherwise gzip). Bodies below ``MIN_COMPRESS_BYTES`` are sent uncompressed;
+a gzip header would eat most of the saving.
+
+Payloads may be plain values or objects with ``to_json()`` / ``to_dict()``
+(jobs, the threat catalog): the JSON path uses their pre-encoded text, the
+binary formats their dict form. Static payloads can pass a ``cache`` dict to
+encode and compress each variant only once.
+"""
+
+import gzip
+import json
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+CBOR = "application/cbor"
+MIN_COMPRESS_BYTES = 512
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5          # brotli's default (11) is far too slow for per-request use
+
+_modules = {}
+
+
+def _optional(name):
+    """The named module, or None when it is not installed (looked up once)."""
+    if name not in _modules:
+        try:
+            _modules[name] = __import__(name)
+        except ImportError:
+            _modules[name] = None
+    return _modules[name]
+
+
+def _encode_msgpack(value):
+    return _optional("msgpack").packb(value, default=str, use_bin_type=True)
+
+
+def _encode_cbor(value):
+    return _optional("cbor2").dumps(value, default=lambda encoder, v: encoder.encode(str(v)))
+
+
+BINARY_FORMATS = {MSGPACK: ("msgpack", _encode_msgpack), CBOR: ("cbor2", _encode_cbor)}
+ALIASES = {"application/x-msgpack": MSGPACK, "application/vnd.msgpack": MSGPACK}
+
+
+def parse_accept(header):
+    """``{token: q}`` from an Accept or Accept-Encoding header, in header order."""
+    out = {}
+    for part in (header or "").split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        out[token] = q
+    return out
+
+
+def choose_format(accept):
+    """Preferred available body media type for ``accept`` (ties go to the first listed); JSON by default."""
+    best, best_q = JSON, 0.0
+    for token, q in parse_accept(accept).items():
+        media_type = ALIASES.get(token, token)
+        available = media_type == JSON or (media_type in BINARY_FORMATS and _optional(BINARY_FORMATS[media_type][0]))
+        if available and q > best_q:
+            best, best_q = media_type, q
+    return best
+
+
+def choose_encoding(accept_encoding):
+    """``"br"``, ``"gzip"`` or None for an Accept-Encoding header."""
+    ranked = parse_accept(accept_encoding)
+    wildcard = ranked.get("*", 0.0)
+    options = [("br", ranked.get("br", wildcard)), ("gzip", ranked.get("gzip", wildcard))]
+    if not _optional("brotli"):
+        options = options[1:]
+    name, q = max(options, key=lambda o: o[1])
+    return name if q > 0 else None
+
+
+def compress(body, encoding):
+    if encoding == "br":
+        return _optional("brotli").compress(body, quality=BROTLI_QUALITY)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+    return body
+
+
+class View:
+    """Adapts callables to the ``to_json()`` / ``to_dict()`` payload protocol."""
+
+    __slots__ = ("to_json", "to_dict")
+
+    def __init__(self, to_json, to_dict):
+        self.to_json = to_json
+        self.to_dict = to_dict
+
+
+def serialize(payload, media_type=JSON):
+    """Body bytes for ``payload`` in ``media_type``."""
+    if media_type == JSON:
+        to_json = getattr(payload, "to_json", None)
+        text = to_json() if to_json is not None else json.dumps(payload, default=str)
+        return text.encode("utf-8")
+    to_dict = getattr(payload, "to_dict", None)
+    return BINARY_FORMATS[media_type][1](to_dict() if to_dict is not None else payload)
+
+
+def encode_body(payload, accept=None, accept_encoding=None, cache=None):
+    """Negotiate and encode a response body.
+
+    Returns ``(body, headers)``; headers carry Content-Type, Vary and
+    Content-Encoding when the body was compressed.
+    """
+    media_type = choose_format(accept)
+    encoding = choose_encoding(accept_encoding)
+    key = (media_type, encoding)
+    if cache is not None and key in cache:
+        body, used = cache[key]
+    else:
+        body = serialize(payload, media_type)
+        used = encoding if encoding and len(body) >= MIN_COMPRESS_BYTES else None
+        body = compress(body, used)
+        if cache is not None:
+            cache[key] = (body, used)
+    headers = {"Content-Type": media_type, "Vary": "Accept, Accept-Encoding"}
+    if used:
+        headers["Content-Encoding"] = used
+    return body, headers